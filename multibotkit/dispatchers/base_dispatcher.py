@@ -3,20 +3,25 @@ from typing import Callable, Optional, Union
 
 from pydantic import BaseModel
 
-from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.managers.base import BaseStateManager, StateConflictError
 from multibotkit.states.managers.memory import MemoryStateManager
+from multibotkit.states.state import State
 
 
 class BaseDispatcher:
     def __init__(
         self,
         state_manager: BaseStateManager = MemoryStateManager(),
-        logger: Optional[Union[Logger, Callable]] = None
+        logger: Optional[Union[Logger, Callable]] = None,
+        conflict_retries: int = 0,
+        deferred_commit: bool = False
     ):
         self._handlers = []
         self._default_handler = None
         self.state_manager = state_manager
         self.logger = logger
+        self.conflict_retries = conflict_retries
+        self.deferred_commit = deferred_commit
 
     def handler(self, func=None, state_object_func=None):
         def wrapper(f):
@@ -24,5 +29,32 @@ class BaseDispatcher:
 
         return wrapper
 
+    async def _call_handler(
+        self, handler: Callable, event: BaseModel, state_object: State
+    ):
+        # on a concurrent state modification the handler is run again
+        # with a freshly loaded state, up to conflict_retries times
+        attempt = 0
+        while True:
+            try:
+                if not self.deferred_commit:
+                    return await handler(event, state_object)
+
+                # state changes are stored once after the handler returns
+                # and dropped if it raises
+                state_object.begin()
+                try:
+                    result = await handler(event, state_object)
+                except BaseException:
+                    state_object.rollback()
+                    raise
+                await state_object.commit()
+                return result
+            except StateConflictError:
+                if attempt >= self.conflict_retries:
+                    raise
+                attempt += 1
+                state_object = await self.state_manager.get_state(state_object.db_id)
+
     async def process_event(self, event: BaseModel, func: Optional[Callable] = None):
         raise NotImplementedError("process_event is not implemented")
@@ -30,7 +30,7 @@ class FacebookDispatcher(BaseDispatcher):
             summary_result = state_func_result * func_result
 
             if summary_result:
-                await handler(event, state_object)
+                await self._call_handler(handler, event, state_object)
 
                 if self.logger:
                     new_state_object = await self.state_manager.get_state(state_id)
@@ -1,15 +1,18 @@
 import inspect
 from datetime import datetime
+from typing import Union
 from multibotkit.dispatchers.base_dispatcher import BaseDispatcher
-from multibotkit.schemas.telegram.incoming import Update
+from multibotkit.schemas.telegram.incoming import LazyUpdate, Update
 
 
 class TelegramDispatcher(BaseDispatcher):
 
     async def process_event(
-        self, event: Update
+        self, event: Union[Update, LazyUpdate]
     ):
-        if event.message is not None:
+        if isinstance(event, LazyUpdate):
+            sender_id = event.sender_id
+        elif event.message is not None:
             sender_id = event.message.from_.id
         elif event.callback_query is not None:
             sender_id = event.callback_query.from_.id
@@ -50,7 +53,7 @@ class TelegramDispatcher(BaseDispatcher):
             summary_result = state_func_result * func_result
             
             if summary_result:
-                await handler(event, state_object)
+                await self._call_handler(handler, event, state_object)
                 
                 if self.logger:
                     new_state_object = await self.state_manager.get_state(state_id)
@@ -65,7 +65,7 @@ class YandexMessengerDispatcher(BaseDispatcher):
             summary_result = state_func_result * func_result
 
             if summary_result:
-                await handler(event, state_object)
+                await self._call_handler(handler, event, state_object)
 
                 # 4. Логирование
                 if self.logger:
@@ -1,7 +1,16 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+from functools import lru_cache
+from io import BytesIO
 from json import JSONDecodeError
-from typing import Optional
+from typing import AsyncIterator, Iterable, Iterator, Optional, Type, Union
 
+import aiofiles
 import httpx
+from pydantic import BaseModel
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -9,10 +18,167 @@ from tenacity import (
     wait_exponential,
 )
 
+from multibotkit.helpers.multipart import AsyncMultipartStream, StreamFile
+from multibotkit.helpers.upload_cache import is_local_path
+from multibotkit.schemas.frozen import FrozenMarkup
+
+
+def _contains_stream_file(value) -> bool:
+    if isinstance(value, StreamFile):
+        return True
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return False
+    return any(_contains_stream_file(item) for item in value)
+
+
+def stop_if_stream_file(retry_state) -> bool:
+    """
+    tenacity stop condition for requests sending a StreamFile: it is read
+    once, so the error of the first attempt is raised instead of retrying.
+    """
+    return _contains_stream_file(
+        [*retry_state.args, *retry_state.kwargs.values()]
+    )
+
+
+@lru_cache(maxsize=None)
+def _optional_fields(model: Type[BaseModel]) -> tuple:
+    return tuple(
+        field for field in model.model_fields.items() if not field[1].is_required()
+    )
+
+
+def _to_payload(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_to_payload(item) for item in value]
+    return value
+
+
+def build_payload(model: Type[BaseModel], fields: dict) -> dict:
+    """
+    Builds the same dict as model(**fields).model_dump(exclude_none=True)
+    without validating fields.
+    """
+    payload = {}
+    for name, field in _optional_fields(model):
+        default = field.get_default(call_default_factory=True)
+        if default is not None:
+            payload[name] = _to_payload(default)
+    for name, value in fields.items():
+        if value is not None:
+            payload[name] = _to_payload(value)
+    return payload
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+def check_file_size(size: Optional[int], max_size: Optional[int]):
+    if max_size is not None and size is not None and size > max_size:
+        raise FileTooLargeError(f"File is larger than {max_size} bytes")
+
+
+def _range_headers(received: int) -> Optional[dict]:
+    if not received:
+        return None
+    return {"Range": f"bytes={received}-"}
+
+
+def _bytes_to_skip(response: httpx.Response, received: int, max_size: Optional[int]) -> Optional[int]:
+    """
+    Returns how many bytes at the start of response were received before,
+    None if there is nothing left to receive.
+    """
+    if received and response.status_code == 416:
+        return None
+    response.raise_for_status()
+    if received and response.status_code == 206:
+        return 0
+    # the server ignored Range and sends the whole file again
+    content_length = response.headers.get("Content-Length")
+    check_file_size(None if content_length is None else int(content_length), max_size)
+    return received
+
+
+def _should_resume(error: httpx.HTTPError) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _jpeg_file(data: bytes) -> BytesIO:
+    file = BytesIO(data)
+    file.name = "photo.jpg"
+    return file
+
 
 class BaseHelper:
-    def __init__(self, proxy: Optional[str] = None):
+    """
+    trusted=True skips validation of outgoing payloads: request bodies are
+    built straight from the arguments, so they must already be valid.
+    """
+
+    # pauses before resuming an interrupted download, one per resume
+    download_retry_delays = (4, 4, 8, 10)
+    # ImagePreprocessor applied to photos uploaded by the helper
+    image_preprocessor = None
+
+    def __init__(self, proxy: Optional[str] = None, trusted: bool = False):
         self.proxy = proxy
+        self.trusted = trusted
+
+    def _build(self, model: Type[BaseModel], **fields) -> Union[BaseModel, dict]:
+        if self.trusted:
+            return build_payload(model, fields)
+
+        frozen = {
+            name: value for name, value in fields.items() if isinstance(value, FrozenMarkup)
+        }
+        if not frozen:
+            return model(**fields)
+        # frozen markups were validated once already, only the rest is validated
+        for name in frozen:
+            fields[name] = None
+        payload = model(**fields).model_dump(exclude_none=True)
+        payload.update(frozen)
+        return payload
+
+    def _dump(self, obj: Union[BaseModel, dict]) -> dict:
+        if isinstance(obj, dict):
+            return obj
+        return obj.model_dump(exclude_none=True)
+
+    def _json(self, value, **kwargs) -> str:
+        if isinstance(value, FrozenMarkup):
+            return value.json
+        return json.dumps(value, **kwargs)
+
+    def _needs_preprocessing(self, photo) -> bool:
+        # streamed photos are sent as they arrive, they are never held in memory whole
+        return (
+            self.image_preprocessor is not None
+            and not isinstance(photo, StreamFile)
+            and (not isinstance(photo, str) or is_local_path(photo))
+        )
+
+    def _sync_prepare_photo(self, photo):
+        """
+        Returns a local or in-memory photo processed by image_preprocessor
+        as a file object, anything else is returned as is.
+        """
+        if not self._needs_preprocessing(photo):
+            return photo
+        return _jpeg_file(self.image_preprocessor.sync_process(photo))
+
+    async def _async_prepare_photo(self, photo):
+        if not self._needs_preprocessing(photo):
+            return photo
+        return _jpeg_file(await self.image_preprocessor.async_process(photo))
 
     def _get_httpx_request_kwargs(self):
         kwargs = {}
@@ -60,16 +226,118 @@ class BaseHelper:
         async with httpx.AsyncClient(**self._get_httpx_client_kwargs()) as client:
             if use_json:
                 return await client.post(url=url, json=data)
+            if files:
+                # httpx reads files synchronously and copies buffers chunk by chunk,
+                # the stream reads local files with aiofiles and sends buffers as is
+                stream = AsyncMultipartStream(data, files)
+                return await client.post(url=url, content=stream, headers=stream.headers)
             return await client.post(url=url, data=data, files=files)
 
-    def _sync_stream(self, method: str, url: str):
-        return httpx.stream(
-            method=method, url=url, **self._get_httpx_request_kwargs()
-        )
+    def _sync_stream(self, method: str, url: str, headers: Optional[dict] = None):
+        kwargs = self._get_httpx_request_kwargs()
+        if headers:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **headers}
+        return httpx.stream(method=method, url=url, **kwargs)
 
     def _get_async_client(self):
         return httpx.AsyncClient(**self._get_httpx_client_kwargs())
 
+    def _sync_iter_download(
+        self, url: str, max_size: Optional[int] = None, chunk_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Yields the body of url chunk by chunk. When the connection breaks
+        the download is resumed from the received offset with a Range request.
+        """
+        received = 0
+        for delay in (*self.download_retry_delays, None):
+            try:
+                with self._sync_stream("GET", url, headers=_range_headers(received)) as response:
+                    skip = _bytes_to_skip(response, received, max_size)
+                    if skip is None:
+                        return
+                    for chunk in response.iter_bytes(chunk_size):
+                        if skip:
+                            chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                            if not chunk:
+                                continue
+                        received += len(chunk)
+                        check_file_size(received, max_size)
+                        yield chunk
+                return
+            except httpx.HTTPError as e:
+                if delay is None or not _should_resume(e):
+                    raise
+            time.sleep(delay)
+
+    async def _async_iter_download(
+        self, url: str, max_size: Optional[int] = None, chunk_size: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        received = 0
+        for delay in (*self.download_retry_delays, None):
+            try:
+                async with self._get_async_client() as client:
+                    async with client.stream(
+                        "GET", url, headers=_range_headers(received)
+                    ) as response:
+                        skip = _bytes_to_skip(response, received, max_size)
+                        if skip is None:
+                            return
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            if skip:
+                                chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                                if not chunk:
+                                    continue
+                            received += len(chunk)
+                            check_file_size(received, max_size)
+                            yield chunk
+                return
+            except httpx.HTTPError as e:
+                if delay is None or not _should_resume(e):
+                    raise
+            await asyncio.sleep(delay)
+
+    def _sync_write_chunks(self, chunks: Iterable[bytes], destination) -> int:
+        """
+        Writes chunks to destination, a path or a file object, and returns
+        the number of written bytes. A partly written path is removed on error.
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            try:
+                with open(destination, "wb") as f:
+                    return self._sync_write_chunks(chunks, f)
+            except BaseException:
+                if os.path.exists(destination):
+                    os.remove(destination)
+                raise
+
+        size = 0
+        for chunk in chunks:
+            destination.write(chunk)
+            size += len(chunk)
+        return size
+
+    async def _async_write_chunks(self, chunks: AsyncIterator[bytes], destination) -> int:
+        """
+        Same as _sync_write_chunks, file objects may be async, like aiofiles ones.
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            try:
+                async with aiofiles.open(destination, "wb") as f:
+                    return await self._async_write_chunks(chunks, f)
+            except BaseException:
+                if os.path.exists(destination):
+                    os.remove(destination)
+                raise
+
+        size = 0
+        async for chunk in chunks:
+            result = destination.write(chunk)
+            if inspect.isawaitable(result):
+                await result
+            size += len(chunk)
+        return size
+
     @retry(
         retry=retry_if_exception_type(httpx.HTTPError)
         | retry_if_exception_type(JSONDecodeError),
@@ -91,7 +359,7 @@ class BaseHelper:
         retry=retry_if_exception_type(httpx.HTTPError)
         | retry_if_exception_type(JSONDecodeError),
         reraise=True,
-        stop=stop_after_attempt(5),
+        stop=stop_after_attempt(5) | stop_if_stream_file,
         wait=wait_exponential(multiplier=1, min=4, max=10),
     )
     async def _perform_async_request(
@@ -1,3 +1,4 @@
+import json
 from typing import List, Optional
 from multibotkit.helpers.base_helper import BaseHelper
 from multibotkit.schemas.fb.outgoing import (
@@ -20,8 +21,9 @@ class FBHelper(BaseHelper):
         messages_endpoint: str = "https://graph.facebook.com/v14.0/me/messages?access_token=",
         profile_endpoint: str = "https://graph.facebook.com/v14.0/me/messenger_profile?access_token=",
         proxy: Optional[str] = None,
+        trusted: bool = False,
     ):
-        super().__init__(proxy=proxy)
+        super().__init__(proxy=proxy, trusted=trusted)
         self.MESSAGES_URL = messages_endpoint + token
         self.PROFILE_URL = profile_endpoint + token
 
@@ -33,15 +35,22 @@ class FBHelper(BaseHelper):
         attachment: Optional[MessageDataAttachment] = None,
         quick_replies: Optional[List[QuickReply]] = None,
     ):
-        recipient = MessageRecipient(id=recipient_id)
-        data = MessageData(
+        recipient = self._build(MessageRecipient, id=recipient_id)
+        data = self._build(
+            MessageData,
             text=text, attachment=attachment, quick_replies=quick_replies
         )
-        message = Message(
+        message = self._build(
+            Message,
             recipient=recipient, messaging_type=message_type, message=data
         )
         return message
 
+    def _dump_json(self, message) -> str:
+        if isinstance(message, dict):
+            return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+        return message.model_dump_json(exclude_none=True)
+
     def sync_send_message(
         self,
         recipient_id: str,
@@ -64,7 +73,7 @@ a list of quick replies"
             quick_replies=quick_replies,
         )
 
-        data = message.model_dump_json(exclude_none=True)
+        data = self._dump_json(message)
         r = self._perform_sync_request(url=self.MESSAGES_URL, data=data)
         return r
 
@@ -90,7 +99,7 @@ a list of quick replies"
             quick_replies=quick_replies,
         )
 
-        data = message.model_dump_json(exclude_none=True)
+        data = self._dump_json(message)
         r = await self._perform_async_request(url=self.MESSAGES_URL, data=data)
         return r
 
@@ -115,11 +124,11 @@ a list of quick replies"
         return r
 
     def sync_send_persistent_menu(self, persistent_menu: PersistentMenu):
-        data = persistent_menu.model_dump(exclude_none=True)
+        data = self._dump(persistent_menu)
         r = self._perform_sync_request(self.PROFILE_URL, data=data)
         return r
 
     async def async_send_persistent_menu(self, persistent_menu: PersistentMenu):
-        data = persistent_menu.model_dump(exclude_none=True)
+        data = self._dump(persistent_menu)
         r = await self._perform_async_request(self.PROFILE_URL, data=data)
         return r
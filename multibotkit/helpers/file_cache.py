@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import uuid
+from collections import OrderedDict
+from typing import IO, Any, Awaitable, Callable, Iterator, Optional, Union
+
+import aiofiles
+
+
+TMP_DIR = "tmp"
+CHUNK_SIZE = 64 * 1024
+
+
+def open_mmap(path: str) -> Union[mmap.mmap, bytes]:
+    """
+    Maps the file at path into memory read-only, empty files can not be
+    mapped and are returned as b"".
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_chunks(data: Union[mmap.mmap, bytes], chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields data, e.g. from open_mmap, chunk by chunk and closes it afterwards.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    try:
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def iter_mmap_chunks(path: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields the file at path chunk by chunk from a memory mapping. The file is
+    mapped right away, so it can be read even if it is evicted meanwhile.
+    """
+    return iter_chunks(open_mmap(path), chunk_size)
+
+
+class DiskFileCache:
+    """
+    Size-bounded LRU cache of downloaded files on disk.
+
+    Files are written to a temporary file and renamed into place, so a
+    cached file is always complete. Access times are kept in file mtimes,
+    so the LRU order survives restarts. Once the cache takes more than
+    max_size bytes the least recently used files are removed, a path
+    returned by the cache may therefore disappear, sync_open and async_open
+    return the file already mapped. Concurrent async fetches of one key
+    wait for a single download.
+    """
+
+    def __init__(self, path: str = "media_cache", max_size: int = 1024 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.tmp_path = os.path.join(path, TMP_DIR)
+
+        # file name -> size, least recently used first
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pending = {}
+
+        os.makedirs(self.tmp_path, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        for name in os.listdir(self.tmp_path):
+            # downloads interrupted by a restart
+            os.remove(os.path.join(self.tmp_path, name))
+
+        entries = []
+        for directory in os.listdir(self.path):
+            directory_path = os.path.join(self.path, directory)
+            if directory == TMP_DIR or not os.path.isdir(directory_path):
+                continue
+            for name in os.listdir(directory_path):
+                stat = os.stat(os.path.join(directory_path, name))
+                entries.append((stat.st_mtime_ns, name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _file_path(self, name: str) -> str:
+        return os.path.join(self.path, name[:2], name)
+
+    def get_path(self, key: str) -> Optional[str]:
+        """
+        Returns the path of the cached file for key and marks it as recently used.
+        """
+        name = self._name(key)
+        if name not in self._entries:
+            return None
+        path = self._file_path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._size -= self._entries.pop(name)
+            return None
+        self._entries.move_to_end(name)
+        return path
+
+    def read(self, key: str) -> Optional[Union[mmap.mmap, bytes]]:
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            return open_mmap(path)
+        except FileNotFoundError:
+            self.delete(key)
+            return None
+
+    def _tmp_file_path(self) -> str:
+        return os.path.join(self.tmp_path, uuid.uuid4().hex)
+
+    def _commit(self, key: str, tmp_path: str) -> str:
+        name = self._name(key)
+        path = self._file_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        self._size += size - self._entries.pop(name, 0)
+        self._entries[name] = size
+        self._evict()
+        return path
+
+    def _evict(self):
+        # the most recent file stays even if it alone exceeds max_size
+        while self._size > self.max_size and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._file_path(name))
+            except FileNotFoundError:
+                pass
+
+    def delete(self, key: str):
+        name = self._name(key)
+        if name in self._entries:
+            self._size -= self._entries.pop(name)
+            try:
+                os.remove(self._file_path(name))
+            except FileNotFoundError:
+                pass
+
+    def sync_fetch(self, key: str, download: Callable[[IO], Any]) -> str:
+        """
+        Returns the path of the cached file for key, download writes the
+        file to the given file object when it is not cached yet.
+        """
+        path = self.get_path(key)
+        if path is not None:
+            return path
+
+        tmp_path = self._tmp_file_path()
+        try:
+            with open(tmp_path, "wb") as f:
+                download(f)
+            return self._commit(key, tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def _async_download(self, key: str, download: Callable[[Any], Awaitable]) -> str:
+        tmp_path = self._tmp_file_path()
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await download(f)
+            return self._commit(key, tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _download_done(self, key: str, task: asyncio.Task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            # the error is raised to the waiters, nobody has to retrieve it
+            task.exception()
+
+    async def async_fetch(self, key: str, download: Callable[[Any], Awaitable]) -> str:
+        """
+        Same as sync_fetch, download gets an aiofiles file object.
+
+        The download runs as a separate task shared by concurrent fetches of
+        key, so it is not cancelled with any of them. Its error is raised to
+        the caller that started it, the other callers retry with their own
+        download, which may be called with other arguments, e.g. a larger
+        size limit.
+        """
+        while True:
+            path = self.get_path(key)
+            if path is not None:
+                return path
+
+            task = self._pending.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._async_download(key, download))
+                self._pending[key] = task
+                task.add_done_callback(lambda t: self._download_done(key, t))
+                return await asyncio.shield(task)
+
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            except Exception:
+                pass
+
+    def sync_open(self, key: str, download: Callable[[IO], Any]) -> Union[mmap.mmap, bytes]:
+        """
+        Same as sync_fetch, but returns the file mapped into memory, see
+        open_mmap, so it can not be evicted before it is read.
+        """
+        while True:
+            data = self.read(key)
+            if data is not None:
+                return data
+            self.sync_fetch(key, download)
+
+    async def async_open(
+        self, key: str, download: Callable[[Any], Awaitable]
+    ) -> Union[mmap.mmap, bytes]:
+        while True:
+            data = self.read(key)
+            if data is not None:
+                return data
+            await self.async_fetch(key, download)
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BytesIO
+from typing import IO, Optional, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+Source = Union[str, bytes, bytearray, memoryview, IO]
+
+
+def _require_pillow():
+    if Image is None:
+        raise ImportError(
+            "Pillow is not installed, install it with `pip install Pillow`"
+        )
+
+
+def _flatten(image):
+    if image.mode in ("RGB", "L"):
+        return image
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def process_image(
+    source: Union[str, bytes],
+    max_dimension: Optional[int] = None,
+    quality: int = 85,
+    strip_metadata: bool = True,
+) -> bytes:
+    """
+    Returns source, a path or image bytes, as a JPEG no larger than
+    max_dimension on either side. Orientation from EXIF is applied to the
+    pixels, so stripping metadata keeps the image upright.
+    """
+    _require_pillow()
+    with Image.open(source if isinstance(source, str) else BytesIO(source)) as image:
+        exif = image.info.get("exif")
+        icc_profile = image.info.get("icc_profile")
+        image = ImageOps.exif_transpose(image)
+        if max_dimension:
+            image.thumbnail((max_dimension, max_dimension))
+        image = _flatten(image)
+
+        options = {"quality": quality, "optimize": True}
+        if not strip_metadata:
+            if exif:
+                options["exif"] = exif
+            if icc_profile:
+                options["icc_profile"] = icc_profile
+
+        output = BytesIO()
+        image.save(output, format="JPEG", **options)
+        return output.getvalue()
+
+
+def make_thumbnail(
+    source: Union[str, bytes],
+    size: Tuple[int, int] = (400, 400),
+    max_bytes: int = 100 * 1024,
+) -> bytes:
+    """
+    Returns a JPEG thumbnail of source fitting size, recompressed until it
+    takes at most max_bytes, as Viber expects for message thumbnails.
+    """
+    _require_pillow()
+    with Image.open(source if isinstance(source, str) else BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        image = _flatten(image)
+
+        for quality in range(85, 0, -10):
+            output = BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+            if output.tell() <= max_bytes:
+                break
+        return output.getvalue()
+
+
+def _source_key(source: Source) -> Tuple[str, Union[str, bytes]]:
+    """
+    Returns the cache key of source and source itself as a path or bytes,
+    paths are sent to workers as is so files are read there.
+    """
+    if isinstance(source, str):
+        stat = os.stat(source)
+        return f"{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size}", source
+    if isinstance(source, (bytearray, memoryview)):
+        # sent to workers, so it has to be picklable
+        source = bytes(source)
+    elif not isinstance(source, bytes):
+        # the caller may still read the file, e.g. to upload the original
+        position = source.tell()
+        data = source.read()
+        source.seek(position)
+        source = data
+    return hashlib.sha256(source).hexdigest(), source
+
+
+class ImagePreprocessor:
+    """
+    Prepares photos before upload: resizes them to max_dimension, recompresses
+    them to JPEG with quality and strips metadata. Async methods run Pillow
+    in executor, a process pool by default, so the event loop is not blocked.
+
+    Results are cached for up to cache_size sources: bytes and file objects
+    by the sha256 of their content, paths by path, mtime and size. Concurrent
+    async calls for the same source wait for one processing.
+    """
+
+    def __init__(
+        self,
+        max_dimension: Optional[int] = 2560,
+        quality: int = 85,
+        strip_metadata: bool = True,
+        thumbnail_size: Tuple[int, int] = (400, 400),
+        thumbnail_max_bytes: int = 100 * 1024,
+        executor: Optional[Executor] = None,
+        max_workers: Optional[int] = None,
+        cache_size: int = 128,
+    ):
+        _require_pillow()
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.strip_metadata = strip_metadata
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_max_bytes = thumbnail_max_bytes
+        self.executor = executor
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._own_executor = executor is None
+
+        self.cache = OrderedDict()
+        self._pending = {}
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: str, result: bytes):
+        self.cache[key] = result
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _image_args(self, source) -> tuple:
+        return (process_image, source, self.max_dimension, self.quality, self.strip_metadata)
+
+    def _thumbnail_args(self, source) -> tuple:
+        return (make_thumbnail, source, self.thumbnail_size, self.thumbnail_max_bytes)
+
+    def _sync_run(self, kind: str, source: Source, args) -> bytes:
+        key, source = _source_key(source)
+        key = f"{kind}:{key}"
+        result = self._cache_get(key)
+        if result is None:
+            func, *func_args = args(source)
+            result = func(*func_args)
+            self._cache_put(key, result)
+        return result
+
+    def _finish(self, key: str, future: asyncio.Future):
+        del self._pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self._cache_put(key, future.result())
+
+    async def _async_run(self, kind: str, source: Source, args) -> bytes:
+        loop = asyncio.get_running_loop()
+        # reading and hashing large sources would block the loop, the default
+        # thread pool is used since file objects can not be sent to processes
+        key, source = await loop.run_in_executor(None, _source_key, source)
+        key = f"{kind}:{key}"
+        result = self._cache_get(key)
+        if result is not None:
+            return result
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = loop.run_in_executor(self._get_executor(), *args(source))
+            self._pending[key] = pending
+            pending.add_done_callback(functools.partial(self._finish, key))
+        # cancelling one caller must not cancel the job the others wait for
+        return await asyncio.shield(pending)
+
+    def sync_process(self, source: Source) -> bytes:
+        return self._sync_run("image", source, self._image_args)
+
+    async def async_process(self, source: Source) -> bytes:
+        return await self._async_run("image", source, self._image_args)
+
+    def sync_thumbnail(self, source: Source) -> bytes:
+        return self._sync_run("thumbnail", source, self._thumbnail_args)
+
+    async def async_thumbnail(self, source: Source) -> bytes:
+        return await self._async_run("thumbnail", source, self._thumbnail_args)
+
+    def close(self):
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
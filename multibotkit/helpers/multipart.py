@@ -0,0 +1,217 @@
+import mimetypes
+import os
+import uuid
+from io import BytesIO
+from typing import AsyncIterable, AsyncIterator, Iterator, Optional, Union
+
+import aiofiles
+
+
+CHUNK_SIZE = 64 * 1024
+
+_FORM_PARAM_REPLACEMENTS = {'"': "%22", "\\": "\\\\", "\r": "%0D", "\n": "%0A"}
+
+
+class LocalFile:
+    """
+    File on disk uploaded by async helpers without loading it into memory:
+    it is read in chunks while the request body is being sent.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ):
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.content_type = content_type
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path, "rb") as f:
+            while True:
+                chunk = await f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class StreamFile:
+    """
+    File uploaded by async helpers from an async iterable of chunks, such as
+    a download in progress. Chunks can be read once, so a request sending
+    it can not be retried. Without size the request has no Content-Length
+    and is sent with chunked transfer encoding.
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str = "file",
+        size: Optional[int] = None,
+        content_type: Optional[str] = None,
+    ):
+        self.chunks = chunks
+        self.filename = filename
+        self.size = size
+        self.content_type = content_type
+        self._consumed = False
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        if self._consumed:
+            raise RuntimeError(f"{self.filename} was already sent, StreamFile is read once")
+        self._consumed = True
+        async for chunk in self.chunks:
+            yield chunk
+
+
+STREAMED_FILES = (LocalFile, StreamFile)
+
+BYTES_LIKE = (bytes, bytearray, memoryview)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _byte_view(value) -> memoryview:
+    view = memoryview(value)
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+def _iter_views(view: memoryview) -> Iterator[memoryview]:
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE]
+
+
+def _form_param(name: str, value: str) -> bytes:
+    for char, replacement in _FORM_PARAM_REPLACEMENTS.items():
+        value = value.replace(char, replacement)
+    return f'{name}="{value}"'.encode()
+
+
+def _to_str(value) -> str:
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _file_size(file) -> Optional[int]:
+    if isinstance(file, STREAMED_FILES):
+        return file.size
+    if isinstance(file, str):
+        return len(file.encode())
+    if isinstance(file, BYTES_LIKE):
+        return memoryview(file).nbytes
+    # file objects are sent from the start, see AsyncMultipartStream.__aiter__
+    try:
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+class AsyncMultipartStream:
+    """
+    multipart/form-data body, same as httpx builds from data and files,
+    streamed chunk by chunk. Files may be LocalFile, StreamFile, bytes-like objects or
+    file objects, alone or as (filename, file) / (filename, file, content_type)
+    tuples. Unless it has StreamFile files the stream can be iterated again,
+    so requests sending it can be retried.
+
+    bytes-like objects and BytesIO buffers are sent as memoryview slices,
+    without copying them. The length of file objects is found by seeking,
+    so the body has a Content-Length whenever it is possible.
+    """
+
+    def __init__(self, data: Optional[dict], files: dict):
+        self.boundary = uuid.uuid4().hex
+        self._parts = []
+
+        for name, value in (data or {}).items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                headers = b"Content-Disposition: form-data; " + _form_param("name", name)
+                self._parts.append((headers + b"\r\n\r\n", _to_str(item).encode()))
+
+        for name, value in files.items():
+            content_type = None
+            if isinstance(value, tuple):
+                filename, file = value[0], value[1]
+                if len(value) > 2:
+                    content_type = value[2]
+            elif isinstance(value, STREAMED_FILES):
+                filename, file = value.filename, value
+            else:
+                filename, file = os.path.basename(str(getattr(value, "name", "upload"))), value
+
+            if content_type is None and isinstance(file, STREAMED_FILES):
+                content_type = file.content_type
+            if content_type is None:
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+            headers = b"".join(
+                [
+                    b"Content-Disposition: form-data; ",
+                    _form_param("name", name),
+                    b"; ",
+                    _form_param("filename", filename),
+                    b"\r\nContent-Type: ",
+                    content_type.encode(),
+                    b"\r\n\r\n",
+                ]
+            )
+            self._parts.append((headers, file))
+
+    @property
+    def headers(self) -> dict:
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        length = self._content_length()
+        if length is not None:
+            headers["Content-Length"] = str(length)
+        return headers
+
+    def _content_length(self) -> Optional[int]:
+        delimiter = len(self.boundary) + 6  # --boundary\r\n ... \r\n
+        length = len(self.boundary) + 6  # --boundary--\r\n
+        for headers, body in self._parts:
+            size = _file_size(body)
+            if size is None:
+                return None
+            length += delimiter + len(headers) + size
+        return length
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        boundary = self.boundary.encode()
+        for headers, body in self._parts:
+            yield b"--" + boundary + b"\r\n" + headers
+            if isinstance(body, STREAMED_FILES):
+                async for chunk in body.iter_chunks():
+                    yield chunk
+            elif isinstance(body, BYTES_LIKE):
+                for chunk in _iter_views(_byte_view(body)):
+                    yield chunk
+            elif isinstance(body, str):
+                yield body.encode()
+            elif isinstance(body, BytesIO):
+                for chunk in _iter_views(body.getbuffer()):
+                    yield chunk
+            else:
+                if hasattr(body, "seek"):
+                    body.seek(0)
+                while True:
+                    chunk = body.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk.encode() if isinstance(chunk, str) else chunk
+            yield b"\r\n"
+        yield b"--" + boundary + b"--\r\n"
@@ -0,0 +1,70 @@
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from multibotkit.helpers.multipart import StreamFile
+
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def buffered(chunks: AsyncIterable[bytes], max_chunks: int = 16) -> AsyncIterator[bytes]:
+    """
+    Yields chunks read ahead by a separate task into a queue of at most
+    max_chunks chunks, so the source is read while the consumer is busy
+    and at most max_chunks chunks are held in memory. Errors of the source
+    are raised to the consumer, the source is cancelled when the consumer
+    stops early.
+    """
+    queue = asyncio.Queue(max_chunks)
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(_Failure(e))
+        else:
+            await queue.put(_END)
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
+
+
+async def relay(
+    chunks: AsyncIterable[bytes],
+    upload: Callable[[StreamFile], Awaitable[T]],
+    filename: str = "file",
+    size: Optional[int] = None,
+    content_type: Optional[str] = None,
+    max_chunks: int = 16,
+) -> T:
+    """
+    Uploads a file while it is being downloaded: chunks, e.g. from
+    TelegramHelper.async_iter_file, are passed to upload as a StreamFile
+    through a buffer of at most max_chunks chunks. The relay takes about as
+    long as the slower of the two transfers and never holds the whole file.
+
+    size, when known, is sent as the part length, so the upload has a
+    Content-Length; it must match the length of the downloaded file.
+    """
+    source = buffered(chunks, max_chunks)
+    try:
+        return await upload(StreamFile(source, filename, size, content_type))
+    finally:
+        await source.aclose()
@@ -1,17 +1,20 @@
+import asyncio
 import json
+import mmap
+import os
+from contextlib import ExitStack
 from io import BytesIO
-from typing import IO, List, Optional, Tuple, Union
+from typing import IO, AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple, TypeVar, Union
 
 import aiofiles
-import httpx
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
 
-from multibotkit.helpers.base_helper import BaseHelper
+from multibotkit.helpers.base_helper import BaseHelper, check_file_size
+from multibotkit.helpers.file_cache import DiskFileCache, iter_chunks, iter_mmap_chunks
+from multibotkit.helpers.media import ImagePreprocessor
+from multibotkit.helpers.multipart import Buffer, LocalFile, StreamFile
+from multibotkit.helpers.relay import relay
+from multibotkit.helpers.upload_cache import UploadCache, cached_upload, is_local_path
+from multibotkit.schemas.telegram.incoming import File
 from multibotkit.schemas.telegram.outgoing import (
     Animation,
     Audio,
@@ -38,15 +41,93 @@ from multibotkit.schemas.telegram.outgoing import (
 )
 
 
+MEDIA_GROUP_LIMIT = 10
+
+# strings sent to Telegram as is, file:// URIs are accepted by a local Bot API server
+URL_PREFIXES = ("http://", "https://", "file://")
+
+T = TypeVar("T")
+
+
+def _sent_file_id(field: str):
+    def extract(r: dict) -> Optional[str]:
+        if not isinstance(r, dict) or not r.get("ok"):
+            return None
+        media = r["result"].get(field)
+        if isinstance(media, list):
+            # photo sizes, the largest one is the last
+            media = media[-1] if media else None
+        return media.get("file_id") if media else None
+
+    return extract
+
+
+def _split_media_group(items: list) -> List[list]:
+    """
+    Splits items into consecutive groups of at most MEDIA_GROUP_LIMIT items,
+    as even as possible, since Telegram rejects groups of a single item.
+    """
+    count = max(-(-len(items) // MEDIA_GROUP_LIMIT), 1)
+    size, extra = divmod(len(items), count)
+    groups = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(items[start:end])
+        start = end
+    return groups
+
+
+def _merge_media_group_responses(responses: List[dict]) -> dict:
+    if len(responses) == 1 or not responses[-1].get("ok"):
+        return responses[-1]
+    return {"ok": True, "result": [message for r in responses for message in r["result"]]}
+
+
 class TelegramHelper(BaseHelper):
     """
     Sync and async functions for Telegram Bot API
+
+    With upload_cache local files and file objects sent as photos, videos,
+    documents, animations and audio are uploaded once, later sends of the
+    same file reuse the file_id returned by Telegram.
+    With image_preprocessor photos uploaded by send_photo are resized and
+    recompressed first. With file_cache downloaded files are kept on disk
+    and later reads of the same file do not download it again.
+
+    api_url is the Bot API server URL. With local_mode the helper works with
+    a local Bot API server (telegram-bot-api --local) sharing the file system
+    with the bot: local files are passed to it as file:// URIs instead of
+    being uploaded, and files are read from the paths getFile returns
+    instead of being downloaded.
     """
 
-    def __init__(self, token, proxy: Optional[str] = None):
-        super().__init__(proxy=proxy)
+    def __init__(
+        self,
+        token,
+        proxy: Optional[str] = None,
+        trusted: bool = False,
+        upload_cache: Optional[UploadCache] = None,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
+        file_cache: Optional[DiskFileCache] = None,
+        api_url: str = "https://api.telegram.org",
+        local_mode: bool = False,
+    ):
+        super().__init__(proxy=proxy, trusted=trusted)
         self.token = token
-        self.tg_base_url = f"https://api.telegram.org/bot{self.token}/"
+        self.api_url = api_url.rstrip("/")
+        self.local_mode = local_mode
+        self.upload_cache = upload_cache
+        self.image_preprocessor = image_preprocessor
+        self.file_cache = file_cache
+        # file_ids are valid only for the bot that uploaded the file
+        self.upload_namespace = f"telegram:{token.split(':')[0]}"
+        self.tg_base_url = f"{self.api_url}/bot{self.token}/"
+
+    def _local_file_uri(self, file):
+        if self.local_mode and is_local_path(file):
+            return "file://" + os.path.abspath(file)
+        return file
 
     def sync_get_webhook_info(self) -> Optional[WebhookInfo]:
         url = self.tg_base_url + "getWebhookInfo"
@@ -69,10 +150,11 @@ class TelegramHelper(BaseHelper):
         secret_token: Optional[str] = None,
     ):
         url = self.tg_base_url + "setWebhook"
-        params = SetWebhookParams(
+        params = self._build(
+            SetWebhookParams,
             url=webhook_url, allowed_updates=allowed_updates, secret_token=secret_token
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
         r = self._perform_sync_request(url, data)
         return r
 
@@ -83,24 +165,25 @@ class TelegramHelper(BaseHelper):
         secret_token: Optional[str] = None,
     ):
         url = self.tg_base_url + "setWebhook"
-        params = SetWebhookParams(
+        params = self._build(
+            SetWebhookParams,
             url=webhook_url, allowed_updates=allowed_updates, secret_token=secret_token
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
         r = await self._perform_async_request(url, data)
         return r
 
     def sync_delete_webhook(self, drop_pending_updates: Optional[bool] = False):
         url = self.tg_base_url + "deleteWebhook"
-        params = DeleteWebhookParams(drop_pending_updates=drop_pending_updates)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(DeleteWebhookParams, drop_pending_updates=drop_pending_updates)
+        data = self._dump(params)
         r = self._perform_sync_request(url, data)
         return r
 
     async def async_delete_webhook(self, drop_pending_updates: Optional[bool] = False):
         url = self.tg_base_url + "deleteWebhook"
-        params = DeleteWebhookParams(drop_pending_updates=drop_pending_updates)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(DeleteWebhookParams, drop_pending_updates=drop_pending_updates)
+        data = self._dump(params)
         r = await self._perform_async_request(url, data)
         return r
 
@@ -114,13 +197,14 @@ class TelegramHelper(BaseHelper):
         ] = None,
     ):
         url = self.tg_base_url + "sendLocation"
-        params = Location(
+        params = self._build(
+            Location,
             chat_id=chat_id,
             latitude=latitude,
             longitude=longitude,
             reply_markup=reply_markup,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
         r = self._perform_sync_request(url, data)
         return r
 
@@ -134,13 +218,14 @@ class TelegramHelper(BaseHelper):
         ] = None,
     ):
         url = self.tg_base_url + "sendLocation"
-        params = Location(
+        params = self._build(
+            Location,
             chat_id=chat_id,
             latitude=latitude,
             longitude=longitude,
             reply_markup=reply_markup,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
         r = await self._perform_async_request(url, data)
         return r
 
@@ -157,7 +242,8 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
     ):
         url = self.tg_base_url + "sendMessage"
-        message = Message(
+        message = self._build(
+            Message,
             chat_id=chat_id,
             text=text,
             disable_web_page_preview=disable_web_page_preview,
@@ -166,7 +252,7 @@ class TelegramHelper(BaseHelper):
             allow_sending_without_reply=allow_sending_without_reply,
         )
 
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         data.update({"parse_mode": parse_mode})
         r = self._perform_sync_request(url, data)
         return r
@@ -184,7 +270,8 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
     ):
         url = self.tg_base_url + "sendMessage"
-        message = Message(
+        message = self._build(
+            Message,
             chat_id=chat_id,
             text=text,
             disable_web_page_preview=disable_web_page_preview,
@@ -193,7 +280,7 @@ class TelegramHelper(BaseHelper):
             allow_sending_without_reply=allow_sending_without_reply,
         )
 
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         data.update({"parse_mode": parse_mode})
         r = await self._perform_async_request(url, data)
         return r
@@ -538,9 +625,9 @@ class TelegramHelper(BaseHelper):
         message_id: int,
     ):
         url = self.tg_base_url + "deleteMessage"
-        delete_message = DeleteMessage(chat_id=chat_id, message_id=message_id)
+        delete_message = self._build(DeleteMessage, chat_id=chat_id, message_id=message_id)
 
-        r = self._perform_sync_request(url, delete_message.model_dump())
+        r = self._perform_sync_request(url, self._dump(delete_message))
         return r
 
     async def async_delete_message(
@@ -549,9 +636,9 @@ class TelegramHelper(BaseHelper):
         message_id: int,
     ):
         url = self.tg_base_url + "deleteMessage"
-        delete_message = DeleteMessage(chat_id=chat_id, message_id=message_id)
+        delete_message = self._build(DeleteMessage, chat_id=chat_id, message_id=message_id)
 
-        r = await self._perform_async_request(url, delete_message.model_dump())
+        r = await self._perform_async_request(url, self._dump(delete_message))
         return r
 
     def sync_copy_message(
@@ -561,11 +648,12 @@ class TelegramHelper(BaseHelper):
         message_id: int,
     ):
         url = self.tg_base_url + "copyMessage"
-        copy_message = CopyMessage(
+        copy_message = self._build(
+            CopyMessage,
             chat_id=chat_id, message_id=message_id, from_chat_id=from_chat_id
         )
 
-        r = self._perform_sync_request(url, copy_message.model_dump())
+        r = self._perform_sync_request(url, self._dump(copy_message))
         return r
 
     async def async_copy_message(
@@ -575,11 +663,12 @@ class TelegramHelper(BaseHelper):
         message_id: int,
     ):
         url = self.tg_base_url + "copyMessage"
-        copy_message = CopyMessage(
+        copy_message = self._build(
+            CopyMessage,
             chat_id=chat_id, message_id=message_id, from_chat_id=from_chat_id
         )
 
-        r = await self._perform_async_request(url, copy_message.model_dump())
+        r = await self._perform_async_request(url, self._dump(copy_message))
         return r
 
     def sync_edit_message_text(
@@ -600,7 +689,7 @@ class TelegramHelper(BaseHelper):
             "link_preview_options": {"is_disabled": disable_web_page_preview},
         }
         if reply_markup:
-            data["reply_markup"] = reply_markup.model_dump(exclude_none=True)
+            data["reply_markup"] = self._dump(reply_markup)
 
         r = self._perform_sync_request(url, data)
         return r
@@ -623,7 +712,7 @@ class TelegramHelper(BaseHelper):
             "link_preview_options": {"is_disabled": disable_web_page_preview},
         }
         if reply_markup:
-            data["reply_markup"] = reply_markup.model_dump(exclude_none=True)
+            data["reply_markup"] = self._dump(reply_markup)
 
         r = await self._perform_async_request(url, data)
         return r
@@ -673,7 +762,7 @@ class TelegramHelper(BaseHelper):
             data = {
                 "chat_id": chat_id,
                 "message_id": message_id,
-                "reply_markup": reply_markup.model_dump(exclude_none=True),
+                "reply_markup": self._dump(reply_markup),
             }
         except AttributeError:
             data = {"chat_id": chat_id, "message_id": message_id, "reply_markup": {}}
@@ -691,7 +780,7 @@ class TelegramHelper(BaseHelper):
             data = {
                 "chat_id": chat_id,
                 "message_id": message_id,
-                "reply_markup": reply_markup.model_dump(exclude_none=True),
+                "reply_markup": self._dump(reply_markup),
             }
         except AttributeError:
             data = {"chat_id": chat_id, "message_id": message_id, "reply_markup": {}}
@@ -709,12 +798,15 @@ class TelegramHelper(BaseHelper):
         inline_message_id: Optional[Union[int, str]] = None,
         parse_mode: Optional[str] = "HTML",
     ):
+        media = self._local_file_uri(media)
         if type(media) is str:
-            if media.startswith("http://") or media.startswith("https://"):
-                media_obj = InputMedia(
+            if media.startswith(URL_PREFIXES):
+                media_obj = self._build(
+                    InputMedia,
                     type=media_type, media=media, caption=caption, parse_mode=parse_mode
                 )
-                data_obj = EditMessageMediaModel(
+                data_obj = self._build(
+                    EditMessageMediaModel,
                     chat_id=chat_id,
                     message_id=message_id,
                     inline_message_id=inline_message_id,
@@ -723,7 +815,7 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "editMessageMedia"
-                data = data_obj.model_dump(exclude_none=True)
+                data = self._dump(data_obj)
 
                 r = self._perform_sync_request(url, data)
                 return r
@@ -733,13 +825,15 @@ class TelegramHelper(BaseHelper):
                 if media.endswith(end):
                     opened_media = open(media, "rb")
 
-                    media_obj = InputMedia(
+                    media_obj = self._build(
+                        InputMedia,
                         type=media_type,
                         media=f"attach://{media}",
                         caption=caption,
                         parse_mode=parse_mode,
                     )
-                    data_obj = EditMessageMediaModel(
+                    data_obj = self._build(
+                        EditMessageMediaModel,
                         chat_id=chat_id,
                         message_id=message_id,
                         inline_message_id=inline_message_id,
@@ -748,10 +842,10 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "editMessageMedia"
-                    data = data_obj.model_dump(exclude_none=True)
+                    data = self._dump(data_obj)
                     data["media"] = json.dumps(data["media"])
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {media: opened_media}
 
                     r = self._perform_sync_request(
@@ -759,10 +853,12 @@ class TelegramHelper(BaseHelper):
                     )
                     return r
 
-            media_obj = InputMedia(
+            media_obj = self._build(
+                InputMedia,
                 type=media_type, media=media, caption=caption, parse_mode=parse_mode
             )
-            data_obj = EditMessageMediaModel(
+            data_obj = self._build(
+                EditMessageMediaModel,
                 chat_id=chat_id,
                 message_id=message_id,
                 inline_message_id=inline_message_id,
@@ -771,18 +867,20 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "editMessageMedia"
-            data = data_obj.model_dump(exclude_none=True)
+            data = self._dump(data_obj)
 
             r = self._perform_sync_request(url, data)
             return r
 
-        media_obj = InputMedia(
+        media_obj = self._build(
+            InputMedia,
             type=media_type,
             media="attach://media",
             caption=caption,
             parse_mode=parse_mode,
         )
-        data_obj = EditMessageMediaModel(
+        data_obj = self._build(
+            EditMessageMediaModel,
             chat_id=chat_id,
             message_id=message_id,
             inline_message_id=inline_message_id,
@@ -791,10 +889,10 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "editMessageMedia"
-        data = data_obj.model_dump(exclude_none=True)
+        data = self._dump(data_obj)
         data["media"] = json.dumps(data["media"])
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"media": media}
 
         r = self._perform_sync_request(url, data, use_json=False, files=files)
@@ -811,12 +909,15 @@ class TelegramHelper(BaseHelper):
         inline_message_id: Optional[Union[int, str]] = None,
         parse_mode: Optional[str] = "HTML",
     ):
+        media = self._local_file_uri(media)
         if type(media) is str:
-            if media.startswith("http://") or media.startswith("https://"):
-                media_obj = InputMedia(
+            if media.startswith(URL_PREFIXES):
+                media_obj = self._build(
+                    InputMedia,
                     type=media_type, media=media, caption=caption, parse_mode=parse_mode
                 )
-                data_obj = EditMessageMediaModel(
+                data_obj = self._build(
+                    EditMessageMediaModel,
                     chat_id=chat_id,
                     message_id=message_id,
                     inline_message_id=inline_message_id,
@@ -825,7 +926,7 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "editMessageMedia"
-                data = data_obj.model_dump(exclude_none=True)
+                data = self._dump(data_obj)
 
                 r = await self._perform_async_request(url, data)
                 return r
@@ -833,15 +934,17 @@ class TelegramHelper(BaseHelper):
             ends = [".jpg", ".jpeg", ".gif", ".png"]
             for end in ends:
                 if media.endswith(end):
-                    opened_media = open(media, "rb")
+                    opened_media = LocalFile(media)
 
-                    media_obj = InputMedia(
+                    media_obj = self._build(
+                        InputMedia,
                         type=media_type,
                         media=f"attach://{media}",
                         caption=caption,
                         parse_mode=parse_mode,
                     )
-                    data_obj = EditMessageMediaModel(
+                    data_obj = self._build(
+                        EditMessageMediaModel,
                         chat_id=chat_id,
                         message_id=message_id,
                         inline_message_id=inline_message_id,
@@ -850,10 +953,10 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "editMessageMedia"
-                    data = data_obj.model_dump(exclude_none=True)
+                    data = self._dump(data_obj)
                     data["media"] = json.dumps(data["media"])
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {media: opened_media}
 
                     r = await self._perform_async_request(
@@ -861,10 +964,12 @@ class TelegramHelper(BaseHelper):
                     )
                     return r
 
-            media_obj = InputMedia(
+            media_obj = self._build(
+                InputMedia,
                 type=media_type, media=media, caption=caption, parse_mode=parse_mode
             )
-            data_obj = EditMessageMediaModel(
+            data_obj = self._build(
+                EditMessageMediaModel,
                 chat_id=chat_id,
                 message_id=message_id,
                 inline_message_id=inline_message_id,
@@ -873,18 +978,20 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "editMessageMedia"
-            data = data_obj.model_dump(exclude_none=True)
+            data = self._dump(data_obj)
 
             r = await self._perform_async_request(url, data)
             return r
 
-        media_obj = InputMedia(
+        media_obj = self._build(
+            InputMedia,
             type=media_type,
             media="attach://media",
             caption=caption,
             parse_mode=parse_mode,
         )
-        data_obj = EditMessageMediaModel(
+        data_obj = self._build(
+            EditMessageMediaModel,
             chat_id=chat_id,
             message_id=message_id,
             inline_message_id=inline_message_id,
@@ -893,15 +1000,16 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "editMessageMedia"
-        data = data_obj.model_dump(exclude_none=True)
+        data = self._dump(data_obj)
         data["media"] = json.dumps(data["media"])
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"media": media}
 
         r = await self._perform_async_request(url, data, use_json=False, files=files)
         return r
 
+    @cached_upload("photo", "photo", _sent_file_id("photo"))
     def sync_send_photo(
         self,
         chat_id: int,
@@ -914,9 +1022,12 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
+        photo = self._local_file_uri(self._sync_prepare_photo(photo))
+
         if type(photo) is str:
-            if photo.startswith("http://") or photo.startswith("https://"):
-                photo_obj = Photo(
+            if photo.startswith(URL_PREFIXES):
+                photo_obj = self._build(
+                    Photo,
                     chat_id=chat_id,
                     photo=photo,
                     caption=caption,
@@ -929,7 +1040,7 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "sendPhoto"
-                data = photo_obj.model_dump(exclude_none=True)
+                data = self._dump(photo_obj)
 
                 r = self._perform_sync_request(url, data)
                 return r
@@ -938,7 +1049,8 @@ class TelegramHelper(BaseHelper):
             for end in ends:
                 if photo.endswith(end):
                     opened_photo = open(photo, "rb")
-                    photo_obj = Photo(
+                    photo_obj = self._build(
+                        Photo,
                         chat_id=chat_id,
                         photo=f"attach://{photo}",
                         caption=caption,
@@ -951,9 +1063,9 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "sendPhoto"
-                    data = photo_obj.model_dump(exclude_none=True)
+                    data = self._dump(photo_obj)
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {photo: opened_photo}
 
                     r = self._perform_sync_request(
@@ -961,7 +1073,8 @@ class TelegramHelper(BaseHelper):
                     )
                     return r
 
-            photo_obj = Photo(
+            photo_obj = self._build(
+                Photo,
                 chat_id=chat_id,
                 photo=photo,
                 caption=caption,
@@ -974,12 +1087,13 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "sendPhoto"
-            data = photo_obj.model_dump(exclude_none=True)
+            data = self._dump(photo_obj)
 
             r = self._perform_sync_request(url, data)
             return r
 
-        photo_obj = Photo(
+        photo_obj = self._build(
+            Photo,
             chat_id=chat_id,
             photo="attach://image",
             caption=caption,
@@ -992,18 +1106,19 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendPhoto"
-        data = photo_obj.model_dump(exclude_none=True)
+        data = self._dump(photo_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"image": photo}
 
         r = self._perform_sync_request(url, data, use_json=False, files=files)
         return r
 
+    @cached_upload("photo", "photo", _sent_file_id("photo"))
     async def async_send_photo(
         self,
         chat_id: int,
-        photo: Union[str, IO],
+        photo: Union[str, IO, Buffer],
         caption: Optional[str] = None,
         parse_mode: str = "HTML",
         disable_notification: Optional[bool] = None,
@@ -1012,9 +1127,12 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
+        photo = self._local_file_uri(await self._async_prepare_photo(photo))
+
         if type(photo) is str:
-            if photo.startswith("http://") or photo.startswith("https://"):
-                photo_obj = Photo(
+            if photo.startswith(URL_PREFIXES):
+                photo_obj = self._build(
+                    Photo,
                     chat_id=chat_id,
                     photo=photo,
                     caption=caption,
@@ -1027,16 +1145,16 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "sendPhoto"
-                data = photo_obj.model_dump(exclude_none=True)
+                data = self._dump(photo_obj)
                 r = await self._perform_async_request(url, data)
                 return r
 
             ends = [".jpg", ".jpeg", ".gif", ".png"]
             for end in ends:
                 if photo.endswith(end):
-                    async with aiofiles.open(photo, "rb") as opened_photo:
-                        content = await opened_photo.read()
-                    photo_obj = Photo(
+                    content = LocalFile(photo)
+                    photo_obj = self._build(
+                        Photo,
                         chat_id=chat_id,
                         photo=f"attach://{photo}",
                         caption=caption,
@@ -1049,16 +1167,17 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "sendPhoto"
-                    data = photo_obj.model_dump(exclude_none=True)
+                    data = self._dump(photo_obj)
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {photo: content}
                     r = await self._perform_async_request(
                         url, data, use_json=False, files=files
                     )
                     return r
 
-            photo_obj = Photo(
+            photo_obj = self._build(
+                Photo,
                 chat_id=chat_id,
                 photo=photo,
                 caption=caption,
@@ -1071,11 +1190,12 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "sendPhoto"
-            data = photo_obj.model_dump(exclude_none=True)
+            data = self._dump(photo_obj)
             r = await self._perform_async_request(url, data)
             return r
 
-        photo_obj = Photo(
+        photo_obj = self._build(
+            Photo,
             chat_id=chat_id,
             photo="attach://image",
             caption=caption,
@@ -1088,13 +1208,14 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendPhoto"
-        data = photo_obj.model_dump(exclude_none=True)
+        data = self._dump(photo_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"image": photo}
         r = await self._perform_async_request(url, data, use_json=False, files=files)
         return r
 
+    @cached_upload("video", "video", _sent_file_id("video"))
     def sync_send_video(
         self,
         chat_id: int,
@@ -1107,9 +1228,11 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
+        video = self._local_file_uri(video)
         if type(video) is str:
-            if video.startswith("http://") or video.startswith("https://"):
-                video_obj = Video(
+            if video.startswith(URL_PREFIXES):
+                video_obj = self._build(
+                    Video,
                     chat_id=chat_id,
                     video=video,
                     caption=caption,
@@ -1122,7 +1245,7 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "sendVideo"
-                data = video_obj.model_dump(exclude_none=True)
+                data = self._dump(video_obj)
 
                 r = self._perform_sync_request(url, data)
                 return r
@@ -1131,7 +1254,8 @@ class TelegramHelper(BaseHelper):
             for end in ends:
                 if video.endswith(end):
                     opened_video = open(video, "rb")
-                    video_obj = Video(
+                    video_obj = self._build(
+                        Video,
                         chat_id=chat_id,
                         video=f"attach://{video}",
                         caption=caption,
@@ -1144,9 +1268,9 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "sendVideo"
-                    data = video_obj.model_dump(exclude_none=True)
+                    data = self._dump(video_obj)
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {video: opened_video}
 
                     r = self._perform_sync_request(
@@ -1154,7 +1278,8 @@ class TelegramHelper(BaseHelper):
                     )
                     return r
 
-            video_obj = Video(
+            video_obj = self._build(
+                Video,
                 chat_id=chat_id,
                 video=video,
                 caption=caption,
@@ -1167,12 +1292,13 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "sendVideo"
-            data = video_obj.model_dump(exclude_none=True)
+            data = self._dump(video_obj)
 
             r = self._perform_sync_request(url, data)
             return r
 
-        video_obj = Video(
+        video_obj = self._build(
+            Video,
             chat_id=chat_id,
             video="attach://video",
             caption=caption,
@@ -1185,14 +1311,15 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendVideo"
-        data = video_obj.model_dump(exclude_none=True)
+        data = self._dump(video_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"video": video}
 
         r = self._perform_sync_request(url, data, use_json=False, files=files)
         return r
 
+    @cached_upload("video", "video", _sent_file_id("video"))
     async def async_send_video(
         self,
         chat_id: int,
@@ -1205,9 +1332,11 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
+        video = self._local_file_uri(video)
         if type(video) is str:
-            if video.startswith("http://") or video.startswith("https://"):
-                video_obj = Video(
+            if video.startswith(URL_PREFIXES):
+                video_obj = self._build(
+                    Video,
                     chat_id=chat_id,
                     video=video,
                     caption=caption,
@@ -1220,16 +1349,16 @@ class TelegramHelper(BaseHelper):
                 )
 
                 url = self.tg_base_url + "sendVideo"
-                data = video_obj.model_dump(exclude_none=True)
+                data = self._dump(video_obj)
                 r = await self._perform_async_request(url, data)
                 return r
 
             ends = [".mp4"]
             for end in ends:
                 if video.endswith(end):
-                    async with aiofiles.open(video, "rb") as opened_video:
-                        content = await opened_video.read()
-                    video_obj = Video(
+                    content = LocalFile(video)
+                    video_obj = self._build(
+                        Video,
                         chat_id=chat_id,
                         video=f"attach://{video}",
                         caption=caption,
@@ -1242,16 +1371,17 @@ class TelegramHelper(BaseHelper):
                     )
 
                     url = self.tg_base_url + "sendVideo"
-                    data = video_obj.model_dump(exclude_none=True)
+                    data = self._dump(video_obj)
                     if "reply_markup" in data.keys():
-                        data["reply_markup"] = json.dumps(data["reply_markup"])
+                        data["reply_markup"] = self._json(data["reply_markup"])
                     files = {video: content}
                     r = await self._perform_async_request(
                         url, data, use_json=False, files=files
                     )
                     return r
 
-            video_obj = Video(
+            video_obj = self._build(
+                Video,
                 chat_id=chat_id,
                 video=video,
                 caption=caption,
@@ -1264,11 +1394,12 @@ class TelegramHelper(BaseHelper):
             )
 
             url = self.tg_base_url + "sendVideo"
-            data = video_obj.model_dump(exclude_none=True)
+            data = self._dump(video_obj)
             r = await self._perform_async_request(url, data)
             return r
 
-        video_obj = Video(
+        video_obj = self._build(
+            Video,
             chat_id=chat_id,
             video="attach://video",
             caption=caption,
@@ -1281,13 +1412,14 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendVideo"
-        data = video_obj.model_dump(exclude_none=True)
+        data = self._dump(video_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
         files = {"video": video}
         r = await self._perform_async_request(url, data, use_json=False, files=files)
         return r
 
+    @cached_upload("document", "document", _sent_file_id("document"), name_arg="file_name")
     def sync_send_document(
         self,
         chat_id: int,
@@ -1304,8 +1436,9 @@ class TelegramHelper(BaseHelper):
         files = {}
         document_str = None
 
+        document = self._local_file_uri(document)
         if type(document) is str:
-            if not (document.startswith("http://") or document.startswith("https://")):
+            if not document.startswith(URL_PREFIXES):
                 ends = [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx"]
                 for end in ends:
                     if document.endswith(end):
@@ -1320,7 +1453,8 @@ class TelegramHelper(BaseHelper):
             document_str = "attach://document"
             files["document"] = (file_name if file_name else "file", document)
 
-        document_obj = Document(
+        document_obj = self._build(
+            Document,
             chat_id=chat_id,
             document=document_str,
             caption=caption,
@@ -1333,9 +1467,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendDocument"
-        data = document_obj.model_dump(exclude_none=True)
+        data = self._dump(document_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         if len(files.keys()):
             r = self._perform_sync_request(url, data, use_json=False, files=files)
@@ -1344,6 +1478,7 @@ class TelegramHelper(BaseHelper):
         r = self._perform_sync_request(url, data)
         return r
 
+    @cached_upload("document", "document", _sent_file_id("document"), name_arg="file_name")
     async def async_send_document(
         self,
         chat_id: int,
@@ -1360,14 +1495,15 @@ class TelegramHelper(BaseHelper):
         files = {}
         document_str = None
 
+        document = self._local_file_uri(document)
         if type(document) is str:
-            if not (document.startswith("http://") or document.startswith("https://")):
+            if not document.startswith(URL_PREFIXES):
                 ends = [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx"]
                 for end in ends:
                     if document.endswith(end):
                         files["document"] = (
                             file_name if file_name else document,
-                            open(document, "rb"),
+                            LocalFile(document),
                         )
                         document_str = "attach://document"
             if document_str is None:
@@ -1376,7 +1512,8 @@ class TelegramHelper(BaseHelper):
             document_str = "attach://document"
             files["document"] = (file_name if file_name else "file", document)
 
-        document_obj = Document(
+        document_obj = self._build(
+            Document,
             chat_id=chat_id,
             document=document_str,
             caption=caption,
@@ -1389,10 +1526,10 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendDocument"
-        data = document_obj.model_dump(exclude_none=True)
+        data = self._dump(document_obj)
 
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         if len(files.keys()):
             r = await self._perform_async_request(
@@ -1403,159 +1540,371 @@ class TelegramHelper(BaseHelper):
         r = await self._perform_async_request(url, data)
         return r
 
-    @retry(
-        retry=retry_if_exception_type(httpx.HTTPError),
-        reraise=True,
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-    )
+    def sync_get_file_info(self, file_id: str) -> File:
+        url = self.tg_base_url + "getFile"
+        data = {"file_id": file_id}
+        r = self._perform_sync_request(url, data)
+        return File(**r["result"])
+
+    async def async_get_file_info(self, file_id: str) -> File:
+        url = self.tg_base_url + "getFile"
+        data = {"file_id": file_id}
+        r = await self._perform_async_request(url, data)
+        return File(**r["result"])
+
+    def file_url(self, file_path: str) -> str:
+        return f"{self.api_url}/file/bot{self.token}/{file_path}"
+
+    def _local_path(self, file_path: Optional[str]) -> Optional[str]:
+        # a local server returns absolute paths of files on its disk
+        if self.local_mode and file_path and os.path.isabs(file_path):
+            return file_path
+        return None
+
+    def _sync_iter_remote_file(
+        self, file: Union[str, File], max_size: Optional[int], chunk_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        if not isinstance(file, File):
+            file = self.sync_get_file_info(file)
+        check_file_size(file.file_size, max_size)
+        path = self._local_path(file.file_path)
+        if path is not None:
+            check_file_size(os.path.getsize(path), max_size)
+            return iter_mmap_chunks(path, chunk_size)
+        return self._sync_iter_download(self.file_url(file.file_path), max_size, chunk_size)
+
+    async def _async_iter_remote_file(
+        self, file: Union[str, File], max_size: Optional[int], chunk_size: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        if not isinstance(file, File):
+            file = await self.async_get_file_info(file)
+        check_file_size(file.file_size, max_size)
+        path = self._local_path(file.file_path)
+        if path is not None:
+            check_file_size(os.path.getsize(path), max_size)
+            for chunk in iter_mmap_chunks(path, chunk_size):
+                yield chunk
+            return
+        async for chunk in self._async_iter_download(
+            self.file_url(file.file_path), max_size, chunk_size
+        ):
+            yield chunk
+
+    def _file_cache_key(self, file: Union[str, File]) -> str:
+        return "telegram:" + (file.file_unique_id if isinstance(file, File) else file)
+
+    def _sync_cache_download(self, file: Union[str, File], max_size: Optional[int]):
+        return lambda f: self._sync_write_chunks(self._sync_iter_remote_file(file, max_size), f)
+
+    def _async_cache_download(self, file: Union[str, File], max_size: Optional[int]):
+        return lambda f: self._async_write_chunks(self._async_iter_remote_file(file, max_size), f)
+
+    def sync_cache_file(self, file: Union[str, File], max_size: Optional[int] = None) -> str:
+        """
+        Returns the path of file in file_cache, the file is downloaded only
+        if it is not cached yet. Files are cached by file_unique_id when file
+        is a File and by file_id otherwise. The file may be evicted once
+        other files are cached, sync_iter_file reads it safely.
+        """
+        path = self.file_cache.sync_fetch(
+            self._file_cache_key(file), self._sync_cache_download(file, max_size)
+        )
+        check_file_size(os.path.getsize(path), max_size)
+        return path
+
+    async def async_cache_file(self, file: Union[str, File], max_size: Optional[int] = None) -> str:
+        path = await self.file_cache.async_fetch(
+            self._file_cache_key(file), self._async_cache_download(file, max_size)
+        )
+        check_file_size(os.path.getsize(path), max_size)
+        return path
+
+    def _sync_open_cached_file(self, file: Union[str, File], max_size: Optional[int] = None):
+        data = self.file_cache.sync_open(
+            self._file_cache_key(file), self._sync_cache_download(file, max_size)
+        )
+        return self._checked_cached_file(data, max_size)
+
+    async def _async_open_cached_file(
+        self, file: Union[str, File], max_size: Optional[int] = None
+    ):
+        data = await self.file_cache.async_open(
+            self._file_cache_key(file), self._async_cache_download(file, max_size)
+        )
+        return self._checked_cached_file(data, max_size)
+
+    def _checked_cached_file(self, data, max_size: Optional[int]):
+        try:
+            check_file_size(len(data), max_size)
+        except Exception:
+            if isinstance(data, mmap.mmap):
+                data.close()
+            raise
+        return data
+
+    def sync_iter_file(
+        self,
+        file: Union[str, File],
+        max_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        Yields the content of file chunk by chunk. file is a file_id or a File
+        from get_file_info, with a File no getFile request is made.
+        Raises FileTooLargeError as soon as the file is known to be larger
+        than max_size. An interrupted download is resumed, not restarted.
+        With file_cache the file is read from the cache through mmap.
+        """
+        if self.file_cache is not None:
+            return iter_chunks(self._sync_open_cached_file(file, max_size), chunk_size)
+        return self._sync_iter_remote_file(file, max_size, chunk_size)
+
+    async def async_iter_file(
+        self,
+        file: Union[str, File],
+        max_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        if self.file_cache is not None:
+            data = await self._async_open_cached_file(file, max_size)
+            for chunk in iter_chunks(data, chunk_size):
+                yield chunk
+            return
+        async for chunk in self._async_iter_remote_file(file, max_size, chunk_size):
+            yield chunk
+
+    def sync_download_file(
+        self, file: Union[str, File], destination, max_size: Optional[int] = None
+    ) -> int:
+        """
+        Writes the content of file to destination, a path or a file object,
+        and returns its size.
+        """
+        return self._sync_write_chunks(self.sync_iter_file(file, max_size), destination)
+
+    async def async_download_file(
+        self, file: Union[str, File], destination, max_size: Optional[int] = None
+    ) -> int:
+        return await self._async_write_chunks(
+            self.async_iter_file(file, max_size), destination
+        )
+
+    async def async_relay_file(
+        self,
+        file: Union[str, File],
+        upload: Callable[[StreamFile], Awaitable[T]],
+        filename: Optional[str] = None,
+        max_size: Optional[int] = None,
+        max_chunks: int = 16,
+    ) -> T:
+        """
+        Passes file to upload as a StreamFile read while it is being
+        downloaded, see relay. upload is usually another helper method, e.g.
+        lambda photo: vk_helper.async_get_photo_attachment(photo, "photo.jpg").
+        filename defaults to the name of the file on Telegram servers.
+        """
+        if not isinstance(file, File):
+            file = await self.async_get_file_info(file)
+        return await relay(
+            self.async_iter_file(file, max_size),
+            upload,
+            filename=filename or os.path.basename(file.file_path or "") or "file",
+            size=file.file_size,
+            max_chunks=max_chunks,
+        )
+
     def sync_get_file(self, file_id: str):
+        if self.file_cache is not None:
+            return BytesIO(b"".join(iter_chunks(self._sync_open_cached_file(file_id))))
 
         url = self.tg_base_url + "getFile"
         data = {"file_id": file_id}
         r = self._perform_sync_request(url, data)
 
         file_path = r["result"]["file_path"]
-        download_url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
+        local_path = self._local_path(file_path)
+        if local_path is not None:
+            with open(local_path, "rb") as f:
+                return BytesIO(f.read())
+        download_url = self.file_url(file_path)
 
         io_object = BytesIO()
-        with self._sync_stream(method="GET", url=download_url) as result:
-            for data in result.iter_bytes():
-                io_object.write(data)
+        self._sync_write_chunks(self._sync_iter_download(download_url), io_object)
         io_object.seek(0)
 
         return io_object
 
-    @retry(
-        retry=retry_if_exception_type(httpx.HTTPError),
-        reraise=True,
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-    )
     async def async_get_file(self, file_id: str):
+        if self.file_cache is not None:
+            data = await self._async_open_cached_file(file_id)
+            return BytesIO(b"".join(iter_chunks(data)))
 
         url = self.tg_base_url + "getFile"
         data = {"file_id": file_id}
         r = await self._perform_async_request(url, data)
 
         file_path = r["result"]["file_path"]
-        download_url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
+        local_path = self._local_path(file_path)
+        if local_path is not None:
+            async with aiofiles.open(local_path, "rb") as f:
+                return BytesIO(await f.read())
+        download_url = self.file_url(file_path)
         io_object = BytesIO()
-        async with self._get_async_client() as client:
-            async with client.stream(method="GET", url=download_url) as result:
-                async for data in result.aiter_bytes():
-                    io_object.write(data)
+        await self._async_write_chunks(self._async_iter_download(download_url), io_object)
         io_object.seek(0)
 
         return io_object
 
-    def sync_send_media_group(self, chat_id: int, photos: Union[List[str], List[IO]]):
+    def _media_group_items(self, media: list) -> List[list]:
+        """
+        Returns [input media, file to upload or None, cache key, cached file_id]
+        for every item; plain str and IO items are photos.
+        """
+        items = []
+        for item in media:
+            if isinstance(item, InputMedia):
+                source = item.media
+            else:
+                source = item
+                item = InputMediaPhoto(media=item if isinstance(item, str) else "attach://file")
+            if isinstance(source, str) and self.local_mode and is_local_path(source):
+                item = item.model_copy(update={"media": self._local_file_uri(source)})
+                source = None
+            elif isinstance(source, str) and not is_local_path(source):
+                source = None
+            items.append([item, source, None, None])
+        return items
+
+    def _media_group_request(self, chat_id: int, items: List[list], local_file) -> Tuple[dict, dict]:
+        media = []
         files = {}
-        photos_list = []
-
-        if type(photos[-1]) is str:
-            if photos[-1].startswith("http://") or photos[-1].startswith("https://"):
-                for photo in photos:
-                    photos_list.append(InputMediaPhoto(media=photo))
-
-                media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-                url = self.tg_base_url + "sendMediaGroup"
-                data = media_group.model_dump(exclude_none=True)
-                r = self._perform_sync_request(url, data)
-                return r
-
-            ends = [".jpg", ".jpeg", ".gif", ".png"]
-            for end in ends:
-                if photos[-1].endswith(end):
-                    for photo in photos:
-                        photos_list.append(InputMediaPhoto(media=f"attach://{photo}"))
-                        content = open(photo, "rb")
-                        files[photo] = content
-
-                    media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-                    url = self.tg_base_url + "sendMediaGroup"
-                    data = media_group.model_dump(exclude_none=True)
-                    data["media"] = json.dumps(data["media"])
-                    r = self._perform_sync_request(
-                        url, data, use_json=False, files=files
-                    )
-                    return r
-
-            for photo in photos:
-                photos_list.append(InputMediaPhoto(media=photo))
-
-            media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-            url = self.tg_base_url + "sendMediaGroup"
-            data = media_group.model_dump(exclude_none=True)
-            r = self._perform_sync_request(url, data)
-            return r
-
-        for i in range(len(photos)):
-            photos_list.append(InputMediaPhoto(media=f"attach://image_{i}"))
-            files[f"image_{i}"] = photos[i]
-
-        media_group = MediaGroup(chat_id=chat_id, media=photos_list)
+        for i, (input_media, file, _, file_id) in enumerate(items):
+            if file_id is not None:
+                input_media = input_media.model_copy(update={"media": file_id})
+            elif file is not None:
+                files[f"file_{i}"] = local_file(file) if isinstance(file, str) else file
+                input_media = input_media.model_copy(update={"media": f"attach://file_{i}"})
+            media.append(input_media)
+
+        media_group = self._build(MediaGroup, chat_id=chat_id, media=media)
+        data = self._dump(media_group)
+        if files:
+            data["media"] = json.dumps(data["media"])
+        return data, files
+
+    def _uploaded_file_ids(self, items: List[list], r: dict) -> List[Tuple[str, str]]:
+        if not r.get("ok"):
+            return []
+        file_ids = []
+        for (input_media, _, key, file_id), message in zip(items, r["result"]):
+            if key is not None and file_id is None:
+                uploaded = _sent_file_id(input_media.type)({"ok": True, "result": message})
+                if uploaded is not None:
+                    file_ids.append((key, uploaded))
+        return file_ids
+
+    def sync_send_media_group(
+        self,
+        chat_id: int,
+        photos: Optional[Union[List[str], List[IO]]] = None,
+        media: Optional[List[Union[InputMedia, str, IO]]] = None,
+    ):
+        """
+        Sends photos or media, a mix of InputMediaPhoto, InputMediaVideo,
+        InputMediaAudio and InputMediaDocument items whose media is a URL,
+        a file_id or a local path. Groups larger than MEDIA_GROUP_LIMIT are
+        sent as consecutive groups in order and the result lists the
+        messages of all of them. Sending stops at the first failed group,
+        its response is returned then.
+        """
+        items = self._media_group_items(media if media is not None else photos)
         url = self.tg_base_url + "sendMediaGroup"
-        data = media_group.model_dump(exclude_none=True)
-        data["media"] = json.dumps(data["media"])
-        r = self._perform_sync_request(url, data, use_json=False, files=files)
-        return r
+
+        cache = self.upload_cache
+        if cache is not None:
+            for item in items:
+                file_key = None if item[1] is None else cache.sync_file_key(item[1])
+                if file_key is not None:
+                    item[2] = cache.make_key(self.upload_namespace, item[0].type, file_key)
+                    item[3] = cache.store.sync_get(item[2])
+
+        responses = []
+        for group in _split_media_group(items):
+            with ExitStack() as stack:
+                data, files = self._media_group_request(
+                    chat_id, group, lambda path: stack.enter_context(open(path, "rb"))
+                )
+                if files:
+                    r = self._perform_sync_request(url, data, use_json=False, files=files)
+                else:
+                    r = self._perform_sync_request(url, data)
+            responses.append(r)
+
+            if cache is not None:
+                for key, file_id in self._uploaded_file_ids(group, r):
+                    cache.store.sync_set(key, file_id)
+                if not r.get("ok"):
+                    # cached file_ids may be the reason, upload the files next time
+                    for item in group:
+                        if item[3] is not None:
+                            cache.store.sync_delete(item[2])
+            if not r.get("ok"):
+                break
+
+        return _merge_media_group_responses(responses)
 
     async def async_send_media_group(
-        self, chat_id: int, photos: Union[List[str], List[IO]]
+        self,
+        chat_id: int,
+        photos: Optional[Union[List[str], List[IO]]] = None,
+        media: Optional[List[Union[InputMedia, str, IO]]] = None,
+        max_concurrency: int = 4,
     ):
-        files = {}
-        photos_list = []
-
-        if type(photos[-1]) is str:
-            if photos[-1].startswith("http://") or photos[-1].startswith("https://"):
-                for photo in photos:
-                    photos_list.append(InputMediaPhoto(media=photo))
+        """
+        Same as sync_send_media_group. Local files are hashed and looked up
+        in upload_cache concurrently, at most max_concurrency at a time,
+        and streamed from disk into the request.
+        """
+        items = self._media_group_items(media if media is not None else photos)
+        url = self.tg_base_url + "sendMediaGroup"
 
-                media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-                url = self.tg_base_url + "sendMediaGroup"
-                data = media_group.model_dump(exclude_none=True)
+        cache = self.upload_cache
+        if cache is not None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def prepare(item: list):
+                if item[1] is None:
+                    return
+                async with semaphore:
+                    file_key = await cache.async_file_key(item[1])
+                    if file_key is not None:
+                        item[2] = cache.make_key(self.upload_namespace, item[0].type, file_key)
+                        item[3] = await cache.store.async_get(item[2])
+
+            await asyncio.gather(*[prepare(item) for item in items])
+
+        responses = []
+        for group in _split_media_group(items):
+            data, files = self._media_group_request(chat_id, group, LocalFile)
+            if files:
+                r = await self._perform_async_request(url, data, use_json=False, files=files)
+            else:
                 r = await self._perform_async_request(url, data)
-                return r
-
-            ends = [".jpg", ".jpeg", ".gif", ".png"]
-            for end in ends:
-                if photos[-1].endswith(end):
-                    for photo in photos:
-                        photos_list.append(InputMediaPhoto(media=f"attach://{photo}"))
-                        async with aiofiles.open(photo, "rb") as opened_photo:
-                            content = await opened_photo.read()
-                        files[photo] = content
-
-                    media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-                    url = self.tg_base_url + "sendMediaGroup"
-                    data = media_group.model_dump(exclude_none=True)
-                    data["media"] = json.dumps(data["media"])
-                    r = await self._perform_async_request(
-                        url, data, use_json=False, files=files
-                    )
-                    return r
-
-            for photo in photos:
-                photos_list.append(InputMediaPhoto(media=photo))
-
-            media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-            url = self.tg_base_url + "sendMediaGroup"
-            data = media_group.model_dump(exclude_none=True)
-            r = await self._perform_async_request(url, data)
-            return r
+            responses.append(r)
 
-        for i in range(len(photos)):
-            photos_list.append(InputMediaPhoto(media=f"attach://image_{i}"))
-            files[f"image_{i}"] = photos[i]
+            if cache is not None:
+                for key, file_id in self._uploaded_file_ids(group, r):
+                    await cache.store.async_set(key, file_id)
+                if not r.get("ok"):
+                    for item in group:
+                        if item[3] is not None:
+                            await cache.store.async_delete(item[2])
+            if not r.get("ok"):
+                break
 
-        media_group = MediaGroup(chat_id=chat_id, media=photos_list)
-        url = self.tg_base_url + "sendMediaGroup"
-        data = media_group.model_dump(exclude_none=True)
-        data["media"] = json.dumps(data["media"])
-        r = await self._perform_async_request(url, data, use_json=False, files=files)
-        return r
+        return _merge_media_group_responses(responses)
 
+    @cached_upload("animation", "animation", _sent_file_id("animation"), name_arg="file_name")
     def sync_send_animation(
         self,
         chat_id: int,
@@ -1576,10 +1925,9 @@ class TelegramHelper(BaseHelper):
         files = {}
         animation_str = None
 
+        animation = self._local_file_uri(animation)
         if type(animation) is str:
-            if not (
-                animation.startswith("http://") or animation.startswith("https://")
-            ):
+            if not animation.startswith(URL_PREFIXES):
                 ends = [".gif"]
                 for end in ends:
                     if animation.endswith(end):
@@ -1594,7 +1942,8 @@ class TelegramHelper(BaseHelper):
             animation_str = "attach://animation"
             files["animation"] = (file_name if file_name else "file.gif", animation)
 
-        animation_obj = Animation(
+        animation_obj = self._build(
+            Animation,
             chat_id=chat_id,
             animation=animation_str,
             duration=duration,
@@ -1611,9 +1960,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendAnimation"
-        data = animation_obj.model_dump(exclude_none=True)
+        data = self._dump(animation_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         if len(files.keys()):
             r = self._perform_sync_request(url, data, use_json=False, files=files)
@@ -1622,6 +1971,7 @@ class TelegramHelper(BaseHelper):
         r = self._perform_sync_request(url, data)
         return r
 
+    @cached_upload("animation", "animation", _sent_file_id("animation"), name_arg="file_name")
     async def async_send_animation(
         self,
         chat_id: int,
@@ -1642,16 +1992,15 @@ class TelegramHelper(BaseHelper):
         files = {}
         animation_str = None
 
+        animation = self._local_file_uri(animation)
         if type(animation) is str:
-            if not (
-                animation.startswith("http://") or animation.startswith("https://")
-            ):
+            if not animation.startswith(URL_PREFIXES):
                 ends = [".gif"]
                 for end in ends:
                     if animation.endswith(end):
                         files["animation"] = (
                             file_name if file_name else "file.gif",
-                            open(animation, "rb"),
+                            LocalFile(animation),
                         )
                         animation_str = "attach://animation"
             if animation_str is None:
@@ -1660,7 +2009,8 @@ class TelegramHelper(BaseHelper):
             animation_str = "attach://animation"
             files["animation"] = (file_name if file_name else "file.gif", animation)
 
-        animation_obj = Animation(
+        animation_obj = self._build(
+            Animation,
             chat_id=chat_id,
             animation=animation_str,
             duration=duration,
@@ -1677,9 +2027,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendAnimation"
-        data = animation_obj.model_dump(exclude_none=True)
+        data = self._dump(animation_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         if len(files.keys()):
             r = await self._perform_async_request(
@@ -1690,6 +2040,7 @@ class TelegramHelper(BaseHelper):
         r = await self._perform_async_request(url, data)
         return r
 
+    @cached_upload("audio", "audio", _sent_file_id("audio"), name_arg="file_name")
     async def async_send_audio(
         self,
         chat_id: int,
@@ -1710,14 +2061,15 @@ class TelegramHelper(BaseHelper):
         files = {}
         audio_str = None
 
+        audio = self._local_file_uri(audio)
         if type(audio) is str:
-            if not (audio.startswith("http://") or audio.startswith("https://")):
+            if not audio.startswith(URL_PREFIXES):
                 ends = [".mp3"]
                 for end in ends:
                     if audio.endswith(end):
                         files["audio"] = (
                             file_name if file_name else audio,
-                            open(audio, "rb"),
+                            LocalFile(audio),
                         )
                         audio_str = "attach://animation"
             if audio_str is None:
@@ -1726,7 +2078,8 @@ class TelegramHelper(BaseHelper):
             audio_str = "attach://animation"
             files["animation"] = (file_name if file_name else "file", audio)
 
-        audio_obj = Audio(
+        audio_obj = self._build(
+            Audio,
             chat_id=chat_id,
             audio=audio_str,
             caption=caption,
@@ -1743,9 +2096,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendAudio"
-        data = audio_obj.model_dump(exclude_none=True)
+        data = self._dump(audio_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         if len(files.keys()):
             r = await self._perform_async_request(
@@ -1766,7 +2119,8 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
-        sticker_obj = Sticker(
+        sticker_obj = self._build(
+            Sticker,
             chat_id=chat_id,
             sticker=sticker,
             disable_notification=disable_notification,
@@ -1777,9 +2131,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendSticker"
-        data = sticker_obj.model_dump(exclude_none=True)
+        data = self._dump(sticker_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         r = await self._perform_async_request(url, data)
         return r
@@ -1794,7 +2148,8 @@ class TelegramHelper(BaseHelper):
         allow_sending_without_reply: Optional[bool] = None,
         reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
     ):
-        sticker_obj = Sticker(
+        sticker_obj = self._build(
+            Sticker,
             chat_id=chat_id,
             sticker=sticker,
             disable_notification=disable_notification,
@@ -1805,9 +2160,9 @@ class TelegramHelper(BaseHelper):
         )
 
         url = self.tg_base_url + "sendSticker"
-        data = sticker_obj.model_dump(exclude_none=True)
+        data = self._dump(sticker_obj)
         if "reply_markup" in data.keys():
-            data["reply_markup"] = json.dumps(data["reply_markup"])
+            data["reply_markup"] = self._json(data["reply_markup"])
 
         r = self._perform_sync_request(url, data)
         return r
@@ -1834,20 +2189,20 @@ class TelegramHelper(BaseHelper):
         url = self.tg_base_url + "setMyCommands"
         commands_list = []
         for command, description in commands:
-            commands_list.append(BotCommand(command=command, description=description))
+            commands_list.append(self._build(BotCommand, command=command, description=description))
 
-        set_my_commands = SetMyCommands(commands=commands_list)
+        set_my_commands = self._build(SetMyCommands, commands=commands_list)
 
-        r = self._perform_sync_request(url, set_my_commands.model_dump())
+        r = self._perform_sync_request(url, self._dump(set_my_commands))
         return r
 
     async def async_set_my_commands(self, commands: List[Tuple[str, str]]):
         url = self.tg_base_url + "setMyCommands"
         commands_list = []
         for command, description in commands:
-            commands_list.append(BotCommand(command=command, description=description))
+            commands_list.append(self._build(BotCommand, command=command, description=description))
 
-        set_my_commands = SetMyCommands(commands=commands_list)
+        set_my_commands = self._build(SetMyCommands, commands=commands_list)
 
-        r = await self._perform_async_request(url, set_my_commands.model_dump())
+        r = await self._perform_async_request(url, self._dump(set_my_commands))
         return r
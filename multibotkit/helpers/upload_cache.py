@@ -0,0 +1,362 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import aiofiles
+
+try:
+    import redis
+    from redis import asyncio as aioredis
+except ImportError:
+    redis = None
+    aioredis = None
+
+from multibotkit.helpers.multipart import CHUNK_SIZE
+
+
+def _require_redis():
+    if redis is None:
+        raise ImportError(
+            "redis is not installed, install it with `pip install redis`"
+        )
+
+
+class BaseUploadStore:
+    def sync_get(self, key: str) -> Optional[str]:
+        raise NotImplementedError("sync_get is not implemented")
+
+    def sync_set(self, key: str, file_id: str):
+        raise NotImplementedError("sync_set is not implemented")
+
+    def sync_delete(self, key: str):
+        raise NotImplementedError("sync_delete is not implemented")
+
+    async def async_get(self, key: str) -> Optional[str]:
+        raise NotImplementedError("async_get is not implemented")
+
+    async def async_set(self, key: str, file_id: str):
+        raise NotImplementedError("async_set is not implemented")
+
+    async def async_delete(self, key: str):
+        raise NotImplementedError("async_delete is not implemented")
+
+
+class MemoryUploadStore(BaseUploadStore):
+    """
+    Keeps at most maxsize ids in process memory, least recently used ids
+    are dropped first.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.ids = OrderedDict()
+
+    def sync_get(self, key: str) -> Optional[str]:
+        file_id = self.ids.get(key)
+        if file_id is not None:
+            self.ids.move_to_end(key)
+        return file_id
+
+    def sync_set(self, key: str, file_id: str):
+        self.ids[key] = file_id
+        self.ids.move_to_end(key)
+        while len(self.ids) > self.maxsize:
+            self.ids.popitem(last=False)
+
+    def sync_delete(self, key: str):
+        self.ids.pop(key, None)
+
+    async def async_get(self, key: str) -> Optional[str]:
+        return self.sync_get(key)
+
+    async def async_set(self, key: str, file_id: str):
+        self.sync_set(key, file_id)
+
+    async def async_delete(self, key: str):
+        self.sync_delete(key)
+
+
+class RedisUploadStore(BaseUploadStore):
+    """
+    Keeps ids in Redis, so they are shared by all processes of the bot.
+    Clients are created on first use: the sync one for sync helper methods,
+    the async one for async methods.
+    """
+
+    def __init__(
+        self,
+        connection_url: str,
+        db_number: int = 1,
+        ttl: Optional[int] = None,
+        key_prefix: str = "multibotkit:uploads:",
+    ):
+        _require_redis()
+        self.connection_url = connection_url
+        self.db_number = db_number
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._sync_db = None
+        self._async_db = None
+
+    @property
+    def sync_db(self):
+        if self._sync_db is None:
+            self._sync_db = redis.Redis.from_url(self.connection_url, db=self.db_number)
+        return self._sync_db
+
+    @property
+    def async_db(self):
+        if self._async_db is None:
+            self._async_db = aioredis.from_url(self.connection_url, db=self.db_number)
+        return self._async_db
+
+    def sync_get(self, key: str) -> Optional[str]:
+        file_id = self.sync_db.get(self.key_prefix + key)
+        return None if file_id is None else file_id.decode()
+
+    def sync_set(self, key: str, file_id: str):
+        self.sync_db.set(self.key_prefix + key, file_id, ex=self.ttl)
+
+    def sync_delete(self, key: str):
+        self.sync_db.delete(self.key_prefix + key)
+
+    async def async_get(self, key: str) -> Optional[str]:
+        file_id = await self.async_db.get(self.key_prefix + key)
+        return None if file_id is None else file_id.decode()
+
+    async def async_set(self, key: str, file_id: str):
+        await self.async_db.set(self.key_prefix + key, file_id, ex=self.ttl)
+
+    async def async_delete(self, key: str):
+        await self.async_db.delete(self.key_prefix + key)
+
+
+def is_local_path(value) -> bool:
+    return (
+        isinstance(value, str)
+        and not value.startswith(("http://", "https://"))
+        and os.path.isfile(value)
+    )
+
+
+def _stat_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _failed(response) -> bool:
+    return isinstance(response, dict) and response.get("ok") is False
+
+
+class UploadCache:
+    """
+    Remembers ids returned by platforms for uploaded files, so a file is
+    uploaded once and later sends reference its id.
+
+    With key="content" files are identified by the sha256 of their content:
+    copies of a file share one id and a changed file is uploaded again.
+    Digests of local files are remembered by path, mtime and size, so each
+    file is read once per change. With key="stat" local files are identified
+    by path, mtime and size alone and file objects are not cached.
+
+    Concurrent async sends of a file that is not cached yet wait for the
+    first upload instead of uploading the file again.
+    """
+
+    def __init__(
+        self,
+        store: Optional[BaseUploadStore] = None,
+        key: str = "content",
+        max_digests: int = 10000,
+    ):
+        if key not in ("content", "stat"):
+            raise ValueError('key must be "content" or "stat"')
+        self.store = store if store is not None else MemoryUploadStore()
+        self.key = key
+        self.max_digests = max_digests
+        self._digests = OrderedDict()
+        self._pending = {}
+
+    def make_key(
+        self, namespace: str, kind: str, file_key: str, name: Optional[str] = None
+    ) -> str:
+        key = f"{namespace}:{kind}:{file_key}"
+        if name:
+            key += f":{name}"
+        return key
+
+    def _remember_digest(self, stat_key: str, digest: str):
+        self._digests[stat_key] = digest
+        while len(self._digests) > self.max_digests:
+            self._digests.popitem(last=False)
+
+    def sync_file_key(self, file) -> Optional[str]:
+        if is_local_path(file):
+            stat_key = _stat_key(file)
+            if self.key == "stat":
+                return stat_key
+            digest = self._digests.get(stat_key)
+            if digest is None:
+                sha = hashlib.sha256()
+                with open(file, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        sha.update(chunk)
+                digest = sha.hexdigest()
+                self._remember_digest(stat_key, digest)
+            return digest
+
+        if self.key == "stat":
+            return None
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(file).hexdigest()
+        if hasattr(file, "read") and hasattr(file, "seek"):
+            position = file.tell()
+            sha = hashlib.sha256()
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+            file.seek(position)
+            return sha.hexdigest()
+        return None
+
+    async def async_file_key(self, file) -> Optional[str]:
+        if not is_local_path(file) or self.key == "stat":
+            return self.sync_file_key(file)
+
+        stat_key = _stat_key(file)
+        digest = self._digests.get(stat_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            async with aiofiles.open(file, "rb") as f:
+                while True:
+                    chunk = await f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self._remember_digest(stat_key, digest)
+        return digest
+
+    def sync_send(
+        self,
+        key: str,
+        file,
+        send: Callable,
+        extract: Optional[Callable] = None,
+    ):
+        file_id = self.store.sync_get(key)
+        if file_id is not None:
+            if extract is None:
+                return file_id
+            response = send(file_id)
+            if not _failed(response):
+                return response
+            # the id is no longer accepted, upload the file again
+            self.store.sync_delete(key)
+
+        response = send(file)
+        file_id = response if extract is None else extract(response)
+        if file_id is not None:
+            self.store.sync_set(key, file_id)
+        return response
+
+    async def async_send(
+        self,
+        key: str,
+        file,
+        send: Callable[..., Awaitable],
+        extract: Optional[Callable] = None,
+    ):
+        file_id = await self.store.async_get(key)
+        if file_id is None and key in self._pending:
+            file_id = await asyncio.shield(self._pending[key])
+
+        if file_id is not None:
+            if extract is None:
+                return file_id
+            response = await send(file_id)
+            if not _failed(response):
+                return response
+            await self.store.async_delete(key)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, pending)
+        file_id = None
+        try:
+            response = await send(file)
+            file_id = response if extract is None else extract(response)
+            if file_id is not None:
+                await self.store.async_set(key, file_id)
+        finally:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+            pending.set_result(file_id)
+        return response
+
+
+def _upload_cache(helper, file) -> Optional[UploadCache]:
+    # a local Bot API server reads local paths itself, nothing is uploaded
+    if getattr(helper, "local_mode", False) and is_local_path(file):
+        return None
+    return helper.upload_cache
+
+
+def cached_upload(
+    kind: str,
+    arg: str,
+    extract: Optional[Callable] = None,
+    name_arg: Optional[str] = None,
+):
+    """
+    Makes a helper method use helper.upload_cache for its arg file.
+
+    extract gets the id from the method response; without extract the
+    method returns the id itself and a cached id is returned without calling
+    the method. Ids are kept per helper.upload_namespace, kind and the value
+    of name_arg, since platforms keep the file name with the id.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def prepare(helper, args, kwargs, file_key):
+            bound = signature.bind(helper, *args, **kwargs)
+            name = None if name_arg is None else bound.arguments.get(name_arg)
+            key = helper.upload_cache.make_key(helper.upload_namespace, kind, file_key, name)
+
+            def call(file):
+                bound.arguments[arg] = file
+                return func(*bound.args, **bound.kwargs)
+
+            return key, call
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                file = signature.bind(self, *args, **kwargs).arguments.get(arg)
+                cache = _upload_cache(self, file)
+                file_key = None if cache is None else await cache.async_file_key(file)
+                if file_key is None:
+                    return await func(self, *args, **kwargs)
+                key, call = prepare(self, args, kwargs, file_key)
+                return await cache.async_send(key, file, call, extract)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(self, *args, **kwargs):
+            file = signature.bind(self, *args, **kwargs).arguments.get(arg)
+            cache = _upload_cache(self, file)
+            file_key = None if cache is None else cache.sync_file_key(file)
+            if file_key is None:
+                return func(self, *args, **kwargs)
+            key, call = prepare(self, args, kwargs, file_key)
+            return cache.sync_send(key, file, call, extract)
+
+        return sync_wrapper
+
+    return decorator
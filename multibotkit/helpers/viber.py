@@ -26,8 +26,8 @@ class ViberHelper(BaseHelper):
     class _SendMessageArgumentsError(Exception):
         pass
 
-    def __init__(self, token, proxy: Optional[str] = None):
-        super().__init__(proxy=proxy)
+    def __init__(self, token, proxy: Optional[str] = None, trusted: bool = False):
+        super().__init__(proxy=proxy, trusted=trusted)
         self.token = token
 
     def __build_message(
@@ -53,7 +53,8 @@ class ViberHelper(BaseHelper):
                 raise self._SendMessageArgumentsError(
                     "For text message argument text is required"
                 )
-            message = TextMessage(
+            message = self._build(
+                TextMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -68,7 +69,8 @@ class ViberHelper(BaseHelper):
                 raise self._SendMessageArgumentsError(
                     "For picture message arguments text and media are required"
                 )
-            message = PictureMessage(
+            message = self._build(
+                PictureMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -85,7 +87,8 @@ class ViberHelper(BaseHelper):
                 raise self._SendMessageArgumentsError(
                     "For video message arguments media and size are required"
                 )
-            message = VideoMessage(
+            message = self._build(
+                VideoMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -104,7 +107,8 @@ class ViberHelper(BaseHelper):
                     "For file message arguments media, size and file_name \
 are required"
                 )
-            message = FileMessage(
+            message = self._build(
+                FileMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -121,7 +125,8 @@ are required"
                 raise self._SendMessageArgumentsError(
                     "For contact message argument contact is required"
                 )
-            message = ContactMessage(
+            message = self._build(
+                ContactMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -136,7 +141,8 @@ are required"
                 raise self._SendMessageArgumentsError(
                     "For location message argument location is required"
                 )
-            message = LocationMessage(
+            message = self._build(
+                LocationMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -151,7 +157,8 @@ are required"
                 raise self._SendMessageArgumentsError(
                     "For url message argument media is required"
                 )
-            message = UrlMessage(
+            message = self._build(
+                UrlMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -166,7 +173,8 @@ are required"
                 raise self._SendMessageArgumentsError(
                     "For sticker message argument sticker_id is required"
                 )
-            message = StickerMessage(
+            message = self._build(
+                StickerMessage,
                 type=type,
                 receiver=receiver,
                 min_api_version=min_api_version,
@@ -180,14 +188,14 @@ are required"
 
     def sync_set_webhook(self, webhook_data: SetWebhook):
         url = self.VIBER_BASE_URL + "set_webhook"
-        data = webhook_data.model_dump(exclude_none=True)
+        data = self._dump(webhook_data)
         data["auth_token"] = self.token
         r = self._perform_sync_request(url=url, data=data)
         return r
 
     async def async_set_webhook(self, webhook_data: SetWebhook):
         url = self.VIBER_BASE_URL + "set_webhook"
-        data = webhook_data.model_dump(exclude_none=True)
+        data = self._dump(webhook_data)
         data["auth_token"] = self.token
         r = await self._perform_async_request(url=url, data=data)
         return r
@@ -239,7 +247,7 @@ are required"
         )
 
         url = self.VIBER_BASE_URL + "send_message"
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         data["auth_token"] = self.token
         r = self._perform_sync_request(url=url, data=data)
         return r
@@ -281,7 +289,7 @@ are required"
         )
 
         url = self.VIBER_BASE_URL + "send_message"
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         data["auth_token"] = self.token
         r = await self._perform_async_request(url=url, data=data)
         return r
@@ -1,7 +1,11 @@
+import asyncio
+import hashlib
 import json
+import os
+import time
 from json import JSONDecodeError
 from io import BytesIO
-from typing import Optional
+from typing import IO, List, Optional, Tuple, Union
 
 import httpx
 from tenacity import (
@@ -11,11 +15,33 @@ from tenacity import (
     wait_exponential,
 )
 
-from multibotkit.helpers.base_helper import BaseHelper
+from multibotkit.helpers.base_helper import BaseHelper, stop_if_stream_file
+from multibotkit.helpers.media import ImagePreprocessor
+from multibotkit.helpers.multipart import Buffer, StreamFile
+from multibotkit.helpers.upload_cache import UploadCache, cached_upload
 from multibotkit.schemas.vk.outgoing import Keyboard, Message
 
 
+def _named_photo(photo: Union[IO, Tuple[str, IO]]) -> Tuple[str, IO]:
+    if isinstance(photo, tuple):
+        return photo
+    return "photo.jpg", photo
+
+
+def _batch_key(file_name: str, photo) -> tuple:
+    # bytes are compared by content, file objects by identity
+    return file_name, photo if isinstance(photo, bytes) else id(photo)
+
+
 class VKHelper(BaseHelper):
+    """
+    With upload_cache photo attachments are created once per photo content,
+    later calls of get_photo_attachment for the same photo return the
+    cached attachment without uploading it.
+
+    The photo upload server URL is reused for upload_server_ttl seconds.
+    With image_preprocessor photos are resized and recompressed before upload.
+    """
 
     MESSAGES_URL = "https://api.vk.com/method/messages.send"
     GET_MESSAGES_UPLOAD_SERVER_URL = (
@@ -28,11 +54,27 @@ class VKHelper(BaseHelper):
         pass
 
     def __init__(
-        self, access_token: str, api_version: str, proxy: Optional[str] = None
+        self,
+        access_token: str,
+        api_version: str,
+        proxy: Optional[str] = None,
+        trusted: bool = False,
+        upload_cache: Optional[UploadCache] = None,
+        upload_server_ttl: float = 300,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
     ):
-        super().__init__(proxy=proxy)
+        super().__init__(proxy=proxy, trusted=trusted)
         self.access_token = access_token
         self.api_version = api_version
+        self.upload_cache = upload_cache
+        self.image_preprocessor = image_preprocessor
+        self.upload_server_ttl = upload_server_ttl
+        # (upload URL, monotonic time it expires at)
+        self._upload_server = None
+        self._upload_server_lock = None
+        # attachments belong to the community of the token
+        token_hash = hashlib.sha256(access_token.encode()).hexdigest()[:16]
+        self.upload_namespace = f"vk:{token_hash}"
 
     def command(self, json_payload: Optional[str] = None):
         if json_payload is None:
@@ -60,7 +102,8 @@ class VKHelper(BaseHelper):
                 "One of the arguments text and attachment is required"
             )
 
-        message = Message(
+        message = self._build(
+            Message,
             user_id=user_id,
             message=text,
             keyboard=keyboard,
@@ -70,9 +113,9 @@ class VKHelper(BaseHelper):
             template=template,
         )
 
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         if data.get("keyboard"):
-            data["keyboard"] = json.dumps(data["keyboard"], ensure_ascii=False)
+            data["keyboard"] = self._json(data["keyboard"], ensure_ascii=False)
         if data.get("template"):
             data["template"] = json.dumps(data["template"], ensure_ascii=False)
 
@@ -95,7 +138,8 @@ class VKHelper(BaseHelper):
 but not both"
             )
 
-        message = Message(
+        message = self._build(
+            Message,
             user_id=user_id,
             message=text,
             keyboard=keyboard,
@@ -104,9 +148,9 @@ but not both"
             attachment=attachment,
             template=template,
         )
-        data = message.model_dump(exclude_none=True)
+        data = self._dump(message)
         if data.get("keyboard"):
-            data["keyboard"] = json.dumps(data["keyboard"], ensure_ascii=False)
+            data["keyboard"] = self._json(data["keyboard"], ensure_ascii=False)
         if data.get("template"):
             data["template"] = json.dumps(data["template"], ensure_ascii=False)
 
@@ -129,10 +173,12 @@ but not both"
         retry=retry_if_exception_type(httpx.HTTPError)
         | retry_if_exception_type(JSONDecodeError),
         reraise=True,
-        stop=stop_after_attempt(5),
+        stop=stop_after_attempt(5) | stop_if_stream_file,
         wait=wait_exponential(multiplier=1, min=4, max=10),
     )
-    async def async_upload_photo(self, photo: BytesIO, file_name: str, server_url: str):
+    async def async_upload_photo(
+        self, photo: Union[IO, Buffer], file_name: str, server_url: str
+    ):
         files = {"photo": (f"{file_name}", photo)}
         r = await self._async_post(url=server_url, use_json=False, files=files)
         return r.json()
@@ -149,30 +195,123 @@ but not both"
         )
         return r["response"][0]
 
-    def sync_get_photo_attachment(self, photo, file_name):
-        r = self._perform_sync_request(self.UPLOAD_PHOTO_URL, data={})
+    def _cached_upload_server(self) -> Optional[str]:
+        if self._upload_server is None or self._upload_server[1] <= time.monotonic():
+            return None
+        return self._upload_server[0]
+
+    def _set_upload_server(self, r: dict) -> str:
         url = r["response"]["upload_url"]
+        self._upload_server = (url, time.monotonic() + self.upload_server_ttl)
+        return url
 
-        uploaded_photo = self.sync_upload_photo(photo, file_name, url)
-        saved_photo = self.sync_save_photo(uploaded_photo)
+    def sync_get_upload_server(self, refresh: bool = False) -> str:
+        url = None if refresh else self._cached_upload_server()
+        if url is None:
+            r = self._perform_sync_request(self.UPLOAD_PHOTO_URL, data={})
+            url = self._set_upload_server(r)
+        return url
+
+    async def async_get_upload_server(self, refresh: bool = False) -> str:
+        url = None if refresh else self._cached_upload_server()
+        if url is None:
+            r = await self._perform_async_request(self.UPLOAD_PHOTO_URL, data={})
+            url = self._set_upload_server(r)
+        return url
+
+    async def _async_replace_upload_server(self, stale_url: Optional[str]) -> str:
+        """
+        Returns a valid upload server URL other than stale_url. Concurrent
+        uploads that found the server expired or stale wait for one refresh.
+        """
+        if self._upload_server_lock is None:
+            self._upload_server_lock = asyncio.Lock()
+        async with self._upload_server_lock:
+            url = self._cached_upload_server()
+            if url is None or url == stale_url:
+                url = await self.async_get_upload_server(refresh=True)
+            return url
 
+    @staticmethod
+    def _attachment(saved_photo: dict) -> str:
         owner_id = saved_photo["owner_id"]
         photo_id = saved_photo["id"]
         access_key = saved_photo["access_key"]
-        attachment = f"photo{owner_id}_{photo_id}_{access_key}"
+        return f"photo{owner_id}_{photo_id}_{access_key}"
 
-        return attachment
+    @cached_upload("photo", "photo")
+    def sync_get_photo_attachment(self, photo, file_name):
+        if self._needs_preprocessing(photo):
+            photo = self._sync_prepare_photo(photo)
+            file_name = os.path.splitext(file_name)[0] + ".jpg"
+        cached_url = self._cached_upload_server()
+        url = cached_url or self.sync_get_upload_server(refresh=True)
+        uploaded_photo = self.sync_upload_photo(photo, file_name, url)
+        if "error" in uploaded_photo and cached_url is not None:
+            # the cached upload server may have expired on the VK side
+            url = self.sync_get_upload_server(refresh=True)
+            uploaded_photo = self.sync_upload_photo(photo, file_name, url)
 
-    async def async_get_photo_attachment(self, photo, file_name):
-        r = await self._perform_async_request(self.UPLOAD_PHOTO_URL, data={})
-        url = r["response"]["upload_url"]
+        saved_photo = self.sync_save_photo(uploaded_photo)
+        return self._attachment(saved_photo)
 
+    @cached_upload("photo", "photo")
+    async def async_get_photo_attachment(self, photo, file_name):
+        if self._needs_preprocessing(photo):
+            photo = await self._async_prepare_photo(photo)
+            file_name = os.path.splitext(file_name)[0] + ".jpg"
+        if isinstance(photo, StreamFile):
+            # a streamed photo can not be uploaded again, so it gets a fresh upload server
+            cached_url = None
+            url = await self.async_get_upload_server(refresh=True)
+        else:
+            cached_url = self._cached_upload_server()
+            url = cached_url or await self._async_replace_upload_server(None)
         uploaded_photo = await self.async_upload_photo(photo, file_name, url)
+        if "error" in uploaded_photo and cached_url is not None:
+            url = await self._async_replace_upload_server(url)
+            uploaded_photo = await self.async_upload_photo(photo, file_name, url)
+
         saved_photo = await self.async_save_photo(uploaded_photo)
+        return self._attachment(saved_photo)
 
-        owner_id = saved_photo["owner_id"]
-        photo_id = saved_photo["id"]
-        access_key = saved_photo["access_key"]
-        attachment = f"photo{owner_id}_{photo_id}_{access_key}"
+    def sync_get_photo_attachments(
+        self, photos: List[Union[IO, Tuple[str, IO]]]
+    ) -> List[str]:
+        """
+        Returns attachments for photos, given as file objects or
+        (file name, file object) tuples, in the same order. A photo listed
+        several times, as one file object or equal bytes, is uploaded once.
+        """
+        named_photos = list(map(_named_photo, photos))
+        attachments = {}
+        for file_name, photo in named_photos:
+            key = _batch_key(file_name, photo)
+            if key not in attachments:
+                attachments[key] = self.sync_get_photo_attachment(photo, file_name)
+        return [attachments[_batch_key(*named)] for named in named_photos]
+
+    async def async_get_photo_attachments(
+        self, photos: List[Union[IO, Tuple[str, IO]]], max_concurrency: int = 4
+    ) -> List[str]:
+        """
+        Same as sync_get_photo_attachments, photos are uploaded concurrently,
+        at most max_concurrency at a time, to one upload server.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-        return attachment
+        async def get_attachment(file_name: str, photo: IO) -> str:
+            async with semaphore:
+                return await self.async_get_photo_attachment(photo, file_name)
+
+        named_photos = list(map(_named_photo, photos))
+        unique = {}
+        for file_name, photo in named_photos:
+            unique.setdefault(_batch_key(file_name, photo), (file_name, photo))
+
+        await self._async_replace_upload_server(None)
+        results = await asyncio.gather(
+            *[get_attachment(file_name, photo) for file_name, photo in unique.values()]
+        )
+        attachments = dict(zip(unique, results))
+        return [attachments[_batch_key(*named)] for named in named_photos]
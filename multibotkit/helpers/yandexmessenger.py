@@ -1,7 +1,9 @@
 from typing import IO, List, Optional, Union
 
 from multibotkit.helpers.base_helper import BaseHelper
-from multibotkit.schemas.yandexmessenger.incoming import Update
+from multibotkit.helpers.media import ImagePreprocessor
+from multibotkit.helpers.multipart import Buffer, LocalFile
+from multibotkit.schemas.yandexmessenger.incoming import Update, WebhookBody
 from multibotkit.schemas.yandexmessenger.outgoing import (
     GetUpdatesParams,
     InlineKeyboard,
@@ -18,11 +20,21 @@ class YandexMessengerHelper(BaseHelper):
 
     Базовый URL: https://botapi.messenger.yandex.net/bot/v1/
     Авторизация: Authorization: OAuth <token>
+
+    С image_preprocessor изображения, отправляемые из файлов, перед
+    загрузкой уменьшаются и пережимаются.
     """
 
-    def __init__(self, token: str, proxy: Optional[str] = None):
-        super().__init__(proxy=proxy)
+    def __init__(
+        self,
+        token: str,
+        proxy: Optional[str] = None,
+        trusted: bool = False,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
+    ):
+        super().__init__(proxy=proxy, trusted=trusted)
         self.token = token
+        self.image_preprocessor = image_preprocessor
         self.base_url = "https://botapi.messenger.yandex.net/bot/v1/"
         self.headers = {"Authorization": f"OAuth {self.token}"}
 
@@ -61,7 +73,8 @@ class YandexMessengerHelper(BaseHelper):
             dict с полями {"ok": true, "message_id": integer}
         """
         url = self.base_url + "messages/sendText/"
-        params = SendTextParams(
+        params = self._build(
+            SendTextParams,
             text=text,
             chat_id=chat_id,
             login=login,
@@ -73,13 +86,11 @@ class YandexMessengerHelper(BaseHelper):
             thread_id=thread_id,
             inline_keyboard=inline_keyboard,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
 
         # Сериализация inline_keyboard если есть
         if inline_keyboard:
-            data["inline_keyboard"] = inline_keyboard.model_dump(exclude_none=True)[
-                "buttons"
-            ]
+            data["inline_keyboard"] = self._dump(inline_keyboard)["buttons"]
 
         return self._perform_sync_request(url, data)
 
@@ -98,7 +109,8 @@ class YandexMessengerHelper(BaseHelper):
     ) -> dict:
         """Асинхронная версия sync_send_text"""
         url = self.base_url + "messages/sendText/"
-        params = SendTextParams(
+        params = self._build(
+            SendTextParams,
             text=text,
             chat_id=chat_id,
             login=login,
@@ -110,12 +122,10 @@ class YandexMessengerHelper(BaseHelper):
             thread_id=thread_id,
             inline_keyboard=inline_keyboard,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
 
         if inline_keyboard:
-            data["inline_keyboard"] = inline_keyboard.model_dump(exclude_none=True)[
-                "buttons"
-            ]
+            data["inline_keyboard"] = self._dump(inline_keyboard)["buttons"]
 
         return await self._perform_async_request(url, data)
 
@@ -139,12 +149,14 @@ class YandexMessengerHelper(BaseHelper):
             dict с полями {"ok": true, "message_id": integer}
         """
         url = self.base_url + "messages/sendImage/"
-        params = SendImageParams(
+        params = self._build(
+            SendImageParams,
             chat_id=chat_id,
             login=login,
             thread_id=thread_id,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
+        image = self._sync_prepare_photo(image)
 
         # Обработка различных типов image
         if isinstance(image, str):
@@ -173,18 +185,18 @@ class YandexMessengerHelper(BaseHelper):
     ) -> dict:
         """Асинхронная версия sync_send_image"""
         url = self.base_url + "messages/sendImage/"
-        params = SendImageParams(
+        params = self._build(
+            SendImageParams,
             chat_id=chat_id,
             login=login,
             thread_id=thread_id,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
+        image = await self._async_prepare_photo(image)
 
         if isinstance(image, str):
             if image.endswith((".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")):
-                with open(image, "rb") as f:
-                    content = f.read()
-                files = {"image": content}
+                files = {"image": LocalFile(image)}
                 return await self._perform_async_request(
                     url, data, use_json=False, files=files
                 )
@@ -219,12 +231,13 @@ class YandexMessengerHelper(BaseHelper):
             dict с полями {"ok": true, "message_id": integer}
         """
         url = self.base_url + "messages/sendFile/"
-        params = SendFileParams(
+        params = self._build(
+            SendFileParams,
             chat_id=chat_id,
             login=login,
             thread_id=thread_id,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
 
         if isinstance(document, str):
             # Если это путь к файлу
@@ -248,7 +261,7 @@ class YandexMessengerHelper(BaseHelper):
 
     async def async_send_file(
         self,
-        document: Union[str, IO],
+        document: Union[str, IO, Buffer],
         filename: Optional[str] = None,
         chat_id: Optional[str] = None,
         login: Optional[str] = None,
@@ -256,19 +269,18 @@ class YandexMessengerHelper(BaseHelper):
     ) -> dict:
         """Асинхронная версия sync_send_file"""
         url = self.base_url + "messages/sendFile/"
-        params = SendFileParams(
+        params = self._build(
+            SendFileParams,
             chat_id=chat_id,
             login=login,
             thread_id=thread_id,
         )
-        data = params.model_dump(exclude_none=True)
+        data = self._dump(params)
 
         if isinstance(document, str):
             if not document.startswith(("http://", "https://")):
                 fname = filename or document.split("/")[-1]
-                with open(document, "rb") as f:
-                    content = f.read()
-                files = {"document": (fname, content)}
+                files = {"document": (fname, LocalFile(document))}
                 return await self._perform_async_request(
                     url, data, use_json=False, files=files
                 )
@@ -298,8 +310,8 @@ class YandexMessengerHelper(BaseHelper):
             dict с полями {"ok": true, "updates": [...]}
         """
         url = self.base_url + "messages/getUpdates/"
-        params = GetUpdatesParams(limit=limit, offset=offset)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(GetUpdatesParams, limit=limit, offset=offset)
+        data = self._dump(params)
 
         return self._perform_sync_request(url, data)
 
@@ -310,8 +322,8 @@ class YandexMessengerHelper(BaseHelper):
     ) -> dict:
         """Асинхронная версия sync_get_updates"""
         url = self.base_url + "messages/getUpdates/"
-        params = GetUpdatesParams(limit=limit, offset=offset)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(GetUpdatesParams, limit=limit, offset=offset)
+        data = self._dump(params)
 
         return await self._perform_async_request(url, data)
 
@@ -329,8 +341,8 @@ class YandexMessengerHelper(BaseHelper):
             dict с результатом операции
         """
         url = self.base_url + "self/update/"
-        params = SetWebhookParams(webhook_url=webhook_url)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(SetWebhookParams, webhook_url=webhook_url)
+        data = self._dump(params)
 
         return self._perform_sync_request(url, data)
 
@@ -340,21 +352,24 @@ class YandexMessengerHelper(BaseHelper):
     ) -> dict:
         """Асинхронная версия sync_set_webhook"""
         url = self.base_url + "self/update/"
-        params = SetWebhookParams(webhook_url=webhook_url)
-        data = params.model_dump(exclude_none=True)
+        params = self._build(SetWebhookParams, webhook_url=webhook_url)
+        data = self._dump(params)
 
         return await self._perform_async_request(url, data)
 
-    def parse_updates(self, response: dict) -> List[Update]:
+    def parse_updates(self, response: Union[dict, bytes, str]) -> List[Update]:
         """
         Парсинг ответа getUpdates в список Update объектов.
+        Для ответа с ошибкой ("ok": false) возвращается пустой список.
 
         Args:
-            response: dict ответ от getUpdates
+            response: dict ответ от getUpdates или сырое тело запроса (bytes/str)
 
         Returns:
             List[Update]
         """
-        if response.get("ok") and "updates" in response:
-            return [Update.model_validate(update) for update in response["updates"]]
-        return []
+        if isinstance(response, dict):
+            body = WebhookBody.model_validate(response)
+        else:
+            body = WebhookBody.model_validate_json(response)
+        return [] if body.ok is False else body.updates
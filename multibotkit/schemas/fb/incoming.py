@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -99,3 +99,11 @@ it will only contain one messaging object.",
 class IncomingEvent(BaseModel):
     object: str = Field(..., title="Value will be page")
     entry: List[EventEntry] = Field(..., title="Array containing event data")
+
+
+def parse_event(raw: Union[bytes, str]) -> IncomingEvent:
+    """
+    Parses a raw webhook request body, decoding and validating it
+    in a single pass in pydantic-core.
+    """
+    return IncomingEvent.model_validate_json(raw)
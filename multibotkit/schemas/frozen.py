@@ -0,0 +1,38 @@
+import json
+from typing import Optional, Type, Union
+
+from pydantic import BaseModel
+
+
+class FrozenMarkup(dict):
+    """
+    Keyboard or markup serialized once, for static keyboards sent many times.
+
+    Pass it to helpers in place of the keyboard model (InlineKeyboardMarkup,
+    ReplyKeyboardMarkup, vk and viber Keyboard, yandexmessenger InlineKeyboard):
+    helpers splice the ready dict and JSON into requests instead of
+    validating and serializing the keyboard on every send.
+    A model is validated when it is built, a dict is validated against model
+    when given and is used as is otherwise. The markup must not be changed
+    afterwards.
+    """
+
+    __slots__ = ("json",)
+
+    def __init__(
+        self, markup: Union[BaseModel, dict], model: Optional[Type[BaseModel]] = None
+    ):
+        if isinstance(markup, dict) and model is not None:
+            markup = model.model_validate(markup)
+        if isinstance(markup, BaseModel):
+            markup = markup.model_dump(mode="json", exclude_none=True)
+        super().__init__(markup)
+        self.json = json.dumps(self, ensure_ascii=False)
+
+
+def freeze(
+    markup: Union[BaseModel, dict], model: Optional[Type[BaseModel]] = None
+) -> FrozenMarkup:
+    if isinstance(markup, FrozenMarkup):
+        return markup
+    return FrozenMarkup(markup, model)
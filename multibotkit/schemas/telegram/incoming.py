@@ -1,7 +1,8 @@
 from enum import Enum
-from typing import Optional, List
+from typing import Optional, List, Union
 
-from pydantic import ConfigDict, Field
+from pydantic import ConfigDict, Field, TypeAdapter
+from pydantic_core import from_json
 from pydantic.main import BaseModel
 
 
@@ -181,6 +182,14 @@ belongs",
     )
 
 
+class File(FileBasedObject):
+    file_path: Optional[str] = Field(
+        None,
+        title="File path, the file can be downloaded by it for at least \
+1 hour",
+    )
+
+
 class Chat(BaseModel):
     id: int = Field(..., title="Unique identifier for this chat. ")
     type: ChatType = Field(
@@ -434,3 +443,109 @@ class Update(BaseModel):
         title="A request to join the chat has been sent. The bot must have the can_invite_users administrator right "
         "in the chat to receive these updates.",
     )
+
+
+# the first of these present in an update holds the sender, in this order
+SENDER_FIELDS = (
+    "message",
+    "callback_query",
+    "chat_member",
+    "chat_join_request",
+    "my_chat_member",
+)
+
+
+class _LazyField:
+    def __init__(self, model):
+        self.model = model
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        parsed = instance._parsed
+        if self.name not in parsed:
+            value = instance.raw.get(self.name)
+            parsed[self.name] = None if value is None else self.model.model_validate(value)
+        return parsed[self.name]
+
+
+class LazyUpdate:
+    """
+    Update that keeps the raw dict and validates a nested object only
+    on first access to it, with the same attributes as Update.
+    kind and sender_id are read from the raw dict without validation.
+    """
+
+    __slots__ = ("raw", "update_id", "_parsed")
+
+    _update_id_adapter = TypeAdapter(int)
+
+    message = _LazyField(Message)
+    edited_message = _LazyField(Message)
+    callback_query = _LazyField(CallbackQuery)
+    my_chat_member = _LazyField(ChatMemberUpdated)
+    chat_member = _LazyField(ChatMemberUpdated)
+    chat_join_request = _LazyField(ChatJoinRequest)
+
+    def __init__(self, raw: dict):
+        self.raw = raw
+        self.update_id = self._update_id_adapter.validate_python(raw.get("update_id"))
+        self._parsed = {}
+
+    @classmethod
+    def model_validate(cls, obj: dict) -> "LazyUpdate":
+        return cls(obj)
+
+    @classmethod
+    def model_validate_json(cls, raw: Union[bytes, str]) -> "LazyUpdate":
+        return cls(from_json(raw))
+
+    @property
+    def kind(self) -> Optional[str]:
+        for name in Update.model_fields:
+            if name != "update_id" and self.raw.get(name) is not None:
+                return name
+        return None
+
+    @property
+    def sender_id(self) -> Optional[int]:
+        for name in SENDER_FIELDS:
+            value = self.raw.get(name)
+            if value is not None:
+                return (value.get("from") or {}).get("id")
+        return None
+
+    def to_update(self) -> Update:
+        return Update.model_validate(self.raw)
+
+    def model_dump(self, **kwargs) -> dict:
+        return self.to_update().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return self.to_update().model_dump_json(**kwargs)
+
+    def dict(self, **kwargs) -> dict:
+        return self.model_dump(**kwargs)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyUpdate):
+            other = other.to_update()
+        if isinstance(other, Update):
+            return self.to_update() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LazyUpdate(update_id={self.update_id}, kind={self.kind})"
+
+
+def parse_update(raw: Union[bytes, str], lazy: bool = False) -> Union[Update, LazyUpdate]:
+    """
+    Parses a raw webhook request body, decoding and validating it
+    in a single pass in pydantic-core.
+    """
+    if lazy:
+        return LazyUpdate.model_validate_json(raw)
+    return Update.model_validate_json(raw)
@@ -214,13 +214,34 @@ class InputMediaPhoto(InputMedia):
     media: str = Field(...)
 
 
+class InputMediaVideo(InputMedia):
+    type: str = "video"
+    media: str = Field(...)
+    width: Optional[int] = Field(None, title="Video width")
+    height: Optional[int] = Field(None, title="Video height")
+    duration: Optional[int] = Field(None, title="Video duration in seconds")
+    supports_streaming: Optional[bool] = Field(
+        None, title="Pass True if the uploaded video is suitable for streaming"
+    )
+
+
+class InputMediaAudio(InputMedia):
+    type: str = "audio"
+    media: str = Field(...)
+    duration: Optional[int] = Field(None, title="Duration of the audio in seconds")
+    performer: Optional[str] = Field(None, title="Performer of the audio")
+    title: Optional[str] = Field(None, title="Title of the audio")
+
+
 class InputMediaDocument(InputMedia):
     type: str = "document"
 
 
 class MediaGroup(BaseModel):
     chat_id: int = Field(...)
-    media: Union[List[InputMediaPhoto], List[InputMediaDocument]] = Field(...)
+    media: List[
+        Union[InputMediaPhoto, InputMediaVideo, InputMediaAudio, InputMediaDocument]
+    ] = Field(...)
 
 
 class Photo(BaseModel):
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Union
 
 from pydantic import Field
 from pydantic.main import BaseModel
@@ -123,3 +123,11 @@ class Callback(
     event: str = Field(..., title="Callback type - which event triggered the callback")
     timestamp: int = Field(..., title="Time of the event that triggered the callback")
     message_token: int = Field(..., title="Unique ID of the message")
+
+
+def parse_callback(raw: Union[bytes, str]) -> Callback:
+    """
+    Parses a raw webhook request body, decoding and validating it
+    in a single pass in pydantic-core.
+    """
+    return Callback.model_validate_json(raw)
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Union
 
 from pydantic import BaseModel, Field
 
@@ -58,3 +58,11 @@ class IncomingEvent(BaseModel):
     type: str = Field(..., title="Event type")
     group_id: int = Field(..., title="Group ID")
     object: Optional[EventObject] = Field(None, title="Event object")
+
+
+def parse_event(raw: Union[bytes, str]) -> IncomingEvent:
+    """
+    Parses a raw webhook request body, decoding and validating it
+    in a single pass in pydantic-core.
+    """
+    return IncomingEvent.model_validate_json(raw)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -75,3 +75,37 @@ class Update(BaseModel):
     file: Optional[File] = Field(None, title="Прикрепленный файл")
 
     model_config = ConfigDict(populate_by_name=True)
+
+
+class WebhookBody(BaseModel):
+    """Тело webhook-запроса, совместимо и с ответом getUpdates"""
+
+    ok: Optional[bool] = Field(None, title="Статус ответа getUpdates")
+    updates: List[Update] = Field([], title="Массив обновлений")
+
+
+def parse_update(raw: Union[bytes, str]) -> Update:
+    """
+    Парсинг одного Update из сырого JSON за один проход в pydantic-core.
+
+    Args:
+        raw: bytes или str с JSON
+
+    Returns:
+        Update
+    """
+    return Update.model_validate_json(raw)
+
+
+def parse_updates(raw: Union[bytes, str]) -> List[Update]:
+    """
+    Парсинг тела webhook-запроса или ответа getUpdates ({"updates": [...]})
+    из сырого JSON за один проход в pydantic-core.
+
+    Args:
+        raw: bytes или str с JSON
+
+    Returns:
+        List[Update]
+    """
+    return WebhookBody.model_validate_json(raw).updates
@@ -1,7 +1,41 @@
-from typing import Optional
+import asyncio
+from typing import Dict, Iterable, Optional
+
+
+class StateConflictError(Exception):
+    """
+    Raised when a write expects another version than the stored one.
+
+    Versions start over from 0 once a state is deleted or expires, so a
+    write holding a version read before the deletion passes the check
+    again when the new state reaches the same version.
+    """
+
+    def __init__(self, state_id: str, expected_version: int, actual_version: int):
+        self.state_id = state_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+        super().__init__(
+            f"State {state_id} was modified concurrently: "
+            f"expected version {expected_version}, found {actual_version}"
+        )
 
 
 class BaseStateManager:
+    ttl: Optional[int] = None
+
+    def _get_ttl(self, ttl: Optional[int] = None) -> Optional[int]:
+        # ttl=0 disables expiration even if a default ttl is configured
+        if ttl is None:
+            ttl = self.ttl
+        return ttl or None
+
+    def _check_version(
+        self, state_id: str, version: Optional[int], current_version: int
+    ):
+        if version is not None and version != current_version:
+            raise StateConflictError(state_id, version, current_version)
+
     def get_state(self, state_id: str):
         raise NotImplementedError("get_state is not implemented")
 
@@ -10,8 +44,97 @@ class BaseStateManager:
         state_id: str,
         state: Optional[str] = None,
         state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
     ):
+        """
+        Stores the state and returns its new version.
+        If version is passed, the state is written only if the stored version
+        still equals it, otherwise StateConflictError is raised.
+        """
         raise NotImplementedError("set_state is not implemented")
 
     def delete_state(self, state_id: str):
         raise NotImplementedError("delete_state is not implemented")
+
+    async def get_data_fields(self, state_id: str, keys: Iterable[str]) -> dict:
+        """
+        Returns only the requested keys of the state data.
+        Missing keys are not included in the result.
+        """
+        state_object = await self.get_state(state_id)
+        data = state_object.data or {}
+        return {key: data[key] for key in keys if key in data}
+
+    async def set_data_fields(
+        self, state_id: str, fields: dict, ttl: Optional[int] = None
+    ) -> int:
+        """
+        Updates the given keys of the state data, keeping the other keys,
+        and returns the new state version.
+        """
+        while True:
+            state_object = await self.get_state(state_id)
+            data = dict(state_object.data or {})
+            data.update(fields)
+            try:
+                return await self.set_state(
+                    state_id=state_id,
+                    state_data=data,
+                    ttl=ttl,
+                    version=state_object.version,
+                )
+            except StateConflictError:
+                continue
+
+    async def delete_data_fields(self, state_id: str, keys: Iterable[str]) -> int:
+        """
+        Removes the given keys from the state data and returns the new state version.
+        """
+        keys = set(keys)
+        while True:
+            state_object = await self.get_state(state_id)
+            if state_object.data is None:
+                return state_object.version
+            data = {
+                key: value
+                for key, value in state_object.data.items()
+                if key not in keys
+            }
+            try:
+                return await self.set_state(
+                    state_id=state_id,
+                    state_data=data,
+                    version=state_object.version,
+                )
+            except StateConflictError:
+                continue
+
+    async def get_states(self, state_ids: Iterable[str]) -> list:
+        return list(
+            await asyncio.gather(*(self.get_state(state_id) for state_id in state_ids))
+        )
+
+    async def set_states(
+        self, states: Dict[str, dict], ttl: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Stores several states at once and returns their new versions.
+        states maps state_id to a dict with "state" and "data" keys,
+        missing keys keep the stored values like in set_state.
+        """
+        versions = await asyncio.gather(
+            *(
+                self.set_state(
+                    state_id=state_id,
+                    state=value.get("state"),
+                    state_data=value.get("data"),
+                    ttl=ttl,
+                )
+                for state_id, value in states.items()
+            )
+        )
+        return dict(zip(states.keys(), versions))
+
+    async def delete_states(self, state_ids: Iterable[str]):
+        await asyncio.gather(*(self.delete_state(state_id) for state_id in state_ids))
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Iterable, Optional
+
+from redis.exceptions import ConnectionError, TimeoutError
+
+from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.state import State
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedStateManager(BaseStateManager):
+    """
+    Keeps an in-process LRU cache of states in front of another manager.
+
+    Every write through any node is published to a Redis pub/sub channel and
+    the other nodes drop their cached copy of that state, so local caching
+    stays correct when several nodes share one store. States are only cached
+    while the subscription is alive; after a reconnect the whole cache is
+    dropped, since invalidations could have been missed.
+
+    redis is the client used for pub/sub, by default the client of manager
+    (so manager is expected to be a RedisStateManager if redis is not passed;
+    a cluster client has no pub/sub, pass a plain Redis client for it instead).
+    Cached states are kept at most cache_ttl seconds, which defaults to the
+    ttl of manager, so states expired in the store do not outlive it here.
+    """
+
+    def __init__(
+        self,
+        manager: BaseStateManager,
+        redis=None,
+        maxsize: int = 10000,
+        channel: str = "multibotkit:states:invalidate",
+        reconnect_delay: float = 1.0,
+        cache_ttl: Optional[float] = None,
+    ):
+        self.manager = manager
+        self.redis = redis if redis is not None else manager.db
+        self.maxsize = maxsize
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.ttl = manager.ttl
+        self.cache_ttl = cache_ttl if cache_ttl is not None else manager.ttl
+        self.node_id = uuid.uuid4().hex
+
+        # state_id -> (state, data, version, cached until)
+        self.cache = OrderedDict()
+        # bumped on every invalidation, so reads racing with one are not cached
+        self._epoch = 0
+        self._subscribed = False
+        self._listener = None
+
+
+    async def start(self):
+        if self._listener is not None:
+            return
+        ready = asyncio.get_running_loop().create_future()
+        self._listener = asyncio.get_running_loop().create_task(self._listen(ready))
+        await ready
+
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self._subscribed = False
+        self.cache.clear()
+
+
+    async def _listen(self, ready: asyncio.Future):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._invalidate_all()
+                self._subscribed = True
+                if not ready.done():
+                    ready.set_result(None)
+                async for message in pubsub.listen():
+                    self._on_message(message["data"])
+            except Exception as e:
+                if not isinstance(e, (ConnectionError, TimeoutError, OSError)):
+                    logger.exception("State invalidation listener failed, resubscribing")
+                self._subscribed = False
+                self._invalidate_all()
+                if not ready.done():
+                    ready.set_result(None)
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                self._subscribed = False
+                await pubsub.aclose()
+
+
+    def _on_message(self, data):
+        if isinstance(data, bytes):
+            data = data.decode()
+        node_id, _, state_id = data.partition(" ")
+        if node_id != self.node_id:
+            self._invalidate(state_id)
+
+
+    def _invalidate(self, state_id: str):
+        self._epoch += 1
+        self.cache.pop(state_id, None)
+
+
+    def _invalidate_all(self):
+        self._epoch += 1
+        self.cache.clear()
+
+
+    def _cache_put(self, state_id: str, state, data, version: int):
+        if not self._subscribed:
+            return
+        cached_until = None if not self.cache_ttl else time.monotonic() + self.cache_ttl
+        self.cache[state_id] = (state, deepcopy(data), version, cached_until)
+        self.cache.move_to_end(state_id)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+
+    async def _publish(self, state_id: str):
+        self._invalidate(state_id)
+        await self.redis.publish(self.channel, f"{self.node_id} {state_id}")
+
+
+    async def get_state(self, state_id: str):
+        await self.start()
+
+        cached = self.cache.get(state_id)
+        if cached is not None and cached[3] is not None and cached[3] <= time.monotonic():
+            self.cache.pop(state_id)
+            cached = None
+
+        if cached is not None:
+            self.cache.move_to_end(state_id)
+            state, data, version, _ = cached
+            return State(
+                self,
+                state_id=state_id,
+                state=state,
+                state_data=deepcopy(data),
+                version=version
+            )
+
+        epoch = self._epoch
+        state_object = await self.manager.get_state(state_id)
+        if epoch == self._epoch:
+            self._cache_put(
+                state_id, state_object.state, state_object.data, state_object.version
+            )
+
+        state_object.manager = self
+        return state_object
+
+
+    async def set_state(
+        self,
+        state_id: str,
+        state: Optional[str] = None,
+        state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
+    ):
+        epoch = self._epoch
+        new_version = await self.manager.set_state(
+            state_id=state_id,
+            state=state,
+            state_data=state_data,
+            ttl=ttl,
+            version=version,
+        )
+        await self._publish(state_id)
+        # the written value is known, so the next read needs no round trip,
+        # unless another invalidation came in while writing
+        if self._epoch == epoch + 1 and state is not None and state_data is not None and not ttl:
+            self._cache_put(state_id, state, state_data, new_version)
+        return new_version
+
+
+    async def get_data_fields(self, state_id: str, keys: Iterable[str]) -> dict:
+        state_object = await self.get_state(state_id)
+        data = state_object.data or {}
+        return {key: data[key] for key in keys if key in data}
+
+
+    async def set_data_fields(
+        self, state_id: str, fields: dict, ttl: Optional[int] = None
+    ) -> int:
+        version = await self.manager.set_data_fields(state_id, fields, ttl=ttl)
+        await self._publish(state_id)
+        return version
+
+
+    async def delete_data_fields(self, state_id: str, keys: Iterable[str]) -> int:
+        version = await self.manager.delete_data_fields(state_id, keys)
+        await self._publish(state_id)
+        return version
+
+
+    async def delete_state(self, state_id: str):
+        await self.manager.delete_state(state_id)
+        await self._publish(state_id)
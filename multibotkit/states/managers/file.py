@@ -0,0 +1,430 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from typing import Optional
+
+from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.records import RECORD_HEADER, Record, iter_records, pack_record
+from multibotkit.states.serializers import BaseSerializer, JSONSerializer
+from multibotkit.states.state import State
+
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = "states.log"
+HINT_FILE = "states.hint"
+
+# magic, generation: a hint file is only used for the log generation it was built for
+LOG_HEADER = struct.Struct("<8s16s")
+LOG_MAGIC = b"MBKLOG01"
+# magic, generation, size of the log covered by the hint
+HINT_HEADER = struct.Struct("<8s16sQ")
+HINT_MAGIC = b"MBKHNT01"
+# hint records keep the value position in the log instead of the value itself
+HINT_VALUE = struct.Struct("<QI")
+
+
+class FileStateManager(BaseStateManager):
+    """
+    Durable state manager for a single process, built as an append-only log.
+
+    Every write appends a record to a preallocated, memory-mapped log file,
+    an in-memory index keeps the position of the latest record of each state,
+    reads are served straight from the mapping. A background task compacts
+    the log once dead records take compaction_ratio of it and writes a hint
+    file with the index, so a restart loads the index instead of scanning the
+    whole log. A torn record at the end of the log is dropped on startup.
+
+    Writes reach the OS page cache immediately and are fsynced every
+    flush_interval seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = "states",
+        ttl: Optional[int] = None,
+        serializer: Optional[BaseSerializer] = None,
+        flush_interval: float = 1.0,
+        compaction_interval: float = 60.0,
+        compaction_ratio: float = 0.5,
+        compaction_min_size: int = 16 * 1024 * 1024,
+        grow_size: int = 64 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.serializer = serializer or JSONSerializer()
+        self.flush_interval = flush_interval
+        self.compaction_interval = compaction_interval
+        self.compaction_ratio = compaction_ratio
+        self.compaction_min_size = compaction_min_size
+        self.grow_size = grow_size
+
+        self.log_path = os.path.join(path, LOG_FILE)
+        self.hint_path = os.path.join(path, HINT_FILE)
+
+        # state_id -> (value offset, value length, version, expires_at, record size)
+        self._keydir = {}
+        self._dead_bytes = 0
+        self._size = 0
+        self._dirty = False
+        self._compacting = False
+        self._tasks = []
+
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+
+    def _open(self):
+        if not os.path.exists(self.log_path):
+            with open(self.log_path, "wb") as f:
+                f.write(LOG_HEADER.pack(LOG_MAGIC, uuid.uuid4().bytes))
+
+        self._file = open(self.log_path, "r+b")
+        magic, self._generation = LOG_HEADER.unpack(self._file.read(LOG_HEADER.size))
+        if magic != LOG_MAGIC:
+            raise ValueError(f"{self.log_path} is not a state log")
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        start = self._load_hint()
+        self._size = self._replay(start)
+
+
+    def _load_hint(self) -> int:
+        if not os.path.exists(self.hint_path) or os.path.getsize(self.hint_path) == 0:
+            return LOG_HEADER.size
+
+        with open(self.hint_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as hint:
+                magic, generation, covered = HINT_HEADER.unpack_from(hint)
+                if magic != HINT_MAGIC or generation != self._generation:
+                    return LOG_HEADER.size
+
+                keydir = {}
+                end = HINT_HEADER.size
+                for record in iter_records(hint, HINT_HEADER.size):
+                    value_offset, value_len = HINT_VALUE.unpack_from(
+                        hint, record.value_offset
+                    )
+                    record_size = RECORD_HEADER.size + len(record.key.encode()) + value_len
+                    keydir[record.key] = (
+                        value_offset,
+                        value_len,
+                        record.version,
+                        record.expires_at,
+                        record_size,
+                    )
+                    end = record.end
+
+                if end != len(hint):
+                    # damaged hint, rebuild the index from the log
+                    return LOG_HEADER.size
+
+        self._keydir = keydir
+        return covered
+
+
+    def _replay(self, offset: int) -> int:
+        for record in iter_records(self._mmap, offset):
+            self._apply(self._keydir, record)
+            offset = record.end
+        return offset
+
+
+    def _apply(self, keydir: dict, record: Record):
+        previous = keydir.pop(record.key, None)
+        if previous is not None:
+            self._dead_bytes += previous[4]
+
+        record_size = record.end - record.start
+        if record.tombstone:
+            self._dead_bytes += record_size
+            return
+
+        keydir[record.key] = (
+            record.value_offset,
+            record.value_len,
+            record.version,
+            record.expires_at,
+            record_size,
+        )
+
+
+    def _append(self, data: bytes) -> int:
+        start = self._size
+        end = start + len(data)
+        if end > len(self._mmap):
+            self._grow(end)
+        self._mmap[start:end] = data
+        self._size = end
+        self._dirty = True
+        return start
+
+
+    def _grow(self, min_size: int):
+        # the file is preallocated so appends are plain memory copies
+        new_size = max(min_size, len(self._mmap) + self.grow_size)
+        self._mmap.close()
+        self._file.truncate(new_size)
+        self._mmap = mmap.mmap(self._file.fileno(), new_size)
+
+
+    def _write_record(
+        self,
+        state_id: str,
+        value: bytes = b"",
+        version: int = 0,
+        expires_at: Optional[float] = None,
+        tombstone: bool = False,
+    ):
+        data = pack_record(state_id, value, version, expires_at, tombstone)
+        start = self._append(data)
+        record = Record(
+            key=state_id,
+            value_offset=start + len(data) - len(value),
+            value_len=len(value),
+            version=version,
+            expires_at=expires_at,
+            tombstone=tombstone,
+            start=start,
+            end=start + len(data),
+        )
+        self._apply(self._keydir, record)
+        self._start_background_tasks()
+
+
+    def _get_entry(self, state_id: str):
+        entry = self._keydir.get(state_id)
+        if entry is not None and entry[3] is not None and entry[3] <= time.time():
+            return None
+        return entry
+
+
+    def _read_value(self, entry) -> dict:
+        value_offset, value_len = entry[0], entry[1]
+        return self.serializer.loads(self._mmap[value_offset:value_offset + value_len])
+
+
+    async def set_state(
+        self,
+        state_id: str,
+        state: Optional[str] = None,
+        state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
+    ):
+        entry = self._get_entry(state_id)
+        current_version = 0 if entry is None else entry[2]
+        self._check_version(state_id, version, current_version)
+
+        if entry is not None and (state is None or state_data is None):
+            current = self._read_value(entry)
+            if state is None:
+                state = current["state"]
+            if state_data is None:
+                state_data = current["data"]
+
+        ttl = self._get_ttl(ttl)
+        self._write_record(
+            state_id,
+            self.serializer.dumps({"state": state, "data": state_data}),
+            version=current_version + 1,
+            expires_at=None if ttl is None else time.time() + ttl,
+        )
+        return current_version + 1
+
+
+    async def get_state(
+        self, state_id: str
+    ):
+        entry = self._get_entry(state_id)
+
+        if entry is None:
+            state = State(
+                self,
+                state_id=state_id,
+                state=None,
+                state_data=None
+            )
+            return state
+
+        value = self._read_value(entry)
+        state = State(
+            self,
+            state_id=state_id,
+            state=value["state"],
+            state_data=value["data"],
+            version=entry[2]
+        )
+        return state
+
+
+    async def delete_state(self, state_id: str):
+        if state_id in self._keydir:
+            self._write_record(state_id, tombstone=True)
+
+
+    def _start_background_tasks(self):
+        if self._tasks:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._tasks = [
+            loop.create_task(self._flush_loop()),
+            loop.create_task(self._compaction_loop()),
+        ]
+
+
+    def _fsync(self, fd: int):
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+    async def flush(self):
+        """
+        Waits until everything written so far is on disk.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        # a duplicate descriptor stays valid even if compaction swaps the log
+        fd = os.dup(self._file.fileno())
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._fsync, fd)
+        except Exception:
+            self._dirty = True
+            raise
+
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to fsync states log")
+
+
+    async def _compaction_loop(self):
+        while True:
+            await asyncio.sleep(self.compaction_interval)
+            if (
+                self._size >= self.compaction_min_size
+                and self._dead_bytes >= self._size * self.compaction_ratio
+            ):
+                try:
+                    await self.compact()
+                except Exception:
+                    logger.exception("Failed to compact states log")
+
+
+    def _write_compacted(self, entries: dict, generation: bytes):
+        compact_path = self.log_path + ".compact"
+        hint_path = self.hint_path + ".tmp"
+        keydir = {}
+
+        with open(self.log_path, "rb") as source_file, open(compact_path, "wb") as target:
+            with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                target.write(LOG_HEADER.pack(LOG_MAGIC, generation))
+                offset = LOG_HEADER.size
+                for state_id, (value_offset, value_len, version, expires_at, _) in entries.items():
+                    value = source[value_offset:value_offset + value_len]
+                    data = pack_record(state_id, value, version, expires_at)
+                    target.write(data)
+                    keydir[state_id] = (
+                        offset + len(data) - value_len,
+                        value_len,
+                        version,
+                        expires_at,
+                        len(data),
+                    )
+                    offset += len(data)
+            target.flush()
+            os.fsync(target.fileno())
+
+        with open(hint_path, "wb") as hint:
+            hint.write(HINT_HEADER.pack(HINT_MAGIC, generation, offset))
+            for state_id, (value_offset, value_len, version, expires_at, _) in keydir.items():
+                hint.write(
+                    pack_record(
+                        state_id,
+                        HINT_VALUE.pack(value_offset, value_len),
+                        version,
+                        expires_at,
+                    )
+                )
+            hint.flush()
+            os.fsync(hint.fileno())
+
+        return keydir, offset
+
+
+    async def compact(self):
+        """
+        Rewrites the log keeping only live states and writes a new hint file.
+        Writes made while the log is being rewritten are carried over.
+        """
+        if self._compacting:
+            return
+        self._compacting = True
+        try:
+            end = self._size
+            now = time.time()
+            entries = {
+                state_id: entry
+                for state_id, entry in self._keydir.items()
+                if entry[3] is None or entry[3] > now
+            }
+            generation = uuid.uuid4().bytes
+            keydir, size = await asyncio.get_running_loop().run_in_executor(
+                None, self._write_compacted, entries, generation
+            )
+            # no awaits from here on, so no writes can interleave with the swap
+            self._swap_log(keydir, size, self._mmap[end:self._size], generation)
+        finally:
+            self._compacting = False
+
+
+    def _swap_log(self, keydir: dict, size: int, tail: bytes, generation: bytes):
+        compact_path = self.log_path + ".compact"
+        new_file = open(compact_path, "r+b")
+        new_file.truncate(size + len(tail) + self.grow_size)
+        new_mmap = mmap.mmap(new_file.fileno(), 0)
+        new_mmap[size:size + len(tail)] = tail
+
+        self._dead_bytes = 0
+        for record in iter_records(new_mmap, size, size + len(tail)):
+            self._apply(keydir, record)
+
+        os.replace(compact_path, self.log_path)
+        os.replace(self.hint_path + ".tmp", self.hint_path)
+
+        self._mmap.close()
+        self._file.close()
+        self._file, self._mmap = new_file, new_mmap
+        self._keydir = keydir
+        self._size = size + len(tail)
+        self._generation = generation
+        self._dirty = True
+
+
+    def _close(self):
+        self._mmap.flush()
+        self._mmap.close()
+        # drop the preallocated space, replay stops at the end of valid records anyway
+        self._file.truncate(self._size)
+        self._file.close()
+
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
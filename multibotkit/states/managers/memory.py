@@ -1,13 +1,215 @@
+import asyncio
+import logging
+import os
+import time
 from typing import Optional
 
 from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.records import iter_records, pack_record
+from multibotkit.states.serializers import BaseSerializer, JSONSerializer
 from multibotkit.states.state import State
 
 
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"MBKSNP01"
+
+
 class MemoryStateManager(BaseStateManager):
+    """
+    Keeps states in the storage dict.
 
-    def __init__(self):
+    With snapshot_path set, states changed through the manager are appended
+    to "<snapshot_path>.delta" every snapshot_interval seconds and merged into
+    the full snapshot at snapshot_path once the delta outgrows it. Files are
+    written off the event loop and loaded back when the manager is created.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        purge_interval: int = 60,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 60.0,
+        serializer: Optional[BaseSerializer] = None,
+    ):
         self.storage = {}
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.serializer = serializer or JSONSerializer()
+        self._changed = set()
+        self._snapshot_task = None
+        self._snapshot_lock = None
+
+        if snapshot_path is not None:
+            self._load_snapshot()
+
+
+    @property
+    def _delta_path(self) -> str:
+        return self.snapshot_path + ".delta"
+
+
+    def _read_snapshot_file(self, path: str, records: dict):
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            buffer = f.read()
+        if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a state snapshot")
+        # a torn record at the end of the delta is skipped
+        for record in iter_records(buffer, len(SNAPSHOT_MAGIC)):
+            if record.tombstone:
+                records.pop(record.key, None)
+                continue
+            value = buffer[record.value_offset:record.value_offset + record.value_len]
+            records[record.key] = (value, record.version, record.expires_at)
+
+
+    def _read_snapshot(self) -> dict:
+        records = {}
+        self._read_snapshot_file(self.snapshot_path, records)
+        self._read_snapshot_file(self._delta_path, records)
+        return records
+
+
+    def _load_snapshot(self):
+        now = time.time()
+        for state_id, (value, version, expires_at) in self._read_snapshot().items():
+            if expires_at is not None and expires_at <= now:
+                continue
+            value = self.serializer.loads(value)
+            value["version"] = version
+            if expires_at is not None:
+                value["expires_at"] = expires_at
+            self.storage[state_id] = value
+
+
+    def _pack_changes(self, state_ids: set) -> bytes:
+        records = []
+        for state_id in state_ids:
+            value = self.storage.get(state_id)
+            if value is None:
+                records.append(pack_record(state_id, tombstone=True))
+                continue
+            records.append(
+                pack_record(
+                    state_id,
+                    self.serializer.dumps({"state": value["state"], "data": value["data"]}),
+                    version=value.get("version", 0),
+                    expires_at=value.get("expires_at"),
+                )
+            )
+        return b"".join(records)
+
+
+    def _write_delta(self, data: bytes):
+        with open(self._delta_path, "ab") as f:
+            if f.tell() == 0:
+                f.write(SNAPSHOT_MAGIC)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        base_size = os.path.getsize(self.snapshot_path) if os.path.exists(self.snapshot_path) else 0
+        if os.path.getsize(self._delta_path) > base_size:
+            self._merge_snapshot()
+
+
+    def _merge_snapshot(self):
+        now = time.time()
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            for state_id, (value, version, expires_at) in self._read_snapshot().items():
+                if expires_at is not None and expires_at <= now:
+                    continue
+                f.write(pack_record(state_id, value, version, expires_at))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        os.remove(self._delta_path)
+
+
+    async def snapshot(self):
+        """
+        Writes states changed since the previous snapshot to disk.
+        """
+        if self.snapshot_path is None:
+            return
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+
+        async with self._snapshot_lock:
+            if not self._changed:
+                return
+            changed, self._changed = self._changed, set()
+            # values are encoded on the loop, since handlers may still mutate them
+            data = self._pack_changes(changed)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._write_delta, data
+                )
+            except Exception:
+                self._changed |= changed
+                raise
+
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception:
+                # changes stay marked and are written by the next snapshot
+                logger.exception("Failed to write states snapshot")
+
+
+    def _track_change(self, state_id: str):
+        if self.snapshot_path is None:
+            return
+        self._changed.add(state_id)
+        if self._snapshot_task is None or self._snapshot_task.done():
+            self._snapshot_task = asyncio.get_running_loop().create_task(
+                self._snapshot_loop()
+            )
+
+
+    async def close(self):
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        await self.snapshot()
+
+
+    def _purge_expired(self):
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+
+        expired = [
+            state_id
+            for state_id, value in self.storage.items()
+            if value.get("expires_at") is not None and value["expires_at"] <= now
+        ]
+        for state_id in expired:
+            self.storage.pop(state_id)
+
+
+    def _get_value(self, state_id: str):
+        value = self.storage.get(state_id)
+
+        if value is not None and value.get("expires_at") is not None:
+            if value["expires_at"] <= time.time():
+                self.storage.pop(state_id)
+                value = None
+
+        return value
 
 
     async def set_state(
@@ -15,23 +217,41 @@ class MemoryStateManager(BaseStateManager):
         state_id: str,
         state: Optional[str] = None,
         state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
     ):
-        state_object = await self.get_state(state_id=state_id)
+        # no awaits between the check and the write, so the check is atomic
+        current = self._get_value(state_id) or {}
+        current_version = current.get("version", 0)
+        self._check_version(state_id, version, current_version)
 
         if state is None:
-            state = state_object.state
+            state = current.get("state")
         if state_data is None:
-            state_data = state_object.data
+            state_data = current.get("data")
 
-        input_state = {"state": state, "data": state_data}
+        input_state = {
+            "state": state,
+            "data": state_data,
+            "version": current_version + 1,
+        }
+
+        ttl = self._get_ttl(ttl)
+        if ttl is not None:
+            input_state["expires_at"] = time.time() + ttl
 
         self.storage[state_id] = input_state
+        self._track_change(state_id)
+        self._purge_expired()
+        return input_state["version"]
 
 
     async def get_state(
         self, state_id: str
     ):
-        if state_id not in self.storage.keys():
+        value = self._get_value(state_id)
+
+        if value is None:
             state = State(
                 self,
                 state_id=state_id,
@@ -43,8 +263,9 @@ class MemoryStateManager(BaseStateManager):
         state = State(
             self,
             state_id=state_id,
-            state=self.storage[state_id]["state"],
-            state_data=self.storage[state_id]["data"],
+            state=value["state"],
+            state_data=value["data"],
+            version=value.get("version", 0),
         )
         return state
 
@@ -52,3 +273,4 @@ class MemoryStateManager(BaseStateManager):
     async def delete_state(self, state_id: str):
         if state_id in self.storage.keys():
             self.storage.pop(state_id)
+            self._track_change(state_id)
@@ -1,20 +1,221 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
-from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.managers.base import BaseStateManager, StateConflictError
 from multibotkit.states.state import State
 
 
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class DuplicateStatesError(Exception):
+    def __init__(self, collection: str):
+        self.collection = collection
+        super().__init__(
+            f"Collection {collection} has several documents with one state_id, "
+            "left by earlier versions of MongoStateManager, so the unique state_id "
+            "index can not be built. Run `await manager.remove_duplicate_states()` "
+            "once to keep only the latest document of every state."
+        )
+
+
 class MongoStateManager(BaseStateManager):
-    
+    """
+    With write_behind=True writes are kept in a buffer, where several writes
+    of one state collapse into one, and stored every flush_interval seconds
+    (or once max_buffer_size states are buffered) with a single unordered
+    bulk_write. Reads see buffered writes. Versions are then only checked
+    against writes of this process, and close() must be awaited on shutdown
+    to store what is still buffered.
+    """
+
     def __init__(
-        self, connection_url: str, db_name: str = "states", collection: str = "states"
+        self,
+        connection_url: str,
+        db_name: str = "states",
+        collection: str = "states",
+        ttl: Optional[int] = None,
+        write_behind: bool = False,
+        flush_interval: float = 1.0,
+        max_buffer_size: int = 1000,
     ):
         self.connection_url = connection_url
         self.collection = collection
         self.client = AsyncIOMotorClient(connection_url)
         self.db = self.client[db_name]
+        self.ttl = ttl
+        self._indexes_created = False
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size
+        # state_id -> document to store, or None to delete it
+        self._buffer = {}
+        # writes taken from the buffer by a flush that is still running
+        self._flushing = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+
+    async def _ensure_indexes(self):
+        if self._indexes_created:
+            return
+        # unique state_id makes concurrent first writes of a state conflict
+        try:
+            await self.db[self.collection].create_index("state_id", unique=True)
+        except DuplicateKeyError as e:
+            raise DuplicateStatesError(self.collection) from e
+        # documents are removed by mongod once "expires_at" is in the past
+        await self.db[self.collection].create_index(
+            "expires_at", expireAfterSeconds=0
+        )
+        self._indexes_created = True
+
+
+    async def remove_duplicate_states(self) -> int:
+        """
+        Migration for collections written by earlier versions, which could
+        store several documents for one state_id: keeps the document with
+        the highest version of every state and returns how many were deleted.
+        """
+        collection = self.db[self.collection]
+        duplicates = collection.aggregate([
+            {"$sort": {"version": -1}},
+            {"$group": {"_id": "$state_id", "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}},
+        ])
+        ids = []
+        async for group in duplicates:
+            ids.extend(group["ids"][1:])
+        if not ids:
+            return 0
+        result = await collection.delete_many({"_id": {"$in": ids}})
+        return result.deleted_count
+
+
+    @staticmethod
+    def _is_expired(doc: dict) -> bool:
+        expires_at = doc.get("expires_at")
+        if expires_at is None:
+            return False
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at <= datetime.now(timezone.utc)
+
+
+    def _find_buffered_doc(self, state_id: str):
+        doc = self._buffer.get(state_id, _MISSING)
+        if doc is _MISSING:
+            doc = self._flushing.get(state_id, _MISSING)
+        return doc
+
+
+    async def _find_state_doc(self, state_id: str):
+        doc = self._find_buffered_doc(state_id)
+        if doc is _MISSING:
+            doc = await self.db[self.collection].find_one({"state_id": state_id})
+            # a write could have been buffered while the query was running
+            buffered_doc = self._find_buffered_doc(state_id)
+            if buffered_doc is not _MISSING:
+                doc = buffered_doc
+
+        # TTL monitor runs once a minute, so expired documents are checked here too
+        if doc is not None and self._is_expired(doc):
+            doc = dict(doc)
+            doc["state"] = None
+            doc["data"] = None
+        return doc
+
+
+    async def _buffer_state(
+        self,
+        state_id: str,
+        state: Optional[str],
+        state_data: Optional[dict],
+        ttl: Optional[int],
+        version: Optional[int],
+    ):
+        doc = await self._find_state_doc(state_id)
+        # no awaits from here until the write is buffered
+        current_version = 0 if doc is None else doc.get("version", 0)
+        self._check_version(state_id, version, current_version)
+
+        ttl = self._get_ttl(ttl)
+        self._buffer[state_id] = {
+            "state": state if state is not None or doc is None else doc["state"],
+            "data": state_data if state_data is not None or doc is None else doc["data"],
+            "version": current_version + 1,
+            "expires_at": (
+                None if ttl is None
+                else datetime.now(timezone.utc) + timedelta(seconds=ttl)
+            ),
+        }
+        await self._after_buffer_write()
+        return current_version + 1
+
+
+    async def _after_buffer_write(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+        if len(self._buffer) >= self.max_buffer_size:
+            await self.flush()
+
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # failed writes stay in the buffer and are retried on the next flush
+                logger.exception("Failed to flush buffered states")
+
+
+    async def flush(self):
+        """
+        Stores buffered writes with one unordered bulk_write.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            self._flushing, self._buffer = self._buffer, {}
+
+            operations = []
+            for state_id, doc in self._flushing.items():
+                if doc is None:
+                    operations.append(DeleteOne({"state_id": state_id}))
+                    continue
+                update = {"$set": dict(doc)}
+                if doc["expires_at"] is None:
+                    update["$set"].pop("expires_at")
+                    update["$unset"] = {"expires_at": ""}
+                operations.append(UpdateOne({"state_id": state_id}, update, upsert=True))
+
+            try:
+                await self._ensure_indexes()
+                await self.db[self.collection].bulk_write(operations, ordered=False)
+            except Exception:
+                # keep failed writes unless they were overwritten meanwhile
+                for state_id, doc in self._flushing.items():
+                    self._buffer.setdefault(state_id, doc)
+                raise
+            finally:
+                self._flushing = {}
+
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
 
 
     async def set_state(
@@ -22,28 +223,74 @@ class MongoStateManager(BaseStateManager):
         state_id: str,
         state: Optional[str] = None,
         state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
     ):
-        state_object = await self.get_state(state_id=state_id)
+        if self.write_behind:
+            return await self._buffer_state(state_id, state, state_data, ttl, version)
+
+        await self._ensure_indexes()
+
+        doc = await self._find_state_doc(state_id)
+        current_version = 0 if doc is None else doc.get("version", 0)
+        self._check_version(state_id, version, current_version)
 
         if state is None:
-            state = state_object.state
+            state = None if doc is None else doc["state"]
         if state_data is None:
-            state_data = state_object.data
+            state_data = None if doc is None else doc["data"]
 
-        if state_object.state is not None:
-            await self.db[self.collection].update_one(
-                {"state_id": state_id}, {"$set": {"state": state, "data": state_data}}
-            )
+        update = {
+            "$set": {
+                "state": state,
+                "data": state_data,
+                "version": current_version + 1,
+            }
+        }
+
+        ttl = self._get_ttl(ttl)
+        if ttl is not None:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+            update["$set"]["expires_at"] = expires_at
         else:
-            await self.db[self.collection].insert_one(
-                {"state_id": state_id, "state": state, "data": state_data}
+            update["$unset"] = {"expires_at": ""}
+
+        if version is None:
+            update["$set"].pop("version")
+            update["$inc"] = {"version": 1}
+            result = await self.db[self.collection].find_one_and_update(
+                {"state_id": state_id},
+                update,
+                upsert=True,
+                projection={"version": True},
+                return_document=ReturnDocument.AFTER,
             )
+            return result["version"]
+
+        if doc is None:
+            try:
+                await self.db[self.collection].insert_one(
+                    {"state_id": state_id, **update["$set"]}
+                )
+            except DuplicateKeyError:
+                actual_state = await self.get_state(state_id)
+                raise StateConflictError(state_id, version, actual_state.version)
+            return current_version + 1
+
+        # legacy documents without "version" are matched by {"version": None}
+        result = await self.db[self.collection].update_one(
+            {"state_id": state_id, "version": doc.get("version")}, update
+        )
+        if result.matched_count == 0:
+            actual_state = await self.get_state(state_id)
+            raise StateConflictError(state_id, version, actual_state.version)
+        return current_version + 1
 
 
     async def get_state(
         self, state_id: str
     ):
-        doc = await self.db[self.collection].find_one({"state_id": state_id})
+        doc = await self._find_state_doc(state_id)
 
         if doc is None:
             state = State(
@@ -58,7 +305,8 @@ class MongoStateManager(BaseStateManager):
             self,
             state_id=state_id,
             state=doc["state"],
-            state_data=doc["data"]
+            state_data=doc["data"],
+            version=doc.get("version", 0)
         )
         return state
 
@@ -66,5 +314,10 @@ class MongoStateManager(BaseStateManager):
     async def delete_state(
         self, state_id: str
     ):
+        if self.write_behind:
+            self._buffer[state_id] = None
+            await self._after_buffer_write()
+            return
+
         result = await self.db[self.collection].delete_one({"state_id": state_id})
         return result
@@ -1,24 +1,194 @@
 import json
-from typing import Optional
+from typing import Iterable, Optional
 
 from redis import asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import (
+    RedisClusterException,
+    RedisError,
+    ResponseError,
+    WatchError,
+)
 
-from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.managers.base import BaseStateManager, StateConflictError
+from multibotkit.states.serializers import BaseSerializer, JSONSerializer
 from multibotkit.states.state import State
 
 
+# Hash layout: every key of the state data is stored in its own hash field,
+# so handlers can read and write single keys without moving the whole blob.
+STATE_FIELD = b"_state"
+VERSION_FIELD = b"_version"
+# serialized data itself, or an empty dict when data is kept in DATA_PREFIX fields
+DATA_FIELD = b"_data"
+DATA_PREFIX = b"d:"
+
+
+def _data_field(key) -> bytes:
+    # data keys become strings the way json.dumps converts dict keys
+    if isinstance(key, str):
+        return DATA_PREFIX + key.encode()
+    if key is None or isinstance(key, (bool, int, float)):
+        return DATA_PREFIX + json.dumps(key).encode()
+    raise TypeError(
+        f"state data keys must be str, int, float, bool or None, not {type(key).__name__}"
+    )
+
+
+DELETE_DATA_FIELDS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+if #ARGV > 0 then
+    redis.call("HDEL", KEYS[1], unpack(ARGV))
+end
+return redis.call("HINCRBY", KEYS[1], "_version", 1)
+"""
+
+SET_DATA_FIELDS_SCRIPT = """
+-- a missing state, one without _state or with data other than a dict
+-- is written by set_state instead
+if redis.call("HEXISTS", KEYS[1], "_state") == 0
+    or redis.call("HGET", KEYS[1], "_data") ~= ARGV[2] then
+    return -1
+end
+redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+local version = redis.call("HINCRBY", KEYS[1], "_version", 1)
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call("EXPIRE", KEYS[1], ttl)
+elseif ttl == 0 then
+    redis.call("PERSIST", KEYS[1])
+end
+return version
+"""
+
+
 class RedisStateManager(BaseStateManager):
-    
+    """
+    Keeps states in Redis or Redis Cluster.
+
+    With cluster=True the connection_url is any node of the cluster and
+    db_number is ignored, cluster supports only the database 0.
+    Keys are built as key_prefix + state_id, hash_tag=True wraps state_id
+    in {} so that all keys of one state always map to the same slot.
+    Pool and socket settings are passed to the client as is, as well as
+    any other connection_kwargs.
+    """
+
     def __init__(
         self,
         connection_url: str,
-        db_number: int = 1
+        db_number: int = 1,
+        ttl: Optional[int] = None,
+        use_hashes: bool = False,
+        serializer: Optional[BaseSerializer] = None,
+        key_prefix: str = "",
+        hash_tag: bool = False,
+        cluster: bool = False,
+        max_connections: Optional[int] = None,
+        socket_timeout: Optional[float] = None,
+        socket_connect_timeout: Optional[float] = None,
+        health_check_interval: int = 0,
+        **connection_kwargs,
     ):
         self.connection_url = connection_url
         self.db_number = db_number
-        self.db = aioredis.from_url(
-            self.connection_url, db=self.db_number, decode_responses=True
+        self.ttl = ttl
+        self.use_hashes = use_hashes
+        self.serializer = serializer or JSONSerializer()
+        self.key_prefix = key_prefix
+        self.hash_tag = hash_tag
+        self.cluster = cluster
+
+        connection_kwargs.update(
+            decode_responses=False,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            health_check_interval=health_check_interval,
+        )
+        if max_connections is not None:
+            connection_kwargs["max_connections"] = max_connections
+
+        if cluster:
+            self.db = RedisCluster.from_url(self.connection_url, **connection_kwargs)
+        else:
+            self.db = aioredis.from_url(
+                self.connection_url, db=self.db_number, **connection_kwargs
+            )
+        self._delete_data_fields_script = self.db.register_script(
+            DELETE_DATA_FIELDS_SCRIPT
         )
+        self._set_data_fields_script = self.db.register_script(SET_DATA_FIELDS_SCRIPT)
+
+
+    def _key(self, state_id: str) -> str:
+        if self.hash_tag:
+            state_id = f"{{{state_id}}}"
+        return self.key_prefix + state_id
+
+
+    async def ping(self) -> bool:
+        """
+        Health check: returns False instead of raising if Redis is unreachable.
+        """
+        try:
+            return bool(await self.db.ping())
+        except (RedisError, RedisClusterException, OSError):
+            return False
+
+
+    async def close(self):
+        await self.db.aclose()
+
+
+    def _doc_to_hash(self, doc: dict) -> dict:
+        dumps = self.serializer.dumps
+        mapping = {
+            STATE_FIELD: dumps(doc["state"]),
+            VERSION_FIELD: doc["version"],
+        }
+        data = doc["data"]
+        if isinstance(data, dict):
+            mapping[DATA_FIELD] = dumps({})
+            for key, value in data.items():
+                mapping[_data_field(key)] = dumps(value)
+        else:
+            mapping[DATA_FIELD] = dumps(data)
+        return mapping
+
+
+    def _hash_to_doc(self, mapping: dict) -> Optional[dict]:
+        if not mapping:
+            return None
+
+        loads = self.serializer.loads
+        state = mapping.get(STATE_FIELD)
+        data = mapping.get(DATA_FIELD)
+        data = None if data is None else loads(data)
+        if isinstance(data, dict):
+            for field, value in mapping.items():
+                if field.startswith(DATA_PREFIX):
+                    data[field[len(DATA_PREFIX):].decode()] = loads(value)
+
+        return {
+            "state": None if state is None else loads(state),
+            "data": data,
+            "version": int(mapping.get(VERSION_FIELD, 0)),
+        }
+
+
+    async def _load_doc(self, client, key: str) -> Optional[dict]:
+        if not self.use_hashes:
+            raw_doc = await client.get(key)
+            return None if raw_doc is None else self.serializer.loads(raw_doc)
+
+        try:
+            return self._hash_to_doc(await client.hgetall(key))
+        except ResponseError:
+            # value written with the string layout, it is converted on next write
+            raw_doc = await client.get(key)
+            return None if raw_doc is None else self.serializer.loads(raw_doc)
 
 
     async def set_state(
@@ -26,27 +196,52 @@ class RedisStateManager(BaseStateManager):
         state_id: str,
         state: Optional[str] = None,
         state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
     ):
-        state_object = await self.get_state(state_id=state_id)
+        expire = self._get_ttl(ttl)
+        key = self._key(state_id)
 
-        if state is None:
-            state = state_object.state
-        if state_data is None:
-            state_data = state_object.data
+        async with self.db.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    doc = await self._load_doc(pipe, key) or {}
+                    current_version = doc.get("version", 0)
+                    self._check_version(state_id, version, current_version)
 
-        input_state = {"state": state, "data": state_data}
+                    input_state = {
+                        "state": doc.get("state") if state is None else state,
+                        "data": doc.get("data") if state_data is None else state_data,
+                        "version": current_version + 1,
+                    }
 
-        state_to_redis = json.dumps(input_state)
-
-        await self.db.set(state_id, state_to_redis)
+                    pipe.multi()
+                    if self.use_hashes:
+                        pipe.delete(key)
+                        pipe.hset(key, mapping=self._doc_to_hash(input_state))
+                        if expire is not None:
+                            pipe.expire(key, expire)
+                    else:
+                        state_to_redis = self.serializer.dumps(input_state)
+                        pipe.set(key, state_to_redis, ex=expire)
+                    await pipe.execute()
+                    return input_state["version"]
+                except WatchError:
+                    if version is not None:
+                        actual_state = await self.get_state(state_id)
+                        raise StateConflictError(
+                            state_id, version, actual_state.version
+                        )
+                    # unconditional writes simply retry on concurrent modification
 
 
     async def get_state(
         self, state_id: str
     ):
-        json_doc = await self.db.get(state_id)
+        doc = await self._load_doc(self.db, self._key(state_id))
 
-        if json_doc is None:
+        if doc is None:
             state = State(
                 self,
                 state_id=state_id,
@@ -55,18 +250,78 @@ class RedisStateManager(BaseStateManager):
             )
             return state
 
-        doc = json.loads(json_doc)
-
         state = State(
             self,
             state_id=state_id,
             state=doc["state"],
-            state_data=doc["data"]
+            state_data=doc["data"],
+            version=doc.get("version", 0)
         )
         return state
 
 
+    async def get_data_fields(self, state_id: str, keys: Iterable[str]) -> dict:
+        if not self.use_hashes:
+            return await super().get_data_fields(state_id, keys)
+
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = await self.db.hmget(
+                self._key(state_id), [_data_field(key) for key in keys]
+            )
+        except ResponseError:
+            return await super().get_data_fields(state_id, keys)
+        return {
+            key: self.serializer.loads(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+
+    async def set_data_fields(
+        self, state_id: str, fields: dict, ttl: Optional[int] = None
+    ) -> int:
+        if not self.use_hashes:
+            return await super().set_data_fields(state_id, fields, ttl=ttl)
+
+        dumps = self.serializer.dumps
+        args = []
+        for key, value in fields.items():
+            args += [_data_field(key), dumps(value)]
+        if not args:
+            return await super().set_data_fields(state_id, fields, ttl=ttl)
+
+        # without a ttl the current expiration of the state is kept
+        expire = self._get_ttl(ttl)
+        if expire is None:
+            expire = 0 if ttl == 0 else -1
+        try:
+            version = await self._set_data_fields_script(
+                keys=[self._key(state_id)], args=[expire, dumps({}), *args]
+            )
+        except ResponseError:
+            version = -1
+        if version == -1:
+            return await super().set_data_fields(state_id, fields, ttl=ttl)
+        return version
+
+
+    async def delete_data_fields(self, state_id: str, keys: Iterable[str]) -> int:
+        if not self.use_hashes:
+            return await super().delete_data_fields(state_id, keys)
+
+        keys = list(keys)
+        try:
+            return await self._delete_data_fields_script(
+                keys=[self._key(state_id)], args=[_data_field(key) for key in keys]
+            )
+        except ResponseError:
+            return await super().delete_data_fields(state_id, keys)
+
+
     async def delete_state(
         self, state_id: str
     ):
-        await self.db.delete(state_id)
+        await self.db.delete(self._key(state_id))
@@ -0,0 +1,406 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from multibotkit.states.managers.base import BaseStateManager
+from multibotkit.states.serializers import BaseSerializer, JSONSerializer
+from multibotkit.states.state import State
+
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS states (
+    state_id TEXT PRIMARY KEY,
+    state TEXT,
+    data BLOB,
+    version INTEGER NOT NULL,
+    expires_at REAL
+)
+"""
+CREATE_EXPIRES_INDEX = "CREATE INDEX IF NOT EXISTS states_expires_at ON states (expires_at)"
+
+# statements are kept constant so sqlite3 reuses the prepared statements it caches
+SELECT_STATE = """
+SELECT state, data, version FROM states
+WHERE state_id = ? AND (expires_at IS NULL OR expires_at > ?)
+"""
+SELECT_STATE_WITH_EXPIRY = """
+SELECT state, data, version, expires_at FROM states
+WHERE state_id = ? AND (expires_at IS NULL OR expires_at > ?)
+"""
+SELECT_STATES = """
+SELECT state_id, state, data, version FROM states
+WHERE state_id IN ({}) AND (expires_at IS NULL OR expires_at > ?)
+"""
+UPSERT_STATE = """
+INSERT INTO states (state_id, state, data, version, expires_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (state_id) DO UPDATE SET
+    state = excluded.state,
+    data = excluded.data,
+    version = excluded.version,
+    expires_at = excluded.expires_at
+"""
+DELETE_STATE = "DELETE FROM states WHERE state_id = ?"
+DELETE_EXPIRED = "DELETE FROM states WHERE expires_at <= ?"
+
+# SQLite limits the number of bound parameters in a single statement
+SELECT_CHUNK_SIZE = 500
+
+_STOP = object()
+
+
+class SQLiteStateManager(BaseStateManager):
+    """
+    Durable state manager for single node deployments.
+
+    All writes go through one background thread that commits queued writes
+    in batches, reads run on a separate thread with its own connection,
+    so the event loop never waits on disk. path must point to a file:
+    the writer and the reader use separate connections to the database.
+    """
+
+    def __init__(
+        self,
+        path: str = "states.db",
+        ttl: Optional[int] = None,
+        serializer: Optional[BaseSerializer] = None,
+        batch_size: int = 256,
+        purge_interval: int = 60,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.serializer = serializer or JSONSerializer()
+        self.batch_size = batch_size
+        self.purge_interval = purge_interval
+
+        self._queue = queue.Queue()
+        self._writer = None
+        self._reader = None
+        self._read_connection = None
+        self._lock = threading.Lock()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        # each connection is used by a single thread at a time
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+
+    def _start(self):
+        with self._lock:
+            if self._writer is not None:
+                return
+            connection = self._connect()
+            connection.execute(CREATE_TABLE)
+            connection.execute(CREATE_EXPIRES_INDEX)
+            self._writer = threading.Thread(
+                target=self._write_loop,
+                args=(connection,),
+                name="sqlite-state-writer",
+                daemon=True,
+            )
+            self._writer.start()
+            self._reader = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="sqlite-state-reader",
+                initializer=self._init_reader,
+            )
+
+
+    def _init_reader(self):
+        self._read_connection = self._connect()
+
+
+    def _close_reader(self):
+        if self._read_connection is not None:
+            self._read_connection.close()
+
+
+    def _write_loop(self, connection: sqlite3.Connection):
+        next_purge = time.time() + self.purge_interval
+
+        while True:
+            jobs = self._get_batch()
+            stop = any(job is _STOP for job in jobs)
+            jobs = [job for job in jobs if job is not _STOP]
+
+            try:
+                results = self._run_batch(connection, jobs)
+                now = time.time()
+                if now >= next_purge:
+                    connection.execute(DELETE_EXPIRED, (now,))
+                    next_purge = now + self.purge_interval
+                # the whole batch becomes durable with a single commit
+                connection.execute("COMMIT")
+            except Exception as e:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                results = [(None, e)] * len(jobs)
+
+            for (_, loop, future), (result, error) in zip(jobs, results):
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+
+            if stop:
+                connection.close()
+                return
+
+
+    def _get_batch(self) -> list:
+        # blocks for the first job, then takes whatever queued up meanwhile
+        jobs = [self._queue.get()]
+        while len(jobs) < self.batch_size:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+
+    @staticmethod
+    def _run_batch(connection: sqlite3.Connection, jobs: list) -> list:
+        results = []
+        connection.execute("BEGIN IMMEDIATE")
+        for job, _, _ in jobs:
+            # a failing job only rolls back its own changes
+            connection.execute("SAVEPOINT job")
+            try:
+                results.append((job(connection), None))
+            except Exception as e:
+                connection.execute("ROLLBACK TO job")
+                results.append((None, e))
+            connection.execute("RELEASE job")
+        return results
+
+
+    async def _write(self, job):
+        self._start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((job, loop, future))
+        return await future
+
+
+    async def _read(self, job):
+        self._start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._reader, lambda: job(self._read_connection)
+        )
+
+
+    def _expires_at(self, ttl: Optional[int]) -> Optional[float]:
+        ttl = self._get_ttl(ttl)
+        return None if ttl is None else time.time() + ttl
+
+
+    def _loads(self, data: Optional[bytes]):
+        return None if data is None else self.serializer.loads(data)
+
+
+    def _dumps(self, data) -> Optional[bytes]:
+        return None if data is None else self.serializer.dumps(data)
+
+
+    async def set_state(
+        self,
+        state_id: str,
+        state: Optional[str] = None,
+        state_data: Optional[dict] = None,
+        ttl: Optional[int] = None,
+        version: Optional[int] = None,
+    ):
+        data = self._dumps(state_data)
+        expires_at = self._expires_at(ttl)
+
+        def job(connection):
+            row = connection.execute(SELECT_STATE, (state_id, time.time())).fetchone()
+            current_version = 0 if row is None else row[2]
+            self._check_version(state_id, version, current_version)
+
+            new_state = state if state is not None or row is None else row[0]
+            new_data = data if data is not None or row is None else row[1]
+            connection.execute(
+                UPSERT_STATE,
+                (state_id, new_state, new_data, current_version + 1, expires_at),
+            )
+            return current_version + 1
+
+        return await self._write(job)
+
+
+    async def get_state(
+        self, state_id: str
+    ):
+        def job(connection):
+            row = connection.execute(SELECT_STATE, (state_id, time.time())).fetchone()
+            if row is None:
+                return None
+            return row[0], self._loads(row[1]), row[2]
+
+        row = await self._read(job)
+
+        if row is None:
+            state = State(
+                self,
+                state_id=state_id,
+                state=None,
+                state_data=None
+            )
+            return state
+
+        state = State(
+            self,
+            state_id=state_id,
+            state=row[0],
+            state_data=row[1],
+            version=row[2]
+        )
+        return state
+
+
+    async def get_states(self, state_ids: Iterable[str]) -> list:
+        state_ids = list(state_ids)
+
+        def job(connection):
+            rows = {}
+            now = time.time()
+            for i in range(0, len(state_ids), SELECT_CHUNK_SIZE):
+                chunk = state_ids[i:i + SELECT_CHUNK_SIZE]
+                query = SELECT_STATES.format(", ".join("?" * len(chunk)))
+                for row in connection.execute(query, (*chunk, now)):
+                    rows[row[0]] = (row[1], self._loads(row[2]), row[3])
+            return rows
+
+        rows = await self._read(job)
+
+        states = []
+        for state_id in state_ids:
+            state, data, version = rows.get(state_id, (None, None, 0))
+            states.append(
+                State(
+                    self,
+                    state_id=state_id,
+                    state=state,
+                    state_data=data,
+                    version=version
+                )
+            )
+        return states
+
+
+    async def _update_data(self, state_id: str, update, ttl: Optional[int], keep_ttl: bool):
+        def job(connection):
+            row = connection.execute(
+                SELECT_STATE_WITH_EXPIRY, (state_id, time.time())
+            ).fetchone()
+            if row is None:
+                if keep_ttl:
+                    return 0
+                row = (None, None, 0, None)
+
+            state, data, current_version, expires_at = row
+            data = update(self._loads(data))
+            if not keep_ttl:
+                expires_at = self._expires_at(ttl)
+            connection.execute(
+                UPSERT_STATE,
+                (state_id, state, self._dumps(data), current_version + 1, expires_at),
+            )
+            return current_version + 1
+
+        return await self._write(job)
+
+
+    async def set_data_fields(
+        self, state_id: str, fields: dict, ttl: Optional[int] = None
+    ) -> int:
+        return await self._update_data(
+            state_id, lambda data: {**(data or {}), **fields}, ttl, keep_ttl=False
+        )
+
+
+    async def delete_data_fields(self, state_id: str, keys: Iterable[str]) -> int:
+        keys = set(keys)
+
+        def update(data):
+            if data is None:
+                return None
+            return {key: value for key, value in data.items() if key not in keys}
+
+        return await self._update_data(state_id, update, None, keep_ttl=True)
+
+
+    async def set_states(
+        self, states: Dict[str, dict], ttl: Optional[int] = None
+    ) -> Dict[str, int]:
+        values = {
+            state_id: (value.get("state"), self._dumps(value.get("data")))
+            for state_id, value in states.items()
+        }
+        expires_at = self._expires_at(ttl)
+
+        def job(connection):
+            versions = {}
+            rows = []
+            now = time.time()
+            for state_id, (state, data) in values.items():
+                row = connection.execute(SELECT_STATE, (state_id, now)).fetchone()
+                if row is None:
+                    row = (None, None, 0)
+                versions[state_id] = row[2] + 1
+                rows.append(
+                    (
+                        state_id,
+                        row[0] if state is None else state,
+                        row[1] if data is None else data,
+                        row[2] + 1,
+                        expires_at,
+                    )
+                )
+            connection.executemany(UPSERT_STATE, rows)
+            return versions
+
+        return await self._write(job)
+
+
+    async def delete_state(
+        self, state_id: str
+    ):
+        await self._write(lambda connection: connection.execute(DELETE_STATE, (state_id,)))
+
+
+    async def delete_states(self, state_ids: Iterable[str]):
+        params = [(state_id,) for state_id in state_ids]
+        await self._write(lambda connection: connection.executemany(DELETE_STATE, params))
+
+
+    async def close(self):
+        """
+        Waits for queued writes to be committed and closes the database.
+        """
+        if self._writer is None:
+            return
+        self._queue.put(_STOP)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.join)
+        await loop.run_in_executor(self._reader, self._close_reader)
+        self._reader.shutdown()
+        self._writer = None
+        self._reader = None
+        self._read_connection = None
+
+
+def _resolve(future: asyncio.Future, result, error: Optional[Exception]):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
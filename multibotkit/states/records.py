@@ -0,0 +1,75 @@
+import struct
+import zlib
+from typing import Iterator, NamedTuple, Optional
+
+
+# crc32, flags, key length, value length, version, expires_at (0 if none)
+RECORD_HEADER = struct.Struct("<IBHIQd")
+TOMBSTONE = 1
+
+
+class Record(NamedTuple):
+    key: str
+    value_offset: int
+    value_len: int
+    version: int
+    expires_at: Optional[float]
+    tombstone: bool
+    start: int
+    end: int
+
+
+def pack_record(
+    key: str,
+    value: bytes = b"",
+    version: int = 0,
+    expires_at: Optional[float] = None,
+    tombstone: bool = False,
+) -> bytes:
+    """
+    Frames a key/value pair as a self-checking binary record.
+    """
+    key = key.encode()
+    header = RECORD_HEADER.pack(
+        0,
+        TOMBSTONE if tombstone else 0,
+        len(key),
+        len(value),
+        version,
+        expires_at or 0.0,
+    )
+    body = header[4:] + key + value
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def iter_records(buffer, offset: int = 0, end: Optional[int] = None) -> Iterator[Record]:
+    """
+    Yields records stored in buffer starting at offset.
+    Stops at the first incomplete or corrupted record, so the end of the
+    last yielded record is where valid data ends (e.g. after a torn write).
+    """
+    end = len(buffer) if end is None else end
+
+    while offset + RECORD_HEADER.size <= end:
+        crc, flags, key_len, value_len, version, expires_at = RECORD_HEADER.unpack_from(
+            buffer, offset
+        )
+        key_offset = offset + RECORD_HEADER.size
+        value_offset = key_offset + key_len
+        record_end = value_offset + value_len
+        if record_end > end:
+            return
+        if zlib.crc32(buffer[offset + 4:record_end]) != crc:
+            return
+
+        yield Record(
+            key=bytes(buffer[key_offset:value_offset]).decode(),
+            value_offset=value_offset,
+            value_len=value_len,
+            version=version,
+            expires_at=expires_at or None,
+            tombstone=bool(flags & TOMBSTONE),
+            start=offset,
+            end=record_end,
+        )
+        offset = record_end
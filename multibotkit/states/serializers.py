@@ -0,0 +1,123 @@
+import json
+import zlib
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Values produced by the JSON serializers are stored as plain JSON, exactly like
+# before serializers existed. Every other format starts with MARKER followed
+# by a one byte format id, so any serializer can load values written by another.
+MARKER = b"\xfe"
+MSGPACK_FORMAT = b"m"
+ZLIB_FORMAT = b"z"
+ZSTD_FORMAT = b"s"
+
+
+def _require(module, name: str):
+    if module is None:
+        raise ImportError(
+            f"{name} is not installed, install it with `pip install {name}`"
+        )
+    return module
+
+
+def loads(raw: bytes) -> Any:
+    if isinstance(raw, str):
+        raw = raw.encode()
+
+    if raw[:1] != MARKER:
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # json.dumps may write NaN/Infinity which orjson rejects
+                pass
+        return json.loads(raw)
+
+    format_id, payload = raw[1:2], raw[2:]
+    if format_id == MSGPACK_FORMAT:
+        return _require(msgpack, "msgpack").unpackb(payload, raw=False)
+    if format_id == ZLIB_FORMAT:
+        return loads(zlib.decompress(payload))
+    if format_id == ZSTD_FORMAT:
+        return loads(_require(zstandard, "zstandard").ZstdDecompressor().decompress(payload))
+    raise ValueError(f"Unknown serialization format: {format_id!r}")
+
+
+class BaseSerializer:
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError("dumps is not implemented")
+
+    def loads(self, raw: bytes) -> Any:
+        return loads(raw)
+
+
+class JSONSerializer(BaseSerializer):
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+
+class OrjsonSerializer(BaseSerializer):
+    def __init__(self):
+        _require(orjson, "orjson")
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MsgpackSerializer(BaseSerializer):
+    def __init__(self):
+        _require(msgpack, "msgpack")
+
+    def dumps(self, value: Any) -> bytes:
+        return MARKER + MSGPACK_FORMAT + msgpack.packb(value, use_bin_type=True)
+
+
+class CompressedSerializer(BaseSerializer):
+    """
+    Compresses values produced by another serializer once they reach threshold bytes.
+    compression is "zlib" or "zstd" (requires zstandard).
+    """
+
+    def __init__(
+        self,
+        serializer: Optional[BaseSerializer] = None,
+        compression: str = "zlib",
+        threshold: int = 1024,
+        level: Optional[int] = None,
+    ):
+        self.serializer = serializer or JSONSerializer()
+        self.threshold = threshold
+
+        if compression == "zlib":
+            level = -1 if level is None else level
+            self._format_id = ZLIB_FORMAT
+            self._compress = lambda payload: zlib.compress(payload, level)
+        elif compression == "zstd":
+            compressor = _require(zstandard, "zstandard").ZstdCompressor(
+                level=3 if level is None else level
+            )
+            self._format_id = ZSTD_FORMAT
+            self._compress = compressor.compress
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
+
+    def dumps(self, value: Any) -> bytes:
+        payload = self.serializer.dumps(value)
+        if len(payload) < self.threshold:
+            return payload
+        return MARKER + self._format_id + self._compress(payload)
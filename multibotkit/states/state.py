@@ -1,39 +1,191 @@
-from typing import Optional
+from copy import deepcopy
+from typing import Iterable, Optional
 
 from multibotkit.states.managers.base import BaseStateManager
 
 
+_DELETED = object()
+
+
 class State:
     def __init__(
         self,
         manager: BaseStateManager,
         state_id: str,
         state: str,
-        state_data: dict
+        state_data: dict,
+        version: int = 0
     ):
         self.db_id = state_id
         self.id = state_id.split("_")[1]
         self.state = state
         self.data = state_data
+        self.version = version
         self.manager = manager
 
+        # deferred mode: writes are collected in _pending and stored by commit()
+        self._deferred = False
+        self._pending = None
+        self._original = None
+
     def __str__(self):
         return f"ID: {self.id} STATE: {self.state} DATA: {self.data}"
 
+    @property
+    def deferred(self) -> bool:
+        return self._deferred
+
+    def begin(self):
+        """
+        Switches the object to deferred mode: set_state, delete_state and data
+        field updates are only recorded until commit() or rollback() is called.
+        """
+        self._deferred = True
+        self._pending = None
+        # handlers may mutate self.data in place, so compare against a copy
+        self._original = deepcopy((self.state, self.data))
+
+    def rollback(self):
+        self._deferred = False
+        self._pending = None
+        self._original = None
+
+    async def commit(self):
+        """
+        Stores the changes recorded since begin() with a single write,
+        writes after delete_state() take a delete and a write.
+        Nothing is written if the state ended up unchanged.
+        """
+        pending, original = self._pending, self._original
+        self.rollback()
+
+        if pending is None:
+            return
+
+        if pending is _DELETED:
+            if self.version != 0:
+                await self.delete_state()
+            return
+
+        if pending["deleted"]:
+            # managers keep the stored state for state=None, so the old state
+            # is deleted first and the new one is written from scratch
+            if self.version != 0:
+                await self.delete_state()
+            self.version = await self.manager.set_state(
+                state_id=self.db_id,
+                state=pending["state"],
+                state_data=pending["data"] or {},
+                ttl=pending["ttl"],
+                version=0,
+            )
+            self.state, self.data = pending["state"], pending["data"] or {}
+            return
+
+        unchanged = (pending["state"], pending["data"]) == original
+        if unchanged and pending["ttl"] is None:
+            return
+
+        await self.set_state(
+            state=pending["state"], state_data=pending["data"], ttl=pending["ttl"]
+        )
+
+    def _get_pending(self) -> dict:
+        if self._pending is None or self._pending is _DELETED:
+            deleted = self._pending is _DELETED
+            if deleted:
+                state, data = None, None
+            else:
+                state, data = self.state, self.data
+            self._pending = {"state": state, "data": data, "ttl": None, "deleted": deleted}
+        return self._pending
+
     async def set_state(
         self,
         state: Optional[str] = None,
-        state_data: Optional[dict] = None
+        state_data: Optional[dict] = None,
+        ttl: Optional[int] = None
     ):
+        if self._deferred:
+            pending = self._get_pending()
+            if state is not None:
+                pending["state"] = state
+            if state_data is not None:
+                pending["data"] = state_data
+            if ttl is not None:
+                pending["ttl"] = ttl
+            return
+
         new_state = self.state if state is None else state
         new_data = self.data if state_data is None else state_data
-        
-        await self.manager.set_state(
+
+        self.version = await self.manager.set_state(
             state_id=self.db_id,
             state=new_state,
-            state_data=new_data
+            state_data=new_data,
+            ttl=ttl,
+            version=self.version
+        )
+
+
+    async def get_data_fields(self, *keys: str) -> dict:
+        if self._deferred and self._pending is not None:
+            data = {} if self._pending is _DELETED else self._pending["data"] or {}
+            return {key: data[key] for key in keys if key in data}
+
+        return await self.manager.get_data_fields(state_id=self.db_id, keys=keys)
+
+
+    def _advance_version(self, version: int, data: dict):
+        # if someone else wrote in between, keep the old version and data
+        # so that the next set_state of this object still conflicts
+        if version == self.version + 1:
+            self.version = version
+            self.data = data
+
+
+    async def set_data_fields(self, fields: dict, ttl: Optional[int] = None):
+        if self._deferred:
+            pending = self._get_pending()
+            pending["data"] = {**(pending["data"] or {}), **fields}
+            if ttl is not None:
+                pending["ttl"] = ttl
+            return
+
+        version = await self.manager.set_data_fields(
+            state_id=self.db_id, fields=fields, ttl=ttl
+        )
+        self._advance_version(version, {**(self.data or {}), **fields})
+
+
+    async def delete_data_fields(self, keys: Iterable[str]):
+        if self._deferred:
+            if self._pending is _DELETED:
+                return
+            pending = self._get_pending()
+            if pending["data"] is not None:
+                keys = set(keys)
+                pending["data"] = {
+                    key: value
+                    for key, value in pending["data"].items()
+                    if key not in keys
+                }
+            return
+
+        keys = set(keys)
+        version = await self.manager.delete_data_fields(
+            state_id=self.db_id, keys=keys
+        )
+        self._advance_version(
+            version,
+            {key: value for key, value in (self.data or {}).items() if key not in keys},
         )
 
 
     async def delete_state(self):
+        if self._deferred:
+            self._pending = _DELETED
+            return
+
         await self.manager.delete_state(state_id=self.db_id)
+        self.version = 0
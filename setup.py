@@ -25,6 +25,13 @@ setuptools.setup(
         "tenacity>=9.1.2",
         "aiofiles>=22.1.0",
     ],
-    extras_require={"mongo": ["motor>=3.7.0"], "redis": ["redis>=7.1.0"]},
+    extras_require={
+        "mongo": ["motor>=3.7.0"],
+        "redis": ["redis>=7.1.0"],
+        "orjson": ["orjson>=3.8.0"],
+        "msgpack": ["msgpack>=1.0.0"],
+        "zstd": ["zstandard>=0.19.0"],
+        "images": ["Pillow>=9.1.0"],
+    },
     python_requires=">=3.11",
 )
@@ -11,6 +11,7 @@ from multibotkit.schemas.fb.incoming import (
     EventEntryMessage,
     EventEntry,
     IncomingEvent,
+    parse_event,
 )
 from multibotkit.schemas.fb.outgoing import (
     GenericTemplateButton,
@@ -188,6 +189,8 @@ def test_fb_incoming_models():
 
     assert incoming_event == IncomingEvent(object="object", entry=[event_entry])
 
+    assert parse_event(json.dumps(incoming_event_dict).encode()) == incoming_event
+
 
 def test_outgoing_models():
 
@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+import pytest
+
+from multibotkit.helpers.file_cache import DiskFileCache
+
+
+def test_disk_file_cache_eviction(tmp_path):
+    cache = DiskFileCache(str(tmp_path), max_size=10)
+
+    first = cache.sync_fetch("first", lambda f: f.write(b"first"))
+    cache.sync_fetch("second", lambda f: f.write(b"second"))
+
+    assert not os.path.exists(first)
+    assert cache.get_path("first") is None
+    data = cache.read("second")
+    assert data[:] == b"second"
+    data.close()
+
+    with pytest.raises(ValueError):
+        cache.sync_fetch("third", lambda f: (f.write(b"part"), int("not a number")))
+
+    cache = DiskFileCache(str(tmp_path), max_size=10)
+    assert cache.get_path("third") is None
+    with open(cache.get_path("second"), "rb") as f:
+        assert f.read() == b"second"
+
+
+@pytest.mark.asyncio
+async def test_disk_file_cache_async_fetch(tmp_path):
+    cache = DiskFileCache(str(tmp_path), max_size=10)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = []
+
+    async def download(f, limit):
+        calls.append(limit)
+        started.set()
+        await release.wait()
+        if limit < 5:
+            raise ValueError("too large")
+        await f.write(b"file")
+
+    first = asyncio.ensure_future(cache.async_fetch("key", lambda f: download(f, 10)))
+    await started.wait()
+    second = asyncio.ensure_future(cache.async_fetch("key", lambda f: download(f, 10)))
+    first.cancel()
+    release.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    path = await second
+    assert calls == [10]
+    with open(path, "rb") as f:
+        assert f.read() == b"file"
+
+    release.clear()
+    started.clear()
+    cache.delete("key")
+    calls.clear()
+    limited = asyncio.ensure_future(cache.async_fetch("key", lambda f: download(f, 1)))
+    await started.wait()
+    waiter = asyncio.ensure_future(cache.async_fetch("key", lambda f: download(f, 10)))
+    await asyncio.sleep(0)
+    release.set()
+
+    with pytest.raises(ValueError):
+        await limited
+    assert await waiter == path
+    assert calls == [1, 10]
+
+    data = await cache.async_open("key", lambda f: download(f, 10))
+    await cache.async_fetch("other", lambda f: f.write(b"other file"))
+    assert cache.get_path("key") is None
+    assert data[:] == b"file"
+    data.close()
@@ -0,0 +1,53 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from multibotkit.helpers.media import ImagePreprocessor
+
+
+@pytest.mark.asyncio
+async def test_image_preprocessor_cancelled_caller():
+    gate = threading.Event()
+
+    class GatedExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            return super().submit(lambda: gate.wait() and fn(*args))
+
+    executor = GatedExecutor(max_workers=1)
+    preprocessor = ImagePreprocessor(max_dimension=300, executor=executor)
+    photo = io.BytesIO()
+    Image.new("RGB", (600, 600), "red").save(photo, format="PNG")
+
+    first = asyncio.ensure_future(preprocessor.async_process(photo.getvalue()))
+    second = asyncio.ensure_future(preprocessor.async_process(photo.getvalue()))
+    while not preprocessor._pending:
+        await asyncio.sleep(0.01)
+    # the second call hashes its source and joins the pending job meanwhile
+    await asyncio.sleep(0.1)
+    first.cancel()
+    gate.set()
+
+    result = await second
+    executor.shutdown()
+    assert first.cancelled()
+    assert result == preprocessor.cache.popitem()[1]
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.size == (300, 300)
+
+
+@pytest.mark.asyncio
+async def test_image_preprocessor_keeps_file_position():
+    preprocessor = ImagePreprocessor(max_dimension=300, executor=ThreadPoolExecutor(1))
+    photo = io.BytesIO()
+    Image.new("RGB", (600, 600), "red").save(photo, format="PNG")
+    photo.seek(0)
+
+    preprocessor.sync_process(photo)
+    assert photo.tell() == 0
+    await preprocessor.async_process(photo)
+    assert photo.tell() == 0
+    preprocessor.close()
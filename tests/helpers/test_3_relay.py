@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from multibotkit.helpers.relay import buffered
+
+
+@pytest.mark.asyncio
+async def test_relay_buffer_is_bounded():
+    produced = []
+
+    async def chunks():
+        for i in range(10):
+            produced.append(i)
+            yield b"chunk"
+        raise ValueError("download failed")
+
+    consumed = 0
+    with pytest.raises(ValueError):
+        async for _ in buffered(chunks(), max_chunks=2):
+            consumed += 1
+            await asyncio.sleep(0.01)
+            assert len(produced) - consumed <= 3
+
+    assert consumed == 10
@@ -1,6 +1,11 @@
+import asyncio
+from datetime import datetime
+
 import pytest
+from pymongo.errors import AutoReconnect
 
-from multibotkit.states.managers.mongo import MongoStateManager
+from multibotkit.states.managers.base import StateConflictError
+from multibotkit.states.managers.mongo import DuplicateStatesError, MongoStateManager
 from tests.config import settings
 
 
@@ -65,6 +70,158 @@ async def test_mongo_manager(mongo_manager):
     assert state_object.data == new_data
 
 
+@pytest.mark.asyncio
+async def test_mongo_manager_ttl(mongo_manager):
+    state_id = "telegram_13"
+    mongo_manager.ttl = 60
+
+    await mongo_manager.set_state(state_id=state_id, state="some_state", state_data={})
+    doc = await mongo_manager.db[mongo_manager.collection].find_one({"state_id": state_id})
+    assert doc["expires_at"] is not None
+
+    indexes = await mongo_manager.db[mongo_manager.collection].index_information()
+    assert any(index.get("expireAfterSeconds") == 0 for index in indexes.values())
+
+    await mongo_manager.db[mongo_manager.collection].update_one(
+        {"state_id": state_id}, {"$set": {"expires_at": datetime(2000, 1, 1)}}
+    )
+    state_object = await mongo_manager.get_state(state_id=state_id)
+    assert state_object.state is None
+
+    await mongo_manager.set_state(state_id=state_id, state="some_state", ttl=0)
+    doc = await mongo_manager.db[mongo_manager.collection].find_one({"state_id": state_id})
+    assert "expires_at" not in doc
+
+    await mongo_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_mongo_manager_versions(mongo_manager):
+    state_id = "telegram_14"
+
+    state_object = await mongo_manager.get_state(state_id=state_id)
+    assert state_object.version == 0
+
+    await state_object.set_state(state="some_state", state_data={})
+    assert state_object.version == 1
+
+    stale_state_object = await mongo_manager.get_state(state_id=state_id)
+    await state_object.set_state(state="new_state")
+    assert state_object.version == 2
+
+    with pytest.raises(StateConflictError):
+        await stale_state_object.set_state(state="stale_state")
+
+    state_object = await mongo_manager.get_state(state_id=state_id)
+    assert state_object.state == "new_state"
+    assert state_object.version == 2
+
+    new_version = await mongo_manager.set_state(state_id=state_id, state="forced_state")
+    assert new_version == 3
+
+    await mongo_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_mongo_manager_write_behind():
+    mongo_manager = MongoStateManager(
+        connection_url=settings.MONGO_CONNECTION_URL,
+        db_name="TEST_DB",
+        collection="TEST_COLLECTION",
+        write_behind=True,
+        flush_interval=60,
+        max_buffer_size=100,
+    )
+    collection = mongo_manager.db[mongo_manager.collection]
+    state_id = "telegram_15"
+
+    for step in range(10):
+        await mongo_manager.set_state(state_id=state_id, state=f"step_{step}", state_data={"step": step})
+    await mongo_manager.set_state(state_id="telegram_16", state="some_state", state_data={})
+    await mongo_manager.delete_state(state_id="telegram_16")
+
+    assert await collection.find_one({"state_id": state_id}) is None
+    state_object = await mongo_manager.get_state(state_id=state_id)
+    assert state_object.state == "step_9"
+    assert state_object.version == 10
+
+    await mongo_manager.flush()
+    doc = await collection.find_one({"state_id": state_id})
+    assert doc["state"] == "step_9"
+    assert doc["data"] == {"step": 9}
+    assert doc["version"] == 10
+    assert await collection.find_one({"state_id": "telegram_16"}) is None
+
+    for i in range(100):
+        await mongo_manager.set_state(state_id=f"telegram_{100 + i}", state="some_state")
+    assert mongo_manager._buffer == {}
+    assert await collection.count_documents({"state": "some_state"}) == 100
+
+    await mongo_manager.set_state(state_id=state_id, state="last_state")
+    await mongo_manager.close()
+    doc = await collection.find_one({"state_id": state_id})
+    assert doc["state"] == "last_state"
+
+
+@pytest.mark.asyncio
+async def test_mongo_manager_write_behind_flush_error():
+    mongo_manager = MongoStateManager(
+        connection_url=settings.MONGO_CONNECTION_URL,
+        db_name="TEST_DB",
+        collection="TEST_COLLECTION",
+        write_behind=True,
+        flush_interval=0.01,
+    )
+    collection = mongo_manager.db[mongo_manager.collection]
+    ensure_indexes = mongo_manager._ensure_indexes
+    calls = []
+
+    async def fail_once():
+        calls.append(None)
+        if len(calls) == 1:
+            raise AutoReconnect("connection lost")
+        await ensure_indexes()
+
+    mongo_manager._ensure_indexes = fail_once
+    await mongo_manager.set_state(state_id="telegram_17", state="some_state", state_data={})
+
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if await collection.find_one({"state_id": "telegram_17"}) is not None:
+            break
+
+    assert len(calls) >= 2
+    assert not mongo_manager._flush_task.done()
+    doc = await collection.find_one({"state_id": "telegram_17"})
+    assert doc["state"] == "some_state"
+    await mongo_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_mongo_manager_duplicate_states():
+    mongo_manager = MongoStateManager(
+        connection_url=settings.MONGO_CONNECTION_URL,
+        db_name="TEST_DB",
+        collection="TEST_DUPLICATES",
+    )
+    collection = mongo_manager.db[mongo_manager.collection]
+    state_id = "telegram_18"
+    await collection.insert_many([
+        {"state_id": state_id, "state": "old_state", "data": {}, "version": 1},
+        {"state_id": state_id, "state": "new_state", "data": {}, "version": 2},
+    ])
+
+    with pytest.raises(DuplicateStatesError):
+        await mongo_manager.set_state(state_id=state_id, state="some_state")
+
+    assert await mongo_manager.remove_duplicate_states() == 1
+    assert (await mongo_manager.get_state(state_id=state_id)).state == "new_state"
+    await mongo_manager.set_state(state_id=state_id, state="some_state")
+    assert (await mongo_manager.get_state(state_id=state_id)).version == 3
+
+    await collection.drop()
+
+
 @pytest.mark.asyncio
 async def test_clean_db(mongo_manager):
     await mongo_manager.db[mongo_manager.collection].delete_many({})
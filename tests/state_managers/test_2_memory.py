@@ -1,5 +1,9 @@
+import asyncio
+import os
+
 import pytest
 
+from multibotkit.states.managers.base import StateConflictError
 from multibotkit.states.managers.memory import MemoryStateManager
 
 
@@ -62,3 +66,219 @@ async def test_memory_manager(memory_manager):
     assert state_object.id == state_id.split("_")[1]
     assert state_object.state == new_state
     assert state_object.data == new_data
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("multibotkit.states.managers.memory.time.time", lambda: now)
+
+    memory_manager = MemoryStateManager(ttl=60)
+    state_id = "telegram_12"
+
+    await memory_manager.set_state(state_id=state_id, state="some_state", state_data={})
+    await memory_manager.set_state(state_id="telegram_13", state="some_state", ttl=10)
+    await memory_manager.set_state(state_id="telegram_14", state="some_state", ttl=0)
+
+    now = 1030.0
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state == "some_state"
+    state_object = await memory_manager.get_state(state_id="telegram_13")
+    assert state_object.state is None
+
+    await state_object.set_state(state="other_state", ttl=120)
+
+    now = 1100.0
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state is None
+    state_object = await memory_manager.get_state(state_id="telegram_13")
+    assert state_object.state == "other_state"
+    state_object = await memory_manager.get_state(state_id="telegram_14")
+    assert state_object.state == "some_state"
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_purge_expired(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("multibotkit.states.managers.memory.time.time", lambda: now)
+
+    memory_manager = MemoryStateManager(ttl=10, purge_interval=60)
+    await memory_manager.set_state(state_id="telegram_1", state="some_state")
+
+    now = 1070.0
+    await memory_manager.set_state(state_id="telegram_2", state="some_state")
+
+    assert "telegram_1" not in memory_manager.storage
+    assert "telegram_2" in memory_manager.storage
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_versions(memory_manager):
+    state_id = "telegram_12"
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.version == 0
+
+    await state_object.set_state(state="some_state", state_data={})
+    assert state_object.version == 1
+
+    stale_state_object = await memory_manager.get_state(state_id=state_id)
+    await state_object.set_state(state="new_state")
+    assert state_object.version == 2
+
+    with pytest.raises(StateConflictError):
+        await stale_state_object.set_state(state="stale_state")
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state == "new_state"
+    assert state_object.version == 2
+
+    new_version = await memory_manager.set_state(state_id=state_id, state="forced_state")
+    assert new_version == 3
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_data_fields(memory_manager):
+    state_id = "telegram_12"
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    await state_object.set_data_fields({"name": "Name", "step": 1})
+    assert state_object.version == 1
+
+    await state_object.set_data_fields({"step": 2})
+    await state_object.delete_data_fields(["name"])
+    assert state_object.version == 3
+    assert await state_object.get_data_fields("name", "step") == {"step": 2}
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state is None
+    assert state_object.data == {"step": 2}
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_data_fields_then_set_state(memory_manager):
+    state_id = "telegram_12"
+    await memory_manager.set_state(state_id=state_id, state="a", state_data={"x": 1})
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    await state_object.set_data_fields({"y": 2})
+    await state_object.delete_data_fields(["x"])
+    assert state_object.data == {"y": 2}
+    await state_object.set_state(state="b")
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state == "b"
+    assert state_object.data == {"y": 2}
+
+    other = await memory_manager.get_state(state_id=state_id)
+    await other.set_data_fields({"z": 3})
+    await state_object.set_data_fields({"w": 4})
+    with pytest.raises(StateConflictError):
+        await state_object.set_state(state="c")
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_deferred_commit(memory_manager):
+    state_id = "telegram_12"
+    await memory_manager.set_state(state_id=state_id, state="some_state", state_data={})
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    state_object.begin()
+    await state_object.set_state(state="new_state")
+    await state_object.set_data_fields({"key": "value"})
+    await state_object.set_state(state="final_state")
+    assert (await memory_manager.get_state(state_id=state_id)).state == "some_state"
+
+    await state_object.commit()
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state == "final_state"
+    assert state_object.data == {"key": "value"}
+    assert state_object.version == 2
+
+    state_object.begin()
+    await state_object.set_state(state="other_state")
+    await state_object.set_state(state="final_state")
+    await state_object.commit()
+    assert (await memory_manager.get_state(state_id=state_id)).version == 2
+
+    state_object.begin()
+    await state_object.delete_state()
+    state_object.rollback()
+    assert (await memory_manager.get_state(state_id=state_id)).state == "final_state"
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_deferred_write_after_delete(memory_manager):
+    state_id = "telegram_12"
+    await memory_manager.set_state(state_id=state_id, state="b", state_data={"old": 0})
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    state_object.begin()
+    await state_object.delete_state()
+    await state_object.set_data_fields({"k": 1})
+    await state_object.commit()
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state is None
+    assert state_object.data == {"k": 1}
+
+    state_object.begin()
+    await state_object.delete_state()
+    await state_object.set_state(state="c")
+    await state_object.commit()
+
+    state_object = await memory_manager.get_state(state_id=state_id)
+    assert state_object.state == "c"
+    assert state_object.data == {}
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_snapshot(tmp_path):
+    snapshot_path = str(tmp_path / "states.snapshot")
+
+    memory_manager = MemoryStateManager(snapshot_path=snapshot_path)
+    for i in range(10):
+        await memory_manager.set_state(state_id=f"telegram_{i}", state="some_state", state_data={"i": i})
+    await memory_manager.snapshot()
+    assert os.path.getsize(snapshot_path) > 0
+
+    await memory_manager.set_state(state_id="telegram_1", state="new_state")
+    await memory_manager.delete_state(state_id="telegram_2")
+    await memory_manager.set_state(state_id="telegram_3", state="expired", ttl=-1)
+    await memory_manager.close()
+    assert os.path.exists(snapshot_path + ".delta")
+
+    memory_manager = MemoryStateManager(snapshot_path=snapshot_path)
+    state_object = await memory_manager.get_state(state_id="telegram_1")
+    assert state_object.state == "new_state"
+    assert state_object.data == {"i": 1}
+    assert state_object.version == 2
+    assert (await memory_manager.get_state(state_id="telegram_2")).state is None
+    assert "telegram_3" not in memory_manager.storage
+    assert len(memory_manager.storage) == 8
+    await memory_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_manager_snapshot_error(tmp_path):
+    snapshot_path = str(tmp_path / "states.snapshot")
+    memory_manager = MemoryStateManager(snapshot_path=snapshot_path, snapshot_interval=0.01)
+    write_delta = memory_manager._write_delta
+    calls = []
+
+    def fail_once(data):
+        calls.append(None)
+        if len(calls) == 1:
+            raise OSError("No space left on device")
+        write_delta(data)
+
+    memory_manager._write_delta = fail_once
+    await memory_manager.set_state(state_id="telegram_1", state="some_state", state_data={})
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if len(calls) >= 2:
+            break
+
+    assert not memory_manager._snapshot_task.done()
+    await memory_manager.close()
+    assert (await MemoryStateManager(snapshot_path=snapshot_path).get_state("telegram_1")).state == "some_state"
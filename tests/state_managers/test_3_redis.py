@@ -1,6 +1,12 @@
+import asyncio
+import json
+
 import pytest
 
+from multibotkit.states.managers.base import StateConflictError
+from multibotkit.states.managers.cached import CachedStateManager
 from multibotkit.states.managers.redis import RedisStateManager
+from multibotkit.states.serializers import CompressedSerializer, MARKER
 from tests.config import settings
 
 
@@ -61,6 +67,246 @@ async def test_redis_manager(redis_manager):
     assert state_object.data == new_data
 
 
+@pytest.mark.asyncio
+async def test_redis_manager_versions(redis_manager):
+    state_id = "telegram_14"
+
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.version == 0
+
+    await state_object.set_state(state="some_state", state_data={})
+    assert state_object.version == 1
+
+    stale_state_object = await redis_manager.get_state(state_id=state_id)
+    await state_object.set_state(state="new_state")
+    assert state_object.version == 2
+
+    with pytest.raises(StateConflictError):
+        await stale_state_object.set_state(state="stale_state")
+
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "new_state"
+    assert state_object.version == 2
+
+    new_version = await redis_manager.set_state(state_id=state_id, state="forced_state")
+    assert new_version == 3
+
+    await redis_manager.delete_state(state_id=state_id)
+
+
 @pytest.mark.asyncio
 async def test_clean_db(redis_manager):
     await redis_manager.db.flushdb()
+
+
+@pytest.mark.asyncio
+async def test_redis_manager_ttl():
+    redis_manager = RedisStateManager(connection_url=settings.REDIS_CONNECTION_URL, ttl=60)
+    state_id = "telegram_12"
+
+    await redis_manager.set_state(state_id=state_id, state="some_state", state_data={})
+    assert 0 < await redis_manager.db.ttl(state_id) <= 60
+
+    await redis_manager.set_state(state_id=state_id, ttl=10)
+    assert 0 < await redis_manager.db.ttl(state_id) <= 10
+
+    await redis_manager.set_state(state_id=state_id, ttl=0)
+    assert await redis_manager.db.ttl(state_id) == -1
+
+    await redis_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_redis_manager_hashes():
+    redis_manager = RedisStateManager(
+        connection_url=settings.REDIS_CONNECTION_URL, use_hashes=True
+    )
+    state_id = "telegram_15"
+    state_data = {"cart": [1, 2, 3], "name": "Name"}
+
+    await redis_manager.db.set(
+        state_id, json.dumps({"state": "legacy_state", "data": state_data})
+    )
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "legacy_state"
+    assert state_object.data == state_data
+
+    await state_object.set_state(state="some_state")
+    assert await redis_manager.db.type(state_id) == b"hash"
+    assert await redis_manager.db.hget(state_id, "d:name") == b'"Name"'
+
+    await state_object.set_data_fields({"name": "New name", "step": 2})
+    assert state_object.version == 2
+    assert await state_object.get_data_fields("name", "step", "missing") == {
+        "name": "New name",
+        "step": 2,
+    }
+
+    await state_object.delete_data_fields(["cart"])
+    assert state_object.version == 3
+
+    await state_object.set_data_fields({1: "one"})
+    assert await state_object.get_data_fields(1) == {1: "one"}
+    await state_object.delete_data_fields([1])
+    with pytest.raises(TypeError):
+        await state_object.set_data_fields({(1, 2): "pair"})
+    assert state_object.version == 5
+
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "some_state"
+    assert state_object.data == {"name": "New name", "step": 2}
+    assert state_object.version == 5
+
+    assert await redis_manager.delete_data_fields("telegram_16", ["cart"]) == 0
+    assert await redis_manager.db.exists("telegram_16") == 0
+
+    await redis_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_redis_manager_hashes_set_data_fields():
+    redis_manager = RedisStateManager(
+        connection_url=settings.REDIS_CONNECTION_URL, use_hashes=True
+    )
+    state_id = "telegram_21"
+
+    assert await redis_manager.set_data_fields(state_id, {"step": 1}) == 1
+    assert await redis_manager.db.hget(state_id, "_state") == b"null"
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.data == {"step": 1}
+
+    await redis_manager.set_state(state_id=state_id, state="some_state", ttl=60)
+    assert await redis_manager.set_data_fields(state_id, {"step": 2}) == 3
+    assert 0 < await redis_manager.db.ttl(state_id) <= 60
+    await redis_manager.set_data_fields(state_id, {"step": 3}, ttl=0)
+    assert await redis_manager.db.ttl(state_id) == -1
+
+    await redis_manager.set_state(state_id=state_id, state_data=[1, 2])
+    with pytest.raises(TypeError):
+        await redis_manager.set_data_fields(state_id, {"step": 4})
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.data == [1, 2]
+    assert state_object.version == 5
+
+    await redis_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_redis_manager_serializer():
+    redis_manager = RedisStateManager(
+        connection_url=settings.REDIS_CONNECTION_URL,
+        serializer=CompressedSerializer(threshold=64),
+    )
+    state_id = "telegram_17"
+    state_data = {"answers": ["answer"] * 100}
+
+    await redis_manager.db.set(
+        state_id, json.dumps({"state": "legacy_state", "data": {}})
+    )
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "legacy_state"
+
+    await state_object.set_state(state="some_state", state_data=state_data)
+    assert (await redis_manager.db.get(state_id)).startswith(MARKER)
+
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "some_state"
+    assert state_object.data == state_data
+
+    await redis_manager.delete_state(state_id=state_id)
+
+
+@pytest.mark.asyncio
+async def test_cached_redis_manager():
+    node_a = CachedStateManager(RedisStateManager(connection_url=settings.REDIS_CONNECTION_URL))
+    node_b = CachedStateManager(RedisStateManager(connection_url=settings.REDIS_CONNECTION_URL))
+    state_id = "telegram_18"
+
+    await node_a.set_state(state_id=state_id, state="some_state", state_data={"key": "value"})
+    state_object = await node_a.get_state(state_id=state_id)
+    assert state_object.state == "some_state"
+    assert state_id in node_a.cache
+
+    state_object = await node_b.get_state(state_id=state_id)
+    await state_object.set_state(state="new_state")
+    assert state_object.manager is node_b
+
+    for _ in range(50):
+        if state_id not in node_a.cache:
+            break
+        await asyncio.sleep(0.01)
+
+    state_object = await node_a.get_state(state_id=state_id)
+    assert state_object.state == "new_state"
+    assert state_object.data == {"key": "value"}
+    assert state_object.version == 2
+
+    await node_b.delete_state(state_id=state_id)
+    await node_a.close()
+    await node_b.close()
+
+
+@pytest.mark.asyncio
+async def test_cached_redis_manager_listener_error():
+    node_a = CachedStateManager(
+        RedisStateManager(connection_url=settings.REDIS_CONNECTION_URL), reconnect_delay=0.01
+    )
+    node_b = CachedStateManager(RedisStateManager(connection_url=settings.REDIS_CONNECTION_URL))
+    state_id = "telegram_20"
+
+    await node_a.set_state(state_id=state_id, state="some_state", state_data={})
+    await node_a.get_state(state_id=state_id)
+    assert state_id in node_a.cache
+
+    # not valid UTF-8, decoding it fails in the listener
+    await node_a.redis.publish(node_a.channel, b"\xff\xfe")
+    for _ in range(50):
+        if state_id not in node_a.cache and node_a._subscribed:
+            break
+        await asyncio.sleep(0.01)
+    assert state_id not in node_a.cache
+    assert not node_a._listener.done()
+
+    await node_a.get_state(state_id=state_id)
+    assert state_id in node_a.cache
+    await node_b.set_state(state_id=state_id, state="new_state")
+    for _ in range(50):
+        if state_id not in node_a.cache:
+            break
+        await asyncio.sleep(0.01)
+    assert (await node_a.get_state(state_id=state_id)).state == "new_state"
+
+    await node_b.delete_state(state_id=state_id)
+    await node_a.close()
+    await node_b.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_manager_keys():
+    redis_manager = RedisStateManager(
+        connection_url=settings.REDIS_CONNECTION_URL,
+        key_prefix="bot:",
+        hash_tag=True,
+        use_hashes=True,
+        max_connections=10,
+        socket_timeout=5,
+    )
+    state_id = "telegram_19"
+    key = "bot:{telegram_19}"
+
+    assert await redis_manager.ping()
+    assert redis_manager._key(state_id) == key
+
+    await redis_manager.set_state(state_id=state_id, state="some_state", state_data={})
+    assert await redis_manager.db.exists(key) == 1
+    assert await redis_manager.db.exists(state_id) == 0
+
+    await redis_manager.set_data_fields(state_id, {"step": 1})
+    await redis_manager.delete_data_fields(state_id, ["step"])
+    state_object = await redis_manager.get_state(state_id=state_id)
+    assert state_object.state == "some_state"
+    assert state_object.version == 3
+
+    await redis_manager.delete_state(state_id=state_id)
+    assert await redis_manager.db.exists(key) == 0
+    await redis_manager.close()
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from multibotkit.states.serializers import (
+    CompressedSerializer,
+    JSONSerializer,
+    MARKER,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    loads,
+)
+
+
+value = {
+    "state": "some_state",
+    "data": {"key": "value", "cart": [{"id": i, "count": 1} for i in range(100)]},
+    "version": 3,
+}
+
+
+def test_json_serializer():
+    serializer = JSONSerializer()
+    raw = serializer.dumps(value)
+
+    assert raw == json.dumps(value).encode()
+    assert serializer.loads(raw) == value
+    assert serializer.loads(json.dumps(value)) == value
+
+
+def test_orjson_serializer():
+    pytest.importorskip("orjson")
+    serializer = OrjsonSerializer()
+    raw = serializer.dumps(value)
+
+    assert json.loads(raw) == value
+    assert serializer.loads(raw) == value
+
+
+def test_msgpack_serializer():
+    pytest.importorskip("msgpack")
+    serializer = MsgpackSerializer()
+    raw = serializer.dumps(value)
+
+    assert raw.startswith(MARKER)
+    assert serializer.loads(raw) == value
+    assert JSONSerializer().loads(raw) == value
+    assert serializer.loads(json.dumps(value).encode()) == value
+
+
+def test_compressed_serializer():
+    serializer = CompressedSerializer(threshold=1024)
+    raw = serializer.dumps(value)
+
+    assert raw.startswith(MARKER)
+    assert len(raw) < len(json.dumps(value))
+    assert serializer.loads(raw) == value
+
+    small_value = {"state": "some_state", "data": {}, "version": 1}
+    assert serializer.dumps(small_value) == json.dumps(small_value).encode()
+
+
+def test_zstd_compressed_serializer():
+    pytest.importorskip("zstandard")
+    pytest.importorskip("msgpack")
+    serializer = CompressedSerializer(
+        MsgpackSerializer(), compression="zstd", threshold=16
+    )
+    raw = serializer.dumps(value)
+
+    assert raw.startswith(MARKER)
+    assert loads(raw) == value
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        loads(MARKER + b"?payload")
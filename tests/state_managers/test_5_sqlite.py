@@ -0,0 +1,111 @@
+import pytest
+import pytest_asyncio
+
+from multibotkit.states.managers.base import StateConflictError
+from multibotkit.states.managers.sqlite import SQLiteStateManager
+
+
+@pytest_asyncio.fixture
+async def sqlite_manager(tmp_path):
+    test_manager = SQLiteStateManager(path=str(tmp_path / "states.db"))
+    yield test_manager
+    await test_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_manager(sqlite_manager):
+    state_id = "telegram_12"
+    state = "some_state"
+    state_data = {"key": "value"}
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    assert state_object.state is None
+    assert state_object.data is None
+
+    await sqlite_manager.set_state(state_id=state_id, state=state, state_data=state_data)
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    assert state_object.db_id == state_id
+    assert state_object.id == state_id.split("_")[1]
+    assert state_object.state == state
+    assert state_object.data == state_data
+
+    await sqlite_manager.set_state(state_id=state_id)
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    assert state_object.state == state
+    assert state_object.data == state_data
+    assert state_object.version == 2
+
+    await sqlite_manager.delete_state(state_id=state_id)
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    assert state_object.state is None
+    assert state_object.data is None
+
+    await sqlite_manager.set_state(state_id=state_id, state=state, state_data=state_data)
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+    stale_state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    new_state = "new_state"
+    new_data = {"new_key": "new_value"}
+
+    await state_object.set_state(state=new_state, state_data=new_data)
+
+    with pytest.raises(StateConflictError):
+        await stale_state_object.set_state(state="stale_state")
+
+    state_object = await sqlite_manager.get_state(state_id=state_id)
+
+    assert state_object.state == new_state
+    assert state_object.data == new_data
+
+
+@pytest.mark.asyncio
+async def test_sqlite_manager_durability(tmp_path):
+    path = str(tmp_path / "states.db")
+
+    sqlite_manager = SQLiteStateManager(path=path)
+    await sqlite_manager.set_state(state_id="telegram_1", state="some_state", state_data={})
+    await sqlite_manager.set_data_fields("telegram_1", {"key": "value"})
+    await sqlite_manager.set_state(state_id="telegram_2", state="some_state", ttl=-1)
+    await sqlite_manager.close()
+
+    sqlite_manager = SQLiteStateManager(path=path)
+    state_object = await sqlite_manager.get_state(state_id="telegram_1")
+    assert state_object.state == "some_state"
+    assert state_object.data == {"key": "value"}
+    assert state_object.version == 2
+
+    state_object = await sqlite_manager.get_state(state_id="telegram_2")
+    assert state_object.state is None
+    await sqlite_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_manager_bulk(sqlite_manager):
+    states = {
+        f"telegram_{i}": {"state": "some_state", "data": {"number": i}}
+        for i in range(1000)
+    }
+
+    versions = await sqlite_manager.set_states(states)
+    assert set(versions.values()) == {1}
+
+    state_objects = await sqlite_manager.get_states(list(states) + ["telegram_missing"])
+    assert [state_object.data for state_object in state_objects[:-1]] == [
+        value["data"] for value in states.values()
+    ]
+    assert state_objects[-1].state is None
+
+    await sqlite_manager.delete_data_fields("telegram_1", ["number"])
+    assert await sqlite_manager.get_data_fields("telegram_1", ["number"]) == {}
+
+    await sqlite_manager.delete_states(list(states)[:500])
+    state_objects = await sqlite_manager.get_states(list(states))
+    assert sum(state_object.state is not None for state_object in state_objects) == 500
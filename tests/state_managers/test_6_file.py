@@ -0,0 +1,139 @@
+import asyncio
+import os
+
+import pytest
+
+from multibotkit.states.managers.base import StateConflictError
+from multibotkit.states.managers.file import FileStateManager
+
+
+@pytest.mark.asyncio
+async def test_file_manager(tmp_path):
+    file_manager = FileStateManager(path=str(tmp_path))
+    state_id = "telegram_12"
+    state = "some_state"
+    state_data = {"key": "value"}
+
+    state_object = await file_manager.get_state(state_id=state_id)
+
+    assert state_object.state is None
+    assert state_object.data is None
+
+    await file_manager.set_state(state_id=state_id, state=state, state_data=state_data)
+
+    state_object = await file_manager.get_state(state_id=state_id)
+
+    assert state_object.db_id == state_id
+    assert state_object.id == state_id.split("_")[1]
+    assert state_object.state == state
+    assert state_object.data == state_data
+
+    await file_manager.set_state(state_id=state_id)
+
+    state_object = await file_manager.get_state(state_id=state_id)
+
+    assert state_object.state == state
+    assert state_object.data == state_data
+    assert state_object.version == 2
+
+    await file_manager.delete_state(state_id=state_id)
+
+    state_object = await file_manager.get_state(state_id=state_id)
+
+    assert state_object.state is None
+    assert state_object.data is None
+
+    await file_manager.set_state(state_id=state_id, state=state, state_data=state_data)
+    stale_state_object = await file_manager.get_state(state_id=state_id)
+    await file_manager.set_state(state_id=state_id, state="new_state")
+
+    with pytest.raises(StateConflictError):
+        await stale_state_object.set_state(state="stale_state")
+
+    await file_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_file_manager_restart(tmp_path):
+    file_manager = FileStateManager(path=str(tmp_path))
+    for i in range(100):
+        await file_manager.set_state(state_id=f"telegram_{i}", state="some_state", state_data={"i": i})
+    await file_manager.delete_state(state_id="telegram_0")
+    await file_manager.set_state(state_id="telegram_1", state="expired", ttl=-1)
+    await file_manager.close()
+
+    file_manager = FileStateManager(path=str(tmp_path))
+    assert (await file_manager.get_state(state_id="telegram_0")).state is None
+    assert (await file_manager.get_state(state_id="telegram_1")).state is None
+    state_object = await file_manager.get_state(state_id="telegram_99")
+    assert state_object.state == "some_state"
+    assert state_object.data == {"i": 99}
+
+    # a torn write at the end of the log is dropped on startup
+    await file_manager.set_state(state_id="telegram_2", state="new_state")
+    size = file_manager._size
+    await file_manager.close()
+    with open(os.path.join(str(tmp_path), "states.log"), "r+b") as f:
+        f.truncate(size - 3)
+
+    file_manager = FileStateManager(path=str(tmp_path))
+    state_object = await file_manager.get_state(state_id="telegram_2")
+    assert state_object.state == "some_state"
+    assert state_object.version == 1
+
+    await file_manager.set_state(state_id="telegram_2", state="new_state")
+    assert (await file_manager.get_state(state_id="telegram_2")).state == "new_state"
+    await file_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_file_manager_compaction(tmp_path):
+    file_manager = FileStateManager(path=str(tmp_path))
+    for i in range(50):
+        for step in range(10):
+            await file_manager.set_state(
+                state_id=f"telegram_{i}", state=f"step_{step}", state_data={"i": i}
+            )
+    await file_manager.delete_state(state_id="telegram_0")
+    size = file_manager._size
+
+    await file_manager.compact()
+    assert file_manager._size < size / 5
+    assert os.path.exists(os.path.join(str(tmp_path), "states.hint"))
+
+    await file_manager.set_state(state_id="telegram_1", state="after_compaction")
+    await file_manager.close()
+
+    file_manager = FileStateManager(path=str(tmp_path))
+    assert (await file_manager.get_state(state_id="telegram_0")).state is None
+    assert (await file_manager.get_state(state_id="telegram_1")).state == "after_compaction"
+    state_object = await file_manager.get_state(state_id="telegram_49")
+    assert state_object.state == "step_9"
+    assert state_object.data == {"i": 49}
+    assert state_object.version == 10
+    await file_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_file_manager_flush_error(tmp_path):
+    file_manager = FileStateManager(path=str(tmp_path), flush_interval=0.01)
+    fsync = file_manager._fsync
+    calls = []
+
+    def fail_once(fd):
+        calls.append(None)
+        if len(calls) == 1:
+            os.close(fd)
+            raise OSError("I/O error")
+        fsync(fd)
+
+    file_manager._fsync = fail_once
+    await file_manager.set_state(state_id="telegram_1", state="some_state")
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if len(calls) >= 2:
+            break
+
+    assert len(calls) == 2
+    assert not any(task.done() for task in file_manager._tasks)
+    await file_manager.close()
@@ -1,5 +1,8 @@
 import json
 
+import pytest
+from pydantic import ValidationError
+
 from multibotkit.schemas.telegram.incoming import (
     Location,
     Contact,
@@ -15,7 +18,9 @@ from multibotkit.schemas.telegram.incoming import (
     User,
     Message as IncomingMessage,
     CallbackQuery,
+    LazyUpdate,
     Update,
+    parse_update,
 )
 from multibotkit.schemas.telegram.outgoing import (
     SetWebhookParams,
@@ -808,3 +813,37 @@ def test_outgoing_models():
     assert media_group == MediaGroup(
         chat_id=1234, media=[input_media_photo, input_media_photo]
     )
+
+
+def test_lazy_update():
+    update_dict = {
+        "update_id": 1234,
+        "callback_query": {
+            "id": "callback query id",
+            "from": {"id": 4321, "is_bot": False, "first_name": "Name"},
+            "data": "data",
+        },
+    }
+
+    update = LazyUpdate(update_dict)
+
+    assert update.update_id == 1234
+    assert update.kind == "callback_query"
+    assert update.sender_id == 4321
+    assert update._parsed == {}
+
+    assert update.message is None
+    assert update.callback_query.from_.id == 4321
+    assert update.callback_query is update.callback_query
+    assert update == Update.model_validate(update_dict)
+    assert update.model_dump() == Update.model_validate(update_dict).model_dump()
+
+    raw = json.dumps(update_dict).encode()
+    assert parse_update(raw) == Update.model_validate(update_dict)
+    assert parse_update(raw, lazy=True).sender_id == 4321
+
+    update = LazyUpdate({"update_id": 1235, "message": {"message_id": 1}})
+    assert update.kind == "message"
+    assert update.sender_id is None
+    with pytest.raises(ValidationError):
+        update.message
@@ -1,14 +1,28 @@
+import asyncio
 import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from tempfile import NamedTemporaryFile
 import httpx
 import json
 import pytest
+from PIL import Image
 from pytest_httpx import HTTPXMock, IteratorStream
 
+from multibotkit.helpers.base_helper import FileTooLargeError
+from multibotkit.helpers.file_cache import DiskFileCache
+from multibotkit.helpers.media import ImagePreprocessor
 from multibotkit.helpers.telegram import TelegramHelper
+from multibotkit.helpers.upload_cache import MemoryUploadStore, UploadCache
+from multibotkit.helpers.yandexmessenger import YandexMessengerHelper
+from multibotkit.schemas.frozen import FrozenMarkup
+from multibotkit.schemas.telegram.incoming import File
 from multibotkit.schemas.telegram.outgoing import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    InputMediaPhoto,
+    InputMediaVideo,
     Message,
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -421,6 +435,74 @@ def test_sync_helper_get_file(httpx_mock: HTTPXMock):
     assert doc.readline() == b"part 1part 2"
 
 
+def test_sync_helper_download_file_resumes(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN)
+    helper.download_retry_delays = (0,)
+    ranges = []
+
+    def broken_stream():
+        yield b"part 1"
+        raise httpx.ReadError("connection reset")
+
+    def download_response(request: httpx.Request):
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            return httpx.Response(status_code=200, stream=IteratorStream(broken_stream()))
+        return httpx.Response(status_code=206, stream=IteratorStream([b"part 2"]))
+
+    httpx_mock.add_callback(
+        download_response, url=helper.file_url("voice/file.oga"), is_reusable=True
+    )
+
+    file = File(file_id="file_id", file_unique_id="unique_id", file_path="voice/file.oga")
+    path = tmp_path / "file.oga"
+
+    assert helper.sync_download_file(file, str(path)) == 12
+    assert path.read_bytes() == b"part 1part 2"
+    assert ranges == [None, "bytes=6-"]
+
+
+def test_sync_helper_iter_file_max_size(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        json={
+            "ok": True,
+            "result": {
+                "file_id": "file_id",
+                "file_unique_id": "unique_id",
+                "file_size": 100,
+                "file_path": "file_path",
+            },
+        }
+    )
+
+    with pytest.raises(FileTooLargeError):
+        tg_helper.sync_iter_file("file_id", max_size=10)
+
+    httpx_mock.add_response(
+        url=tg_helper.file_url("file_path"), stream=IteratorStream([b"x" * 8, b"x" * 8])
+    )
+    file = File(file_id="file_id", file_unique_id="unique_id", file_path="file_path")
+
+    with pytest.raises(FileTooLargeError):
+        list(tg_helper.sync_iter_file(file, max_size=10))
+
+
+def test_sync_helper_send_media_group_split(httpx_mock: HTTPXMock):
+    def send_media_group_response(request: httpx.Request):
+        media = json.loads(request.content)["media"]
+        return httpx.Response(status_code=200, json={"ok": True, "result": [{}] * len(media)})
+
+    httpx_mock.add_callback(send_media_group_response, is_reusable=True)
+
+    photos = [f"https://test_url/photo_{i}.jpg" for i in range(11)]
+    r = tg_helper.sync_send_media_group(chat_id=1234, photos=photos)
+
+    assert r == {"ok": True, "result": [{}] * 11}
+    requests = httpx_mock.get_requests()
+    assert [len(json.loads(request.content)["media"]) for request in requests] == [6, 5]
+    assert json.loads(requests[1].content)["media"][0]["media"] == photos[6]
+
+
 def test_sync_helper_uses_proxy_for_requests(monkeypatch):
     captured = {}
 
@@ -451,13 +533,19 @@ def test_sync_helper_uses_proxy_for_file_stream(monkeypatch):
         )
 
     class FakeStreamResponse:
+        status_code = 200
+        headers = {}
+
         def __enter__(self):
             return self
 
         def __exit__(self, exc_type, exc, tb):
             return False
 
-        def iter_bytes(self):
+        def raise_for_status(self):
+            pass
+
+        def iter_bytes(self, chunk_size=None):
             yield b"part 1"
             yield b"part 2"
 
@@ -476,6 +564,59 @@ def test_sync_helper_uses_proxy_for_file_stream(monkeypatch):
     assert stream_calls == [PROXY_URL]
 
 
+def test_sync_helper_trusted_payloads(monkeypatch):
+    payloads = []
+
+    def fake_post(*args, **kwargs):
+        payloads.append(kwargs.get("json"))
+        return httpx.Response(status_code=200, json={"ok": True, "result": True})
+
+    monkeypatch.setattr("multibotkit.helpers.base_helper.httpx.post", fake_post)
+
+    reply_markup = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Button", callback_data="data")]]
+    )
+
+    for helper in (TelegramHelper(settings.TG_TOKEN), TelegramHelper(settings.TG_TOKEN, trusted=True)):
+        helper.sync_send_message(chat_id=1234, text="text", reply_markup=reply_markup)
+        helper.sync_send_photo(chat_id=1234, photo="https://test_url/photo.jpg", caption="caption")
+        helper.sync_delete_webhook()
+
+    assert payloads[:3] == payloads[3:]
+
+
+def test_sync_helper_frozen_markup(monkeypatch):
+    requests = []
+
+    def fake_post(*args, **kwargs):
+        requests.append(kwargs)
+        return httpx.Response(status_code=200, json={"ok": True, "result": True})
+
+    monkeypatch.setattr("multibotkit.helpers.base_helper.httpx.post", fake_post)
+
+    reply_markup = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Button", callback_data="data")]]
+    )
+    frozen_markup = FrozenMarkup(reply_markup)
+
+    assert frozen_markup == reply_markup.model_dump(exclude_none=True)
+    assert json.loads(frozen_markup.json) == frozen_markup
+    assert FrozenMarkup(dict(frozen_markup), InlineKeyboardMarkup) == frozen_markup
+    with pytest.raises(ValueError):
+        FrozenMarkup({"inline_keyboard": "not a keyboard"}, InlineKeyboardMarkup)
+
+    for helper in (tg_helper, TelegramHelper(settings.TG_TOKEN, trusted=True)):
+        helper.sync_send_message(chat_id=1234, text="text", reply_markup=reply_markup)
+        helper.sync_send_message(chat_id=1234, text="text", reply_markup=frozen_markup)
+        helper.sync_send_photo(chat_id=1234, photo=io.BytesIO(b"image"), reply_markup=frozen_markup)
+
+    for kwargs in requests[0], requests[3]:
+        assert kwargs["json"] == requests[1]["json"]
+        assert kwargs["json"] == requests[4]["json"]
+    for kwargs in requests[2], requests[5]:
+        assert kwargs["data"]["reply_markup"] is frozen_markup.json
+
+
 @pytest.mark.asyncio
 @pytest.mark.httpx_mock(assert_all_requests_were_expected=False)
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
@@ -704,6 +845,84 @@ async def test_async_helper_edit_message_media(httpx_mock: HTTPXMock):
     assert r == {"ok": True, "result": True}
 
 
+@pytest.mark.asyncio
+async def test_async_helper_send_media_group_split(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN, upload_cache=UploadCache())
+    requests = []
+
+    def send_media_group_response(request: httpx.Request):
+        requests.append(request)
+        if request.headers["Content-Type"] == "application/json":
+            media = json.loads(request.content)["media"]
+        else:
+            media = json.loads(request.content.split(b'name="media"\r\n\r\n')[1].split(b"\r\n")[0])
+        messages = []
+        for item in media:
+            file = {"file_id": f"id_{item['media']}"}
+            messages.append({item["type"]: [file] if item["type"] == "photo" else file})
+        return httpx.Response(status_code=200, json={"ok": True, "result": messages})
+
+    httpx_mock.add_callback(send_media_group_response, is_reusable=True)
+
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    media = [InputMediaVideo(media=str(video_path), caption="video")]
+    for i in range(10):
+        photo_path = tmp_path / f"photo_{i}.jpg"
+        photo_path.write_bytes(f"photo {i}".encode())
+        media.append(InputMediaPhoto(media=str(photo_path)))
+    media.append(InputMediaPhoto(media="https://test_url/photo.jpg"))
+
+    r = await helper.async_send_media_group(chat_id=1234, media=media)
+
+    assert r["ok"] is True
+    assert len(r["result"]) == 12
+    assert r["result"][0] == {"video": {"file_id": "id_attach://file_0"}}
+    assert len(requests) == 2
+    assert b'name="file_0"; filename="video.mp4"\r\nContent-Type: video/mp4' in requests[0].content
+    assert b"photo 4" in requests[0].content
+    assert b"photo 5" in requests[1].content
+
+    r = await helper.async_send_media_group(chat_id=1234, media=media[:2])
+
+    assert requests[2].headers["Content-Type"] == "application/json"
+    assert [item["media"] for item in json.loads(requests[2].content)["media"]] == [
+        "id_attach://file_0",
+        "id_attach://file_1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_async_helper_send_photo_preprocessed(httpx_mock: HTTPXMock, tmp_path):
+    preprocessor = ImagePreprocessor(max_dimension=300)
+    helper = TelegramHelper(settings.TG_TOKEN, image_preprocessor=preprocessor)
+    httpx_mock.add_response(json={"ok": True, "result": True}, is_reusable=True)
+
+    photo_path = tmp_path / "photo.png"
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"
+    Image.new("RGBA", (1200, 600), (255, 0, 0, 128)).save(photo_path, exif=exif)
+
+    await asyncio.gather(
+        helper.async_send_photo(chat_id=1234, photo=str(photo_path)),
+        helper.async_send_photo(chat_id=4321, photo=str(photo_path)),
+    )
+    preprocessor.close()
+
+    requests = httpx_mock.get_requests()
+    photos = [
+        request.content.split(b"Content-Type: image/jpeg\r\n\r\n")[1].rsplit(b"\r\n--", 1)[0]
+        for request in requests
+    ]
+    assert b'filename="photo.jpg"' in requests[0].content
+    assert photos[0] == photos[1]
+    assert len(preprocessor.cache) == 1
+    with Image.open(io.BytesIO(photos[0])) as image:
+        assert image.format == "JPEG"
+        assert image.size == (300, 150)
+        assert not image.getexif()
+
+
 @pytest.mark.asyncio
 @pytest.mark.httpx_mock(assert_all_requests_were_expected=False)
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
@@ -761,6 +980,146 @@ async def test_async_helper_send_photo(httpx_mock: HTTPXMock):
     assert r == {"ok": True, "result": True}
 
 
+@pytest.mark.asyncio
+async def test_async_helper_send_photo_streams_local_file(httpx_mock: HTTPXMock, tmp_path):
+    requests = []
+
+    def send_photo_response(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(status_code=200, json={"ok": True, "result": True})
+
+    httpx_mock.add_callback(send_photo_response)
+
+    photo_path = tmp_path / "photo.jpg"
+    photo_path.write_bytes(b"image" * 100000)
+    reply_markup = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Button", callback_data="data")]]
+    )
+
+    r = await tg_helper.async_send_photo(
+        chat_id=1234, photo=str(photo_path), caption="caption", reply_markup=reply_markup
+    )
+
+    assert r == {"ok": True, "result": True}
+
+    request = requests[0]
+    expected = httpx.Request(
+        "POST",
+        request.url,
+        headers={"Content-Type": request.headers["Content-Type"]},
+        data={
+            "chat_id": 1234,
+            "photo": f"attach://{photo_path}",
+            "caption": "caption",
+            "parse_mode": "HTML",
+            "reply_markup": json.dumps(reply_markup.model_dump(exclude_none=True)),
+        },
+        files={str(photo_path): ("photo.jpg", photo_path.read_bytes())},
+    )
+    assert request.content == expected.read()
+    assert int(request.headers["Content-Length"]) == len(request.content)
+
+
+
+@pytest.mark.asyncio
+async def test_async_helper_send_photo_memoryview(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(json={"ok": True, "result": True})
+
+    photo = bytearray(b"image" * 100000)
+    r = await tg_helper.async_send_photo(chat_id=1234, photo=memoryview(photo))
+
+    assert r == {"ok": True, "result": True}
+
+    request = httpx_mock.get_requests()[0]
+    expected = httpx.Request(
+        "POST",
+        request.url,
+        headers={"Content-Type": request.headers["Content-Type"]},
+        data={"chat_id": 1234, "photo": "attach://image", "parse_mode": "HTML"},
+        files={"image": ("upload", bytes(photo))},
+    )
+    assert request.content == expected.read()
+    assert int(request.headers["Content-Length"]) == len(request.content)
+
+
+def test_sync_helper_send_photo_upload_cache(httpx_mock: HTTPXMock, tmp_path):
+    store = MemoryUploadStore()
+    helper = TelegramHelper(settings.TG_TOKEN, upload_cache=UploadCache(store))
+    requests = []
+
+    def send_photo_response(request: httpx.Request):
+        requests.append(request)
+        if request.headers["Content-Type"] == "application/json":
+            if json.loads(request.content)["photo"] == "stale_file_id":
+                return httpx.Response(
+                    status_code=200,
+                    json={"ok": False, "description": "Bad Request: wrong file identifier"},
+                )
+            return httpx.Response(status_code=200, json={"ok": True, "result": {}})
+        return httpx.Response(
+            status_code=200,
+            json={
+                "ok": True,
+                "result": {"photo": [{"file_id": "small_file_id"}, {"file_id": "file_id"}]},
+            },
+        )
+
+    httpx_mock.add_callback(send_photo_response, is_reusable=True)
+
+    photo_path = tmp_path / "photo.jpg"
+    photo_path.write_bytes(b"image")
+
+    helper.sync_send_photo(chat_id=1234, photo=str(photo_path))
+    helper.sync_send_photo(chat_id=1234, photo=str(photo_path))
+    helper.sync_send_photo(chat_id=1234, photo=io.BytesIO(b"image"))
+
+    assert requests[0].headers["Content-Type"].startswith("multipart/form-data")
+    assert json.loads(requests[1].content)["photo"] == "file_id"
+    assert json.loads(requests[2].content)["photo"] == "file_id"
+
+    key = next(iter(store.ids))
+    assert key.startswith(f"telegram:{settings.TG_TOKEN.split(':')[0]}:photo:")
+    store.sync_set(key, "stale_file_id")
+    helper.sync_send_photo(chat_id=1234, photo=str(photo_path))
+
+    assert len(requests) == 5
+    assert requests[4].headers["Content-Type"].startswith("multipart/form-data")
+    assert store.sync_get(key) == "file_id"
+
+
+@pytest.mark.asyncio
+async def test_async_helper_send_document_upload_cache(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN, upload_cache=UploadCache(key="stat"))
+    requests = []
+
+    def send_document_response(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(
+            status_code=200,
+            json={"ok": True, "result": {"document": {"file_id": "file_id"}}},
+        )
+
+    httpx_mock.add_callback(send_document_response, is_reusable=True)
+
+    document_path = tmp_path / "report.pdf"
+    document_path.write_bytes(b"document")
+
+    await asyncio.gather(
+        *[helper.async_send_document(chat_id=i, document=str(document_path)) for i in range(5)]
+    )
+    await helper.async_send_document(
+        chat_id=1234, document=str(document_path), file_name="other.pdf"
+    )
+
+    uploads = [
+        request for request in requests
+        if request.headers["Content-Type"].startswith("multipart/form-data")
+    ]
+    assert len(requests) == 6
+    assert len(uploads) == 2
+    assert json.loads(requests[1].content)["document"] == "file_id"
+
+
 @pytest.mark.asyncio
 @pytest.mark.httpx_mock(assert_all_requests_were_expected=False)
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
@@ -949,6 +1308,223 @@ async def test_async_helper_get_file(httpx_mock: HTTPXMock):
     assert doc.readline() == b"part 1part 2"
 
 
+@pytest.mark.asyncio
+async def test_async_helper_iter_file(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN)
+    helper.download_retry_delays = (0,)
+    ranges = []
+
+    def broken_stream():
+        yield b"part 1"
+        raise httpx.ReadError("connection reset")
+
+    def download_response(request: httpx.Request):
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            return httpx.Response(status_code=200, stream=IteratorStream(broken_stream()))
+        # server without Range support sends the whole file again
+        return httpx.Response(status_code=200, stream=IteratorStream([b"part 1part 2"]))
+
+    httpx_mock.add_response(
+        json={"ok": True, "result": {"file_id": "file_id", "file_unique_id": "unique_id", "file_path": "file_path"}}
+    )
+    httpx_mock.add_callback(download_response, url=helper.file_url("file_path"), is_reusable=True)
+
+    chunks = [chunk async for chunk in helper.async_iter_file("file_id")]
+
+    assert b"".join(chunks) == b"part 1part 2"
+    assert ranges == [None, "bytes=6-"]
+
+
+@pytest.mark.asyncio
+async def test_async_helper_get_file_cached(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN, file_cache=DiskFileCache(str(tmp_path)))
+
+    httpx_mock.add_response(
+        json={"ok": True, "result": {"file_id": "file_id", "file_unique_id": "unique_id", "file_path": "file_path"}}
+    )
+    httpx_mock.add_response(url=helper.file_url("file_path"), stream=IteratorStream([b"part 1", b"part 2"]))
+
+    docs = await asyncio.gather(*[helper.async_get_file(file_id="file_id") for _ in range(3)])
+    chunks = [chunk async for chunk in helper.async_iter_file("file_id", chunk_size=4)]
+
+    assert [doc.read() for doc in docs] == [b"part 1part 2"] * 3
+    assert chunks == [b"part", b" 1pa", b"rt 2"]
+    assert len(httpx_mock.get_requests()) == 2
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+@pytest.mark.asyncio
+async def test_async_helper_relay_file(httpx_mock: HTTPXMock):
+    ym_helper = YandexMessengerHelper(settings.YANDEX_MESSENGER_TOKEN)
+    httpx_mock.add_response(
+        json={
+            "ok": True,
+            "result": {
+                "file_id": "file_id",
+                "file_unique_id": "unique_id",
+                "file_size": 12,
+                "file_path": "photos/file_1.jpg",
+            },
+        }
+    )
+    httpx_mock.add_response(
+        url=tg_helper.file_url("photos/file_1.jpg"), stream=IteratorStream([b"part 1", b"part 2"])
+    )
+    httpx_mock.add_response(url=ym_helper.base_url + "messages/sendImage/", json={"ok": True, "message_id": 1})
+
+    r = await tg_helper.async_relay_file(
+        "file_id", lambda image: ym_helper.async_send_image(image, chat_id="chat_id")
+    )
+
+    assert r == {"ok": True, "message_id": 1}
+    request = httpx_mock.get_requests()[-1]
+    assert b'filename="file_1.jpg"\r\nContent-Type: image/jpeg\r\n\r\npart 1part 2\r\n' in request.content
+    assert int(request.headers["Content-Length"]) == len(request.content)
+
+
+@pytest.mark.asyncio
+async def test_async_helper_relay_file_upload_error(httpx_mock: HTTPXMock):
+    ym_helper = YandexMessengerHelper(settings.YANDEX_MESSENGER_TOKEN)
+    file = File(file_id="file_id", file_unique_id="unique_id", file_size=12, file_path="photos/file_1.jpg")
+    httpx_mock.add_response(
+        url=tg_helper.file_url("photos/file_1.jpg"), stream=IteratorStream([b"part 1", b"part 2"])
+    )
+    httpx_mock.add_exception(
+        httpx.ConnectError("connection refused"), url=ym_helper.base_url + "messages/sendImage/"
+    )
+
+    with pytest.raises(httpx.ConnectError):
+        await tg_helper.async_relay_file(
+            file, lambda image: ym_helper.async_send_image(image, chat_id="chat_id")
+        )
+
+    assert len(httpx_mock.get_requests(url=ym_helper.base_url + "messages/sendImage/")) == 1
+
+
+LOCAL_API_URL = "http://localhost:8081"
+
+
+@pytest.mark.asyncio
+async def test_async_helper_local_mode_reads_files_from_disk(httpx_mock: HTTPXMock, tmp_path):
+    helper = TelegramHelper(settings.TG_TOKEN, api_url=LOCAL_API_URL + "/", local_mode=True)
+    file_path = tmp_path / "documents" / "file_1.pdf"
+    file_path.parent.mkdir()
+    file_path.write_bytes(b"part 1part 2")
+    httpx_mock.add_response(
+        url=f"{LOCAL_API_URL}/bot{settings.TG_TOKEN}/getFile",
+        json={
+            "ok": True,
+            "result": {"file_id": "file_id", "file_unique_id": "unique_id", "file_path": str(file_path)},
+        },
+        is_reusable=True,
+    )
+
+    doc = await helper.async_get_file(file_id="file_id")
+    chunks = [chunk async for chunk in helper.async_iter_file("file_id", chunk_size=4)]
+    with pytest.raises(FileTooLargeError):
+        helper.sync_download_file("file_id", io.BytesIO(), max_size=4)
+
+    assert doc.read() == b"part 1part 2"
+    assert chunks == [b"part", b" 1pa", b"rt 2"]
+    assert len(httpx_mock.get_requests()) == 3
+
+
+def test_sync_helper_local_mode_sends_file_uris(httpx_mock: HTTPXMock, tmp_path):
+    store = MemoryUploadStore()
+    helper = TelegramHelper(
+        settings.TG_TOKEN, api_url=LOCAL_API_URL, local_mode=True, upload_cache=UploadCache(store)
+    )
+    httpx_mock.add_response(
+        json={"ok": True, "result": {"document": {"file_id": "file_id"}}}, is_reusable=True
+    )
+    document_path = tmp_path / "report.pdf"
+    document_path.write_bytes(b"document")
+    photo_path = tmp_path / "photo.jpg"
+    photo_path.write_bytes(b"photo")
+
+    helper.sync_send_document(chat_id=1234, document=str(document_path))
+    helper.sync_send_document(chat_id=1234, document=str(document_path))
+    helper.sync_send_media_group(chat_id=1234, photos=[str(photo_path), "file_id"])
+
+    *document_requests, media_group_request = httpx_mock.get_requests()
+    for document_request in document_requests:
+        assert str(document_request.url) == f"{LOCAL_API_URL}/bot{settings.TG_TOKEN}/sendDocument"
+        assert json.loads(document_request.content)["document"] == f"file://{document_path}"
+    assert len(document_requests) == 2
+    assert store.ids == {}
+    media = json.loads(media_group_request.content)["media"]
+    assert [item["media"] for item in media] == [f"file://{photo_path}", "file_id"]
+
+
+@pytest.fixture
+def local_bot_api(tmp_path):
+    """
+    Stand-in for a local Bot API server on 127.0.0.1: getFile returns an
+    absolute path in tmp_path, other methods succeed. Yields the server URL
+    and the list of (path, body) requests it received.
+    """
+    file_path = tmp_path / "server" / "documents" / "file_1.pdf"
+    file_path.parent.mkdir(parents=True)
+    file_path.write_bytes(b"part 1part 2")
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            requests.append((self.path, body))
+            if self.path.endswith("/getFile"):
+                result = {"file_id": "file_id", "file_unique_id": "unique_id", "file_path": str(file_path)}
+            else:
+                result = {"message_id": 1}
+            self._respond({"ok": True, "result": result})
+
+        def do_GET(self):
+            requests.append((self.path, b""))
+            self.send_error(404)
+
+        def _respond(self, payload: dict):
+            content = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.asyncio
+async def test_async_helper_local_bot_api_server(local_bot_api, tmp_path):
+    api_url, requests = local_bot_api
+    helper = TelegramHelper(settings.TG_TOKEN, api_url=api_url, local_mode=True)
+    document_path = tmp_path / "report.pdf"
+    document_path.write_bytes(b"document")
+
+    doc = await helper.async_get_file(file_id="file_id")
+    chunks = [chunk async for chunk in helper.async_iter_file("file_id", chunk_size=6)]
+    r = await helper.async_send_document(chat_id=1234, document=str(document_path))
+
+    assert doc.read() == b"part 1part 2"
+    assert chunks == [b"part 1", b"part 2"]
+    assert r == {"ok": True, "result": {"message_id": 1}}
+    assert [path for path, _ in requests] == [
+        f"/bot{settings.TG_TOKEN}/getFile",
+        f"/bot{settings.TG_TOKEN}/getFile",
+        f"/bot{settings.TG_TOKEN}/sendDocument",
+    ]
+    assert json.loads(requests[2][1])["document"] == f"file://{document_path}"
+
+
 @pytest.mark.asyncio
 async def test_async_helper_uses_proxy_for_requests(monkeypatch):
     class FakeAsyncClient:
@@ -983,13 +1559,19 @@ async def test_async_helper_uses_proxy_for_file_stream(monkeypatch):
     stream_client_proxies = []
 
     class FakeAsyncStreamResponse:
+        status_code = 200
+        headers = {}
+
         async def __aenter__(self):
             return self
 
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        async def aiter_bytes(self):
+        def raise_for_status(self):
+            pass
+
+        async def aiter_bytes(self, chunk_size=None):
             for chunk in (b"part 1", b"part 2"):
                 yield chunk
 
@@ -1,7 +1,8 @@
 import pytest
 
 from multibotkit.dispatchers.telegram import TelegramDispatcher
-from multibotkit.schemas.telegram.incoming import Message, Update
+from multibotkit.schemas.telegram.incoming import LazyUpdate, Message, Update
+from multibotkit.states.managers.memory import MemoryStateManager
 from multibotkit.states.state import State
 
 
@@ -64,3 +65,111 @@ async def test_telegram_dispatcher():
 
     assert test_results[1]
     assert test_results[2]
+
+
+@pytest.mark.asyncio
+async def test_telegram_dispatcher_conflict_retry():
+    state_manager = MemoryStateManager()
+    dp = TelegramDispatcher(state_manager=state_manager, conflict_retries=1)
+
+    update = Update.model_validate(
+        {
+            "update_id": 1235,
+            "message": {
+                "message_id": 1235,
+                "date": 1656425873,
+                "from": {"id": 4321, "is_bot": False, "first_name": "Name"},
+                "chat": {"id": 4321, "type": "private"},
+                "text": "text",
+            },
+        }
+    )
+    calls = []
+
+    @dp.handler()
+    async def test_handler(update: Update, state_object: State):
+        calls.append(state_object.version)
+        if len(calls) == 1:
+            # a concurrent handler writes the state first
+            await state_manager.set_state(state_id=state_object.db_id, state="other")
+        await state_object.set_state(state="state")
+
+    await dp.process_event(event=update)
+
+    assert calls == [0, 1]
+    state_object = await state_manager.get_state("telegram_4321")
+    assert state_object.state == "state"
+    assert state_object.version == 2
+
+
+@pytest.mark.asyncio
+async def test_telegram_dispatcher_deferred_commit():
+    state_manager = MemoryStateManager()
+    dp = TelegramDispatcher(state_manager=state_manager, deferred_commit=True)
+
+    update = Update.model_validate(
+        {
+            "update_id": 1236,
+            "message": {
+                "message_id": 1236,
+                "date": 1656425873,
+                "from": {"id": 5321, "is_bot": False, "first_name": "Name"},
+                "chat": {"id": 5321, "type": "private"},
+                "text": "text",
+            },
+        }
+    )
+
+    @dp.handler(func=lambda update: update.message.text == "text")
+    async def test_handler(update: Update, state_object: State):
+        await state_object.set_state(state="first")
+        await state_object.set_state(state_data={"key": "value"})
+        await state_object.set_state(state="second")
+
+    @dp.handler(func=lambda update: update.message.text == "fail")
+    async def failing_handler(update: Update, state_object: State):
+        await state_object.set_state(state="broken")
+        raise ValueError("handler failed")
+
+    await dp.process_event(event=update)
+
+    state_object = await state_manager.get_state("telegram_5321")
+    assert state_object.state == "second"
+    assert state_object.data == {"key": "value"}
+    assert state_object.version == 1
+
+    update.message.text = "fail"
+    with pytest.raises(ValueError):
+        await dp.process_event(event=update)
+
+    state_object = await state_manager.get_state("telegram_5321")
+    assert state_object.state == "second"
+    assert state_object.version == 1
+
+
+@pytest.mark.asyncio
+async def test_telegram_dispatcher_lazy_update():
+    state_manager = MemoryStateManager()
+    dp = TelegramDispatcher(state_manager=state_manager)
+
+    update = LazyUpdate(
+        {
+            "update_id": 1237,
+            "message": {
+                "message_id": 1237,
+                "date": 1656425873,
+                "from": {"id": 4323, "is_bot": False, "first_name": "Name"},
+                "chat": {"id": 4323, "type": "private"},
+                "text": "text",
+            },
+        }
+    )
+
+    @dp.handler(func=lambda update: update.message.text == "text")
+    async def test_handler(update: LazyUpdate, state_object: State):
+        await state_object.set_state(state="state")
+
+    await dp.process_event(event=update)
+
+    state_object = await state_manager.get_state("telegram_4323")
+    assert state_object.state == "state"
@@ -11,6 +11,7 @@ from multibotkit.schemas.viber.incoming import (
     ConversationStartedCallback,
     FailedCallback,
     Callback,
+    parse_callback,
 )
 from multibotkit.schemas.viber.outgoing import (
     Button,
@@ -233,6 +234,8 @@ def test_viber_incoming_models():
         "message_token": 1234,
     }
 
+    assert parse_callback(json.dumps(callback_dict).encode()) == callback
+
     callback = Callback.model_validate(callback_dict)
 
     assert callback == Callback(
@@ -1,7 +1,13 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
 import httpx
 import pytest
+from PIL import Image
 from pytest_httpx import HTTPXMock
 
+from multibotkit.helpers.media import ImagePreprocessor
 from multibotkit.helpers.viber import ViberHelper
 from multibotkit.schemas.viber.outgoing import (
     Button,
@@ -518,3 +524,43 @@ async def test_async_send_message(httpx_mock: HTTPXMock):
     )
 
     assert r == {}
+
+
+def test_sync_send_message_trusted(httpx_mock: HTTPXMock):
+    payloads = []
+
+    def send_message_response(request: httpx.Request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(status_code=200, json={})
+
+    httpx_mock.add_callback(send_message_response, is_reusable=True)
+
+    keyboard = Keyboard(
+        Buttons=[Button(Columns=1, Rows=1, Text="text", ActionBody="action body")]
+    )
+
+    for helper in (viber_helper, ViberHelper(token=settings.VIBER_TOKEN, trusted=True)):
+        helper.sync_send_message(
+            type="text",
+            receiver="receiver",
+            sender=Sender(name="name"),
+            keyboard=keyboard,
+            text="text",
+        )
+
+    assert payloads[0] == payloads[1]
+
+
+@pytest.mark.asyncio
+async def test_async_picture_thumbnail():
+    preprocessor = ImagePreprocessor(executor=ThreadPoolExecutor(1))
+    picture = BytesIO()
+    Image.effect_noise((2000, 1000), 100).save(picture, format="PNG")
+    picture.seek(0)
+
+    thumbnail = await preprocessor.async_thumbnail(picture)
+
+    assert len(thumbnail) <= 100 * 1024
+    with Image.open(BytesIO(thumbnail)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (400, 200)
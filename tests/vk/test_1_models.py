@@ -7,6 +7,7 @@ from multibotkit.schemas.vk.incoming import (
     MessageObject,
     EventObject,
     IncomingEvent,
+    parse_event,
 )
 from multibotkit.schemas.vk.outgoing import (
     KeyboardAction,
@@ -170,6 +171,8 @@ def test_icoming_models():
         type="event type", group_id=1234, object=event_object
     )
 
+    assert parse_event(incoming_event_json.encode()) == incoming_event
+
 
 def test_outgoing_models():
 
@@ -1,9 +1,14 @@
 from io import BytesIO
+import json
+import time
 import httpx
 import pytest
 from pytest_httpx import HTTPXMock
 
+from multibotkit.helpers.multipart import AsyncMultipartStream
+from multibotkit.helpers.upload_cache import UploadCache
 from multibotkit.helpers.vk import VKHelper
+from multibotkit.schemas.frozen import freeze
 from multibotkit.schemas.vk.outgoing import Keyboard, KeyboardAction, KeyboardButton
 from tests.config import settings
 
@@ -59,6 +64,32 @@ def test_sync_send_message(httpx_mock: HTTPXMock):
     assert r == {"peer_id": 1234, "message_id": 4321}
 
 
+def test_sync_send_message_frozen_keyboard(monkeypatch):
+    payloads = []
+
+    def fake_post(*args, **kwargs):
+        payloads.append(kwargs.get("json"))
+        return httpx.Response(status_code=200, json={"peer_id": 1234, "message_id": 4321})
+
+    monkeypatch.setattr("multibotkit.helpers.base_helper.httpx.post", fake_post)
+
+    keyboard_action = KeyboardAction(type="type", label="Кнопка", payload="payload")
+    keyboard = Keyboard(
+        one_time=False,
+        inline=True,
+        buttons=[[KeyboardButton(action=keyboard_action, color="color")]],
+    )
+    frozen_keyboard = freeze(keyboard)
+
+    assert freeze(frozen_keyboard) is frozen_keyboard
+
+    vk_helper.sync_send_message(user_id=1234, text="message", keyboard=keyboard)
+    vk_helper.sync_send_message(user_id=1234, text="message", keyboard=frozen_keyboard)
+
+    assert payloads[0] == payloads[1]
+    assert payloads[1]["keyboard"] is frozen_keyboard.json
+
+
 def test_SendMessageArgumentsError():
     try:
         _ = vk_helper.sync_send_message(user_id=1234)
@@ -310,12 +341,117 @@ async def test_async_get_photo_attachment(httpx_mock: HTTPXMock):
     httpx_mock.add_callback(save_photo_response)
 
     image = BytesIO()
+    helper = VKHelper(access_token=settings.VK_TOKEN, api_version=settings.VK_API_VERSION)
 
-    r = await vk_helper.async_get_photo_attachment(photo=image, file_name="photo.img")
+    r = await helper.async_get_photo_attachment(photo=image, file_name="photo.img")
 
     assert r == "photoowner_id_id_access_key"
 
 
+@pytest.mark.asyncio
+async def test_async_get_photo_attachment_upload_cache(httpx_mock: HTTPXMock):
+    helper = VKHelper(
+        access_token=settings.VK_TOKEN,
+        api_version=settings.VK_API_VERSION,
+        upload_cache=UploadCache(),
+    )
+
+    httpx_mock.add_response(
+        url=helper.UPLOAD_PHOTO_URL, json={"response": {"upload_url": "https://upload_url"}}
+    )
+    httpx_mock.add_response(url="https://upload_url", json={"server": 1, "photo": "[]", "hash": "hash"})
+    httpx_mock.add_response(
+        url=helper.SAVE_MESSAGES_PHOTO_URL,
+        json={"response": [{"id": 2, "owner_id": -1, "access_key": "key"}]},
+    )
+
+    r = await helper.async_get_photo_attachment(photo=BytesIO(b"image"), file_name="photo.img")
+    cached = await helper.async_get_photo_attachment(
+        photo=BytesIO(b"image"), file_name="other.img"
+    )
+
+    assert r == cached == "photo-1_2_key"
+    assert len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_get_photo_attachments(httpx_mock: HTTPXMock):
+    helper = VKHelper(
+        access_token=settings.VK_TOKEN,
+        api_version=settings.VK_API_VERSION,
+        upload_cache=UploadCache(),
+    )
+    uploads = []
+
+    def upload_photo_response(request: httpx.Request):
+        uploads.append(request)
+        content = request.content.split(b"\r\n\r\n")[1].split(b"\r\n")[0].decode()
+        return httpx.Response(status_code=200, json={"server": 1, "photo": content, "hash": "hash"})
+
+    def save_photo_response(request: httpx.Request):
+        photo = json.loads(request.content)["photo"]
+        return httpx.Response(
+            status_code=200,
+            json={"response": [{"id": photo, "owner_id": -1, "access_key": "key"}]},
+        )
+
+    httpx_mock.add_response(
+        url=helper.UPLOAD_PHOTO_URL, json={"response": {"upload_url": "https://upload_url"}}
+    )
+    httpx_mock.add_callback(upload_photo_response, url="https://upload_url", is_reusable=True)
+    httpx_mock.add_callback(save_photo_response, url=helper.SAVE_MESSAGES_PHOTO_URL, is_reusable=True)
+
+    photos = [BytesIO(b"first"), ("second.png", BytesIO(b"second")), BytesIO(b"first")]
+    r = await helper.async_get_photo_attachments(photos)
+
+    assert r == ["photo-1_first_key", "photo-1_second_key", "photo-1_first_key"]
+    assert len(uploads) == 2
+    assert b'filename="second.png"' in b"".join(request.content for request in uploads)
+
+    r = await helper.async_get_photo_attachments([BytesIO(b"third")])
+
+    assert r == ["photo-1_third_key"]
+    assert len(httpx_mock.get_requests(url=helper.UPLOAD_PHOTO_URL)) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_get_photo_attachments_stale_upload_server(httpx_mock: HTTPXMock):
+    helper = VKHelper(access_token=settings.VK_TOKEN, api_version=settings.VK_API_VERSION)
+    helper._upload_server = ("https://stale_url", time.monotonic() + 300)
+
+    def upload_photo_response(request: httpx.Request):
+        content = request.content.split(b"\r\n\r\n")[1].split(b"\r\n")[0].decode()
+        return httpx.Response(status_code=200, json={"server": 1, "photo": content, "hash": "hash"})
+
+    def save_photo_response(request: httpx.Request):
+        photo = json.loads(request.content)["photo"]
+        return httpx.Response(
+            status_code=200,
+            json={"response": [{"id": photo, "owner_id": -1, "access_key": "key"}]},
+        )
+
+    httpx_mock.add_response(url="https://stale_url", json={"error": "expired"}, is_reusable=True)
+    httpx_mock.add_response(
+        url=helper.UPLOAD_PHOTO_URL, json={"response": {"upload_url": "https://upload_url"}}
+    )
+    httpx_mock.add_callback(upload_photo_response, url="https://upload_url", is_reusable=True)
+    httpx_mock.add_callback(save_photo_response, url=helper.SAVE_MESSAGES_PHOTO_URL, is_reusable=True)
+
+    first = BytesIO(b"first")
+    r = await helper.async_get_photo_attachments([first, BytesIO(b"second"), first, b"third", b"third"])
+
+    assert r == [
+        "photo-1_first_key",
+        "photo-1_second_key",
+        "photo-1_first_key",
+        "photo-1_third_key",
+        "photo-1_third_key",
+    ]
+    assert len(httpx_mock.get_requests(url=helper.UPLOAD_PHOTO_URL)) == 1
+    assert 1 <= len(httpx_mock.get_requests(url="https://stale_url")) <= 3
+    assert len(httpx_mock.get_requests(url="https://upload_url")) == 3
+
+
 def test_sync_upload_photo_uses_proxy(monkeypatch):
     captured = {}
 
@@ -337,6 +473,28 @@ def test_sync_upload_photo_uses_proxy(monkeypatch):
     assert captured["proxy"] == PROXY_URL
 
 
+@pytest.mark.asyncio
+async def test_async_upload_photo_sends_buffer_without_copies(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(json={"photo": "photo", "server": 1, "hash": "hash"})
+    image = BytesIO(b"image" * 100000)
+
+    stream = AsyncMultipartStream(None, {"photo": ("photo.jpg", image)})
+    chunks = [chunk async for chunk in stream]
+    body_chunks = [chunk for chunk in chunks if isinstance(chunk, memoryview)]
+    assert b"".join(body_chunks) == image.getvalue()
+    assert int(stream.headers["Content-Length"]) == len(b"".join(chunks))
+    del chunks, body_chunks
+
+    r = await vk_helper.async_upload_photo(
+        photo=image, file_name="photo.jpg", server_url="https://server_url"
+    )
+
+    assert r == {"photo": "photo", "server": 1, "hash": "hash"}
+    request = httpx_mock.get_requests()[0]
+    assert image.getvalue() in request.content
+    assert int(request.headers["Content-Length"]) == len(request.content)
+
+
 @pytest.mark.asyncio
 async def test_async_upload_photo_uses_proxy(monkeypatch):
     client_proxies = []
@@ -9,6 +9,8 @@ from multibotkit.schemas.yandexmessenger.incoming import (
     Image,
     Sender,
     Update,
+    parse_update,
+    parse_updates,
 )
 from multibotkit.schemas.yandexmessenger.outgoing import (
     GetUpdatesParams,
@@ -151,6 +153,10 @@ def test_incoming_models_update():
     assert update_dict_parsed["from"]["login"] == "test_user"
     assert update_dict_parsed["text"] == "Hello from Yandex Messenger!"
 
+    # Парсинг сырого тела запроса
+    assert parse_update(json.dumps(update_dict).encode()) == update
+    assert parse_updates(json.dumps({"updates": [update_dict]}).encode()) == [update]
+
 
 def test_outgoing_models_inline_keyboard():
     """Тест модели InlineKeyboard"""
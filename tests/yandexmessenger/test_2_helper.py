@@ -138,6 +138,9 @@ def test_sync_helper_get_updates(httpx_mock: HTTPXMock):
     assert r["updates"][0]["text"] == "Message 1"
     assert r["updates"][1]["text"] == "Message 2"
 
+    updates = ym_helper.parse_updates(json.dumps(r).encode())
+    assert [update.update_id for update in updates] == [1, 2]
+
 
 @pytest.mark.httpx_mock(assert_all_requests_were_expected=False)
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
@@ -208,6 +211,29 @@ async def test_async_helper_send_image(httpx_mock: HTTPXMock):
     assert r["message_id"] == 12346
 
 
+@pytest.mark.asyncio
+async def test_async_helper_send_file_streams_local_file(httpx_mock: HTTPXMock, tmp_path):
+    """Тест потоковой отправки локального файла"""
+    requests = []
+
+    def send_file_response(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(status_code=200, json={"ok": True, "message_id": 12347})
+
+    httpx_mock.add_callback(send_file_response)
+
+    document_path = tmp_path / "report.pdf"
+    document_path.write_bytes(b"fake document data")
+
+    r = await ym_helper.async_send_file(document=str(document_path), login="test_user")
+
+    assert r["ok"] is True
+    assert requests[0].headers["Authorization"] == f"OAuth {ym_helper.token}"
+    assert b'name="login"\r\n\r\ntest_user\r\n' in requests[0].content
+    assert b'name="document"; filename="report.pdf"' in requests[0].content
+    assert b"fake document data" in requests[0].content
+
+
 @pytest.mark.asyncio
 @pytest.mark.httpx_mock(assert_all_requests_were_expected=False)
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
@@ -318,3 +344,12 @@ def test_parse_updates():
     assert updates[0].update_id == 1
     assert updates[0].text == "Message 1"
     assert updates[1].chat.id == "group_123"
+
+    error_response = {"ok": False, "description": "Unauthorized"}
+    assert ym_helper.parse_updates(error_response) == []
+    assert ym_helper.parse_updates(json.dumps(error_response).encode()) == []
+    assert ym_helper.parse_updates(json.dumps(response).encode()) == updates
+
+    webhook_body = {"updates": response["updates"]}
+    assert ym_helper.parse_updates(webhook_body) == updates
+    assert ym_helper.parse_updates(json.dumps(webhook_body)) == updates